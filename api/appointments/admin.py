@@ -1,5 +1,5 @@
 from django.contrib import admin
-from api.appointments.models import Appointment
+from api.appointments.models import Appointment, BulkCancellation
 from api.appointments.choices import Status
 
 
@@ -55,3 +55,20 @@ class AppointmentsAdmin(admin.ModelAdmin):
         ("Metadata", {"fields": ["created_at", "updated_at"], "classes": ["collapse"]}),
     ]
     readonly_fields = ["uuid", "created_at", "updated_at"]
+
+
+@admin.register(BulkCancellation)
+class BulkCancellationAdmin(admin.ModelAdmin):
+    list_display = [
+        "uuid",
+        "doctor",
+        "start_time",
+        "end_time",
+        "requested_by",
+        "prepared_at",
+        "notified_at",
+        "completed_at",
+    ]
+    list_filter = ["completed_at", "created_at"]
+    raw_id_fields = ["doctor", "requested_by", "appointments"]
+    readonly_fields = ["uuid", "created_at", "updated_at"]
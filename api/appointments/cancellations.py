@@ -0,0 +1,234 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import stripe
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from api.appointments.choices import Status
+from api.appointments.models import Appointment, BulkCancellation
+from api.doctors.models import TimeSlot
+from api.doctors.utilization import delete_time_slots, withdraw_time_slots
+from api.payments.choices import PaymentStatusChoices, RefundPaymentChoices
+from api.payments.models import AppointmentPayment, AppointmentPaymentRefund
+from api.payments.refund_policies import invalidate_refund_quote
+from api.payments.services import submit_refund
+from api.services.send_email import EmailService
+
+logger = logging.getLogger(__name__)
+
+CANCELLABLE_STATUSES = [Status.PENDING, Status.CONFIRMED, Status.RESCHEDULED]
+UNPAID_PAYMENT_STATUSES = [
+    PaymentStatusChoices.REQUIRES_PAYMENT_METHOD,
+    PaymentStatusChoices.REQUIRES_CONFIRMATION,
+    PaymentStatusChoices.REQUIRES_ACTION,
+]
+
+# A bulk cancellation runs in three steps, each safe to repeat, so a
+# request that dies part way is finished by sending it again:
+#   1. prepare: in one transaction, pick the appointments, cancel them,
+#      cancel unpaid payments, create a full refund per paid one and
+#      withdraw the doctor's free slots, all with set-wise queries;
+#   2. refund: submit the refunds still waiting on Stripe from a bounded
+#      thread pool, each with its refund's idempotency key;
+#   3. notify: queue every patient's email in one batch, once.
+# The cancellation is complete when no refund is left waiting on Stripe.
+
+
+def open_bulk_cancellation(doctor, start_time, end_time, reason, user):
+    """
+    Return the unfinished BulkCancellation of `doctor` for this window, or
+    start one.
+    """
+    lookup = {
+        "doctor": doctor,
+        "start_time": start_time,
+        "end_time": end_time,
+        "completed_at": None,
+    }
+    try:
+        with transaction.atomic():
+            batch, _ = BulkCancellation.objects.get_or_create(
+                **lookup, defaults={"reason": reason, "requested_by": user}
+            )
+    except IntegrityError:
+        # A concurrent request created it first.
+        batch = BulkCancellation.objects.get(**lookup)
+    return batch
+
+
+def prepare_cancellation(batch):
+    with transaction.atomic():
+        locked = BulkCancellation.objects.select_for_update().get(id=batch.id)
+        if locked.prepared_at:
+            return
+
+        appointment_ids = list(
+            Appointment.objects.filter(
+                time_slot__doctor=batch.doctor,
+                time_slot__start_time__gte=batch.start_time,
+                time_slot__start_time__lt=batch.end_time,
+                status__in=CANCELLABLE_STATUSES,
+            ).values_list("id", flat=True)
+        )
+        batch.appointments.set(appointment_ids)
+
+        paid = AppointmentPayment.objects.filter(
+            appointment_id__in=appointment_ids,
+            status=PaymentStatusChoices.SUCCEEDED,
+        )
+        paid_ids = set(paid.values_list("appointment_id", flat=True))
+
+        Appointment.objects.filter(id__in=paid_ids).update(
+            status=Status.REFUND_PENDING
+        )
+        Appointment.objects.filter(id__in=appointment_ids).exclude(
+            id__in=paid_ids
+        ).update(status=Status.CANCELLED)
+        AppointmentPayment.objects.filter(
+            appointment_id__in=appointment_ids, status__in=UNPAID_PAYMENT_STATUSES
+        ).update(status=PaymentStatusChoices.CANCELED)
+
+        # The doctor cancelled, so the patient gets everything back
+        # whatever the refund policy says. A refund the patient already
+        # asked for is left to finish.
+        reason = "Cancelled by the doctor"
+        if batch.reason:
+            reason = f"{reason}: {batch.reason}"
+        AppointmentPaymentRefund.objects.bulk_create(
+            AppointmentPaymentRefund(
+                appointment_payment=payment,
+                amount=payment.amount,
+                reason=reason[:255],
+                appointment_status=Status.REFUND_PENDING,
+            )
+            for payment in paid.exclude(
+                refunds__status__in=[
+                    RefundPaymentChoices.REQUIRES_ACTION,
+                    RefundPaymentChoices.SUCCEEDED,
+                ]
+            )
+        )
+
+        # The doctor can't work in the window: the cancelled appointments'
+        # slots are withdrawn, so refunds don't put them back on sale, and
+        # free slots are deleted.
+        withdraw_time_slots(TimeSlot.objects.filter(appointments__in=appointment_ids))
+        delete_time_slots(
+            TimeSlot.objects.filter(
+                doctor=batch.doctor,
+                start_time__gte=batch.start_time,
+                start_time__lt=batch.end_time,
+                appointments__isnull=True,
+            )
+        )
+
+        batch.prepared_at = timezone.now()
+        batch.save(update_fields=["prepared_at"])
+
+
+def submit_cancellation_refund(refund):
+    try:
+        submit_refund(refund)
+    except stripe.error.StripeError as e:
+        # A rejected refund is cancelled; any other stays pending and is
+        # retried by the next run or reconcile_stripe_calls.
+        logger.warning(f"Bulk cancellation refund {refund.uuid} failed: {e}")
+    finally:
+        connection.close()
+
+
+def submit_cancellation_refunds(batch):
+    refunds = AppointmentPaymentRefund.objects.filter(
+        appointment_payment__appointment__bulk_cancellations=batch,
+        stripe_refund_id=None,
+        status=RefundPaymentChoices.REQUIRES_ACTION,
+    ).select_related("appointment_payment__appointment")
+    with ThreadPoolExecutor(
+        max_workers=settings.BULK_CANCELLATION_REFUND_WORKERS
+    ) as executor:
+        list(executor.map(submit_cancellation_refund, refunds))
+
+
+def cancellation_outcomes(batch):
+    """
+    Each appointment's outcome, read back from the database:
+    "cancelled" (nothing to refund), "refunded" (Stripe accepted the
+    refund), "refund_pending" (not yet known) or "refund_failed".
+    """
+    appointments = (
+        batch.appointments.select_related(
+            "medical_record__patient__user", "time_slot__doctor__user"
+        )
+        .prefetch_related("payments__refunds")
+        .order_by("time_slot__start_time")
+    )
+    results = []
+    for appointment in appointments:
+        refund = max(
+            (
+                refund
+                for payment in appointment.payments.all()
+                for refund in payment.refunds.all()
+            ),
+            key=lambda refund: refund.created_at,
+            default=None,
+        )
+        if refund is None:
+            outcome = "cancelled"
+        elif refund.stripe_refund_id:
+            outcome = "refunded"
+        elif refund.status == RefundPaymentChoices.REQUIRES_ACTION:
+            outcome = "refund_pending"
+        else:
+            outcome = "refund_failed"
+        results.append((appointment, refund, outcome))
+    return results
+
+
+def notify_patients(batch, results):
+    with transaction.atomic():
+        locked = BulkCancellation.objects.select_for_update().get(id=batch.id)
+        if locked.notified_at:
+            return
+        EmailService.send_appointment_cancelled_emails(
+            [
+                (
+                    appointment.medical_record.patient.user,
+                    {
+                        "doctor_name":
+                            appointment.time_slot.doctor.user.get_full_name(),
+                        "date": appointment.time_slot.start_time.date(),
+                        "time": appointment.time_slot.start_time,
+                    },
+                    refund.amount if refund and outcome != "refund_failed" else None,
+                )
+                for appointment, refund, outcome in results
+            ],
+            reason=batch.reason,
+        )
+        batch.notified_at = timezone.now()
+        batch.save(update_fields=["notified_at"])
+
+
+def run_bulk_cancellation(batch):
+    """
+    Take `batch` as far as it can go and return its per-appointment
+    outcomes; see cancellation_outcomes().
+    """
+    prepare_cancellation(batch)
+    submit_cancellation_refunds(batch)
+
+    results = cancellation_outcomes(batch)
+    for appointment, refund_record, _ in results:
+        if refund_record:
+            invalidate_refund_quote(appointment.uuid)
+    notify_patients(batch, results)
+
+    if not any(outcome == "refund_pending" for _, _, outcome in results):
+        batch.completed_at = timezone.now()
+        BulkCancellation.objects.filter(id=batch.id, completed_at=None).update(
+            completed_at=batch.completed_at
+        )
+    return results
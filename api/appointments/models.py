@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 from api.base_models import BaseModel
 from api.doctors.choices import Services
@@ -45,3 +46,46 @@ class Appointment(BaseModel):
         verbose_name = "Appointment"
         verbose_name_plural = "Appointments"
         db_table = "appointment"
+
+
+class BulkCancellation(BaseModel):
+    """
+    A doctor's appointments in [start_time, end_time) cancelled together,
+    e.g. when the doctor is unexpectedly unavailable. The row records how
+    far the cancellation got, so repeating the request resumes it; see
+    api.appointments.cancellations.
+    """
+
+    doctor = models.ForeignKey(
+        "doctors.Doctor", on_delete=models.CASCADE, related_name="bulk_cancellations"
+    )
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    reason = models.CharField(max_length=255, blank=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+
+    appointments = models.ManyToManyField(
+        Appointment, related_name="bulk_cancellations", blank=True
+    )
+    prepared_at = models.DateTimeField(null=True, blank=True)
+    notified_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.doctor} - {self.start_time} to {self.end_time}"
+
+    class Meta:
+        db_table = "bulk_cancellation"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["doctor", "start_time", "end_time"],
+                condition=models.Q(completed_at=None),
+                name="unique_open_bulk_cancellation",
+            ),
+        ]
@@ -1,10 +1,14 @@
+from datetime import timedelta
+
 from rest_framework import serializers
+from django.conf import settings
 from django.db import transaction
 
 
-from api.doctors.models import TimeSlot
+from api.doctors.models import Doctor, TimeSlot
 from api.doctors.choices import Services
 from api.doctors.serializers import TimeSlotSerializer
+from api.doctors.utilization import set_slots_booked
 from api.patients.utils.fields import LabelChoiceField
 from api.patients.models import Patient
 from api.patients.serializers import PatientMedicalRecordSerializer
@@ -74,7 +78,7 @@ class AppointmentSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         try:
             request = self.context["request"]
-            patient = Patient.objects.get(user=request.user)
+            patient = request.user.patient
 
             medical_record = patient.medical_records.create(is_main_record=False)
             validated_data["medical_record"] = medical_record
@@ -82,8 +86,8 @@ class AppointmentSerializer(serializers.ModelSerializer):
             time_slot_uuid = validated_data.pop("time_slot_uuid")
             time_slot = TimeSlot.objects.get(uuid=time_slot_uuid)
             validated_data["time_slot"] = time_slot
+            set_slots_booked(TimeSlot.objects.filter(pk=time_slot.pk), True)
             time_slot.is_booked = True
-            time_slot.save()
 
             return super().create(validated_data)
 
@@ -170,3 +174,42 @@ class DoctorAppointmentSerializer(serializers.ModelSerializer):
 
 
 # checking deployment comment
+
+
+class BulkCancellationSerializer(serializers.Serializer):
+    """
+    Serializer for cancelling a doctor's appointments in a time window.
+    Doctors cancel their own; admins name the doctor with doctor_uuid.
+    """
+
+    doctor_uuid = serializers.UUIDField(required=False)
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField()
+    reason = serializers.CharField(max_length=200, required=False, allow_blank=True)
+
+    def validate(self, data):
+        if data["end_time"] <= data["start_time"]:
+            raise serializers.ValidationError("end_time must be after start_time.")
+        max_window = timedelta(days=settings.BULK_CANCELLATION_MAX_DAYS)
+        if data["end_time"] - data["start_time"] > max_window:
+            raise serializers.ValidationError(
+                f"The window can be at most {settings.BULK_CANCELLATION_MAX_DAYS} days."
+            )
+
+        user = self.context["request"].user
+        doctor = getattr(user, "doctor", None)
+        if doctor is None:
+            if "doctor_uuid" not in data:
+                raise serializers.ValidationError(
+                    {"doctor_uuid": "This field is required."}
+                )
+            doctor = Doctor.objects.filter(uuid=data["doctor_uuid"]).first()
+            if doctor is None:
+                raise serializers.ValidationError({"doctor_uuid": "Doctor not found."})
+        elif data.get("doctor_uuid", doctor.uuid) != doctor.uuid:
+            raise serializers.ValidationError(
+                {"doctor_uuid": "Doctors can only cancel their own appointments."}
+            )
+
+        data["doctor"] = doctor
+        return data
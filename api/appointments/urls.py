@@ -2,6 +2,7 @@ from django.urls import path
 from api.appointments.views import (
     PatientAppointmentListView,
     AppointmentCreateView,
+    BulkCancellationView,
     AppointmentDetailView,
     DoctorAppointmentListView,
     IodineAllergyAppointmentUpdateView,
@@ -26,6 +27,11 @@ urlpatterns = [
         "doctor/", DoctorAppointmentListView.as_view(), name="doctor-appointments-list"
     ),
     path("create/", AppointmentCreateView.as_view(), name="appointment-create"),
+    path(
+        "doctor/cancel/",
+        BulkCancellationView.as_view(),
+        name="appointment-bulk-cancel",
+    ),
     path(
         "iodine-allergy/",
         IodineAllergyAppointmentUpdateView.as_view(),
@@ -2,13 +2,19 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.generics import CreateAPIView, RetrieveAPIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 
 
+from api.appointments.cancellations import (
+    open_bulk_cancellation,
+    run_bulk_cancellation,
+)
 from api.appointments.serializers import (
     AppointmentSerializer,
+    BulkCancellationSerializer,
     AppointmentDetailSerializer,
     DoctorAppointmentSerializer,
 )
@@ -27,8 +33,11 @@ from django.shortcuts import get_object_or_404
 from api.appointments.models import Appointment
 from api.doctors.permissions import IsDoctor
 from api.patients.permissions import IsPatient
+from api.users.permissions import IsAdmin
+from api.authentication.authentication import DatabaseJWTAuthentication
 from api.patients.views import BaseMedicalRecordFieldUpdateView
 from api.utils.exception_handler import HandleExceptionAPIView
+from api.idempotency.mixins import IdempotentViewMixin
 
 import logging
 
@@ -87,12 +96,61 @@ class DoctorAppointmentListView(HandleExceptionAPIView, RetrieveAPIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class AppointmentCreateView(HandleExceptionAPIView, CreateAPIView):
+@method_decorator(csrf_exempt, name="dispatch")
+class BulkCancellationView(IdempotentViewMixin, HandleExceptionAPIView, APIView):
+    """
+    Cancel every appointment a doctor has in a time window and refund the
+    paid ones in full. Sending the same window again resumes a cancellation
+    that did not finish.
+    """
+
+    authentication_classes = [DatabaseJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsDoctor | IsAdmin]
+    serializer_class = BulkCancellationSerializer
+
+    def post(self, request):
+        serializer = BulkCancellationSerializer(
+            data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        batch = open_bulk_cancellation(
+            data["doctor"],
+            data["start_time"],
+            data["end_time"],
+            data.get("reason", ""),
+            request.user,
+        )
+        results = run_bulk_cancellation(batch)
+
+        return Response(
+            {
+                "uuid": batch.uuid,
+                "completed": batch.completed_at is not None,
+                "appointments": [
+                    {
+                        "appointment_uuid": appointment.uuid,
+                        "start_time": appointment.time_slot.start_time,
+                        "outcome": outcome,
+                        "refund_amount": str(refund.amount) if refund else None,
+                    }
+                    for appointment, refund, outcome in results
+                ],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class AppointmentCreateView(
+    IdempotentViewMixin, HandleExceptionAPIView, CreateAPIView
+):
     """
     API view to create a new appointment.
     This view allows patients to book appointments with doctors.
     """
 
+    authentication_classes = [DatabaseJWTAuthentication]
     permission_classes = [IsAuthenticated, IsPatient]
     serializer_class = AppointmentSerializer
 
@@ -100,46 +158,54 @@ class AppointmentCreateView(HandleExceptionAPIView, CreateAPIView):
 @method_decorator(csrf_exempt, name="dispatch")
 class IodineAllergyAppointmentUpdateView(BaseMedicalRecordFieldUpdateView):
     is_appointment_update = True
+    field_name = "iodine_allergy"
     serializer_class = IodineAllergySerializer
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class AllergyBulkAppointmentUpdateView(BaseMedicalRecordFieldUpdateView):
     is_appointment_update = True
+    field_name = "allergies"
     serializer_class = AllergyListSerializer
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class MedicationBulkAppointmentUpdateView(BaseMedicalRecordFieldUpdateView):
     is_appointment_update = True
+    field_name = "medications"
     serializer_class = MedicationListSerializer
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class MedicalHistoryBulkAppointmentUpdateView(BaseMedicalRecordFieldUpdateView):
     is_appointment_update = True
+    field_name = "medical_histories"
     serializer_class = MedicalHistoryListSerializer
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class SurgicalHistoryBulkAppointmentUpdateView(BaseMedicalRecordFieldUpdateView):
     is_appointment_update = True
+    field_name = "surgical_histories"
     serializer_class = SurgicalHistoryListSerializer
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class CareProviderBulkAppointmentUpdateView(BaseMedicalRecordFieldUpdateView):
     is_appointment_update = True
+    field_name = "care_providers"
     serializer_class = CareProviderListSerializer
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class AddictionHistoryBulkAppointmentUpdateView(BaseMedicalRecordFieldUpdateView):
     is_appointment_update = True
+    field_name = "addiction_history"
     serializer_class = AddictionHistoryListSerializer
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class CancerHistoryBulkAppointmentUpdateView(BaseMedicalRecordFieldUpdateView):
     is_appointment_update = True
+    field_name = "cancer_history"
     serializer_class = CancerHistoryListSerializer
@@ -0,0 +1,26 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from api.authentication.tokens import ROLE_CLAIM
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Default authentication: trusts the signed role and profile claims and
+    returns a ClaimsUser (TOKEN_USER_CLASS) without touching the database.
+
+    Tokens issued before the claims existed fall back to loading the User.
+    Views performing sensitive writes use DatabaseJWTAuthentication instead,
+    so deactivated users are refused there before their token expires.
+    """
+
+    def get_user(self, validated_token):
+        if ROLE_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        return api_settings.TOKEN_USER_CLASS(validated_token)
+
+
+class DatabaseJWTAuthentication(JWTAuthentication):
+    """
+    Loads and checks the User row on every request.
+    """
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+from api.authentication.utilities.hashing import run_hasher
+
+
+class BoundedHasherMixin:
+    """
+    Runs the expensive hashing calls on the bounded hashing pool.
+    """
+
+    def encode(self, password, salt, *args, **kwargs):
+        return run_hasher(super().encode, password, salt, *args, **kwargs)
+
+    def verify(self, password, encoded):
+        return run_hasher(super().verify, password, encoded)
+
+
+class TeleHealthArgon2PasswordHasher(BoundedHasherMixin, Argon2PasswordHasher):
+    """
+    Argon2id with costs taken from settings. Hashes made with other costs
+    are upgraded the next time their user logs in.
+    """
+
+    time_cost = settings.PASSWORD_ARGON2_TIME_COST
+    memory_cost = settings.PASSWORD_ARGON2_MEMORY_COST
+    parallelism = settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class TeleHealthPBKDF2PasswordHasher(BoundedHasherMixin, PBKDF2PasswordHasher):
+    """
+    Verifies the PBKDF2 hashes stored before Argon2 became the default.
+    """
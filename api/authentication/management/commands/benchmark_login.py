@@ -0,0 +1,201 @@
+import datetime
+import secrets
+import statistics
+import threading
+import time
+
+import requests
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from api.authentication.tokens import TeleHealthRefreshToken
+from api.patients.models import Patient
+from api.users.choices import Role
+from api.users.models import User
+
+BENCHMARK_PASSWORD = "Benchmark#Passw0rd"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure login throughput and latency against throwaway patient "
+        "accounts, in-process or against a running server"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--base-url",
+            default=None,
+            help=(
+                "e.g. http://localhost:8000; defaults to Django's test client. "
+                "The server's login rate limits apply to remote runs."
+            ),
+        )
+        parser.add_argument(
+            "--background-concurrency",
+            type=int,
+            default=0,
+            help="Threads verifying tokens while the logins run, as other traffic",
+        )
+        parser.add_argument(
+            "--legacy-hashes",
+            action="store_true",
+            help="Store PBKDF2 hashes, so each user's first login rehashes",
+        )
+
+    def handle(self, *args, **options):
+        run_id = secrets.token_hex(4)
+        emails = self.create_users(run_id, options["users"], options["legacy_hashes"])
+
+        try:
+            self.report_queries(emails[0])
+            # Every login comes from one address and reuses a few emails.
+            with override_settings(RATE_LIMITS={}):
+                self.run(emails, options)
+        finally:
+            deleted, _ = User.objects.filter(email__in=emails).delete()
+            self.stdout.write(f"Removed {deleted} benchmark rows")
+
+    def create_users(self, run_id, count, legacy_hashes):
+        template = User(role=Role.PATIENT)
+        template.password = make_password(
+            BENCHMARK_PASSWORD, hasher="pbkdf2_sha256" if legacy_hashes else "default"
+        )
+
+        users = User.objects.bulk_create(
+            [
+                User(
+                    email=f"login-benchmark-{run_id}-{i}@example.com",
+                    password=template.password,
+                    role=Role.PATIENT,
+                    first_name="Benchmark",
+                )
+                for i in range(count)
+            ]
+        )
+        Patient.objects.bulk_create(
+            [
+                Patient(
+                    user_id=user.pk,
+                    date_of_birth=datetime.date(1980, 1, 1),
+                    phone_number="+12025550100",
+                )
+                for user in User.objects.filter(
+                    email__in=[user.email for user in users]
+                )
+            ]
+        )
+        return [user.email for user in users]
+
+    def report_queries(self, email):
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().post(
+                reverse("login"),
+                {"email": email, "password": BENCHMARK_PASSWORD},
+                content_type="application/json",
+            )
+        self.stdout.write(
+            f"Single login: HTTP {response.status_code}, {len(queries)} queries"
+        )
+        for query in queries.captured_queries:
+            self.stdout.write(f"  {query['sql'][:120]}")
+
+    def run(self, emails, options):
+        total = options["requests"]
+        concurrency = options["concurrency"]
+        base_url = options["base_url"]
+        url = reverse("login")
+        verify_url = reverse("token_verify")
+        token = TeleHealthRefreshToken.for_user(User.objects.get(email=emails[0]))
+        access_token = str(token.access_token)
+        results = []
+        background_results = []
+        done = threading.Event()
+
+        def post(session, client, path, payload):
+            if session:
+                return session.post(f"{base_url.rstrip('/')}{path}", json=payload)
+            return client.post(path, payload, content_type="application/json")
+
+        def worker(offset):
+            session = requests.Session() if base_url else None
+            client = Client()
+            try:
+                for i in range(offset, total, concurrency):
+                    payload = {
+                        "email": emails[i % len(emails)],
+                        "password": BENCHMARK_PASSWORD,
+                    }
+                    started = time.perf_counter()
+                    status_code = post(session, client, url, payload).status_code
+                    results.append((time.perf_counter() - started, status_code))
+            finally:
+                # Each thread opened its own database connection.
+                connections.close_all()
+
+        def background_worker():
+            session = requests.Session() if base_url else None
+            client = Client()
+            try:
+                while not done.is_set():
+                    started = time.perf_counter()
+                    status_code = post(
+                        session, client, verify_url, {"token": access_token}
+                    ).status_code
+                    background_results.append(
+                        (time.perf_counter() - started, status_code)
+                    )
+            finally:
+                connections.close_all()
+
+        background = [
+            threading.Thread(target=background_worker)
+            for _ in range(options["background_concurrency"])
+        ]
+        threads = [
+            threading.Thread(target=worker, args=(offset,))
+            for offset in range(concurrency)
+        ]
+        for thread in background:
+            thread.start()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        for thread in background:
+            thread.join()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{total} logins, concurrency {concurrency}: "
+                f"{total / elapsed:.1f} logins/s, {self.summarize(results)}"
+            )
+        )
+        if background_results:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{len(background_results)} token verifications alongside, "
+                    f"concurrency {len(background)}: "
+                    f"{self.summarize(background_results)}"
+                )
+            )
+
+    def summarize(self, results):
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        failures = sum(1 for _, status_code in results if status_code != 200)
+        quantiles = statistics.quantiles(latencies, n=100)
+        return (
+            f"p50 {quantiles[49]:.1f}ms, p95 {quantiles[94]:.1f}ms, "
+            f"p99 {quantiles[98]:.1f}ms, max {latencies[-1]:.1f}ms, "
+            f"{failures} failed"
+        )
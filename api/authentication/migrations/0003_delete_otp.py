@@ -0,0 +1,16 @@
+# Generated by Django 5.1.7 on 2026-10-19 03:56
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='OTP',
+        ),
+    ]
@@ -13,7 +13,8 @@ from api.patients.utils.fields import LabelChoiceField
 from api.authentication.choices import Purpose
 from api.doctors.choices import Services
 from api.doctors.models import Doctor, Specialization, Service, DoctorService
-from api.authentication.utilities.otp import create_otp_for_user
+from api.authentication.utilities.otp import create_otp_for_user, clear_otp_verified
+from api.authentication.tokens import get_profile
 from api.services.send_email import EmailService
 from api.authentication.validators import (
     validate_email_not_exits,
@@ -188,21 +189,17 @@ class TeleHealthLoginSerializer(LoginSerializer):
         data["role"] = user.role
         profile_uuid = None
 
-        try:
-            if user.role == 0:
-                user = User.objects.get(email=self.validated_data["email"])
-                profile_uuid = user.uuid
-
-            elif user.role == 1:
-                doctor = Doctor.objects.get(user=user)
-                profile_uuid = doctor.uuid
+        # EmailProfileBackend has already joined the profile onto the user.
+        if user.role == Role.ADMIN:
+            profile_uuid = user.uuid
 
-            elif user.role == 2:
-                patient = Patient.objects.get(user=user)
-                profile_uuid = patient.uuid
-
-        except Exception as e:
-            raise serializers.ValidationError({"detail": f"Error Logging in {e}."})
+        elif user.role in (Role.DOCTOR, Role.PATIENT):
+            profile = get_profile(user)
+            if profile is None:
+                raise serializers.ValidationError(
+                    {"detail": "Error Logging in: profile not found."}
+                )
+            profile_uuid = profile.uuid
 
         data["profile_uuid"] = profile_uuid
 
@@ -246,11 +243,11 @@ class RequestOTPSerializer(serializers.Serializer):
 
             user = User.objects.get(email=email)
 
-            otp_obj = create_otp_for_user(user, purpose=purpose)
+            otp = create_otp_for_user(user, purpose=purpose)
 
             EmailService.send_otp_email(
                 user=user,
-                otp=otp_obj.otp,
+                otp=otp,
             )
 
             return {"detail": f"One-time Passcode (OTP) has been sent to {email}."}
@@ -276,18 +273,14 @@ class OTPVerificationSerializer(serializers.Serializer):
         otp = attrs.get("otp")
         purpose = self.context.get("purpose")
 
-        try:
-            is_valid, otp_obj = validate_otp(email, otp, purpose)
-            if not is_valid:
-                raise serializers.ValidationError({"detail": "Invalid or expired OTP"})
-
-            otp_obj.is_used = True
-            otp_obj.save()
+        if not validate_otp(email, otp, purpose):
+            raise serializers.ValidationError({"detail": "Invalid or expired OTP"})
 
+        try:
             if purpose == Purpose.EMAIL_VERIFICATION:
                 user = User.objects.get(email=email)
                 user.is_email_verified = True
-                user.save()
+                user.save(update_fields=["is_email_verified"])
 
                 try:
                     EmailService.send_welcome_email(user)
@@ -321,8 +314,8 @@ class PasswordChangeSerializer(serializers.Serializer):
     def validate_email(self, email):
         validate_email_exits(self, email)
 
-        user = User.objects.get(email=email.lower())
-        validate_email_otp_verified(self, user)
+        self.user = User.objects.get(email=email.lower())
+        validate_email_otp_verified(self, self.user)
 
         return email
 
@@ -333,8 +326,17 @@ class PasswordChangeSerializer(serializers.Serializer):
     def save(self):
         new_password = self.validated_data["new_password1"]
 
+        # Hash first: if the hashing pool is busy the request fails with 503
+        # before the OTP verification is used up.
+        self.user.set_password(new_password)
+
+        # One verified OTP authorizes one password change.
+        if not clear_otp_verified(self.user.email, Purpose.PASSWORD_RESET):
+            raise serializers.ValidationError(
+                {"email": "You must verify your OTP before changing password"}
+            )
+
         try:
-            self.user.set_password(new_password)
             self.user.save()
             return self.user
         except Exception as e:
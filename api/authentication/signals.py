@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from api.authentication.utilities.blacklist import (
+    get_blacklist_filter,
+    notify_blacklisted,
+)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, created, **kwargs):
+    if not created:
+        return
+
+    jti = instance.token.jti
+    # Other workers hear about it through NOTIFY; this one needn't wait.
+    notify_blacklisted(jti)
+    blacklist_filter = get_blacklist_filter()
+    if blacklist_filter is not None:
+        transaction.on_commit(lambda: blacklist_filter.add(jti))
@@ -0,0 +1,143 @@
+import uuid
+
+from dj_rest_auth.jwt_auth import CookieTokenRefreshSerializer
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken
+
+from api.authentication.utilities.blacklist import (
+    get_blacklist_filter,
+    record_outcome,
+)
+from api.doctors.models import Doctor
+from api.patients.models import Patient
+from api.users.choices import Role
+
+# Claims that let ClaimsUser stand in for a User without a DB lookup.
+ROLE_CLAIM = "role"
+PROFILE_ID_CLAIM = "profile_id"
+PROFILE_UUID_CLAIM = "profile_uuid"
+
+
+def get_profile(user):
+    """
+    Return the user's Patient or Doctor profile, or None.
+    """
+    if user.role == Role.PATIENT:
+        return getattr(user, "patient", None)
+    if user.role == Role.DOCTOR:
+        return getattr(user, "doctor", None)
+    return None
+
+
+class TeleHealthRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the role and profile claims. Access tokens copy
+    them, including the ones minted on refresh.
+
+    Issuing one does not insert an OutstandingToken row. blacklist() and
+    outstand() create that row on demand, so logout and rotation still work;
+    only never-refreshed tokens are missing from the outstanding list.
+
+    The blacklist check asks this worker's bloom filter first and only
+    queries the database when the filter cannot rule the token out.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        # Skip BlacklistMixin.for_user, which writes the OutstandingToken.
+        token = super(BlacklistMixin, cls).for_user(user)
+        profile = get_profile(user)
+
+        token[ROLE_CLAIM] = user.role
+        token[PROFILE_ID_CLAIM] = profile.pk if profile else None
+        token[PROFILE_UUID_CLAIM] = str(profile.uuid if profile else user.uuid)
+        return token
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        blacklist_filter = get_blacklist_filter()
+
+        if blacklist_filter is None or not blacklist_filter.ready:
+            record_outcome("unavailable")
+            return super().check_blacklist()
+
+        if not blacklist_filter.might_be_blacklisted(jti):
+            record_outcome("negative")
+            return
+
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            record_outcome("hit")
+            raise TokenError(_("Token is blacklisted"))
+        record_outcome("false_positive")
+
+
+class TeleHealthTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Used by dj-rest-auth's jwt_encode for login and registration tokens.
+    """
+
+    token_class = TeleHealthRefreshToken
+
+
+class TeleHealthTokenRefreshSerializer(CookieTokenRefreshSerializer):
+    token_class = TeleHealthRefreshToken
+
+
+class ClaimsUser(TokenUser):
+    """
+    Request user built from access token claims, so authenticating a request
+    costs no queries.
+
+    `patient` and `doctor` are None unless the claims name such a profile,
+    so `getattr(user, "patient", None)` gives the same answer for this and
+    for a real User. A profile is an instance with only id, uuid and user_id
+    loaded; any other field is fetched on first access like a deferred field.
+    """
+
+    @cached_property
+    def role(self):
+        return self.token.get(ROLE_CLAIM)
+
+    @cached_property
+    def profile_id(self):
+        return self.token.get(PROFILE_ID_CLAIM)
+
+    @cached_property
+    def profile_uuid(self):
+        return self.token.get(PROFILE_UUID_CLAIM)
+
+    @property
+    def is_patient(self):
+        return self.role == Role.PATIENT
+
+    @property
+    def is_doctor(self):
+        return self.role == Role.DOCTOR
+
+    @property
+    def is_admin(self):
+        return self.role == Role.ADMIN
+
+    @cached_property
+    def patient(self):
+        return self._get_profile(Patient, Role.PATIENT)
+
+    @cached_property
+    def doctor(self):
+        return self._get_profile(Doctor, Role.DOCTOR)
+
+    def _get_profile(self, model, role):
+        if self.role != role or self.profile_id is None:
+            return None
+
+        return model.from_db(
+            None,
+            ["id", "uuid", "user_id"],
+            [self.profile_id, uuid.UUID(self.profile_uuid), self.id],
+        )
@@ -8,10 +8,11 @@ from api.authentication.views import (
     PasswordChangeView,
     TeleHealthLogoutView,
     SendOTPView,
+    TeleHealthTokenRefreshView,
+    TokenBlacklistFilterMetricsView,
 )
 
 from rest_framework_simplejwt.views import TokenVerifyView
-from dj_rest_auth.jwt_auth import get_refresh_view
 
 urlpatterns = [
     path("register/", TeleHealthRegisterView.as_view(), name="register"),
@@ -28,6 +29,11 @@ urlpatterns = [
         name="password_reset_done",
     ),
     path("password/change/", PasswordChangeView.as_view(), name="password_change"),
-    path("token/refresh/", get_refresh_view().as_view(), name="token_refresh"),
+    path("token/refresh/", TeleHealthTokenRefreshView.as_view(), name="token_refresh"),
+    path(
+        "token/blacklist/metrics/",
+        TokenBlacklistFilterMetricsView.as_view(),
+        name="token_blacklist_metrics",
+    ),
     path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
 ]
@@ -0,0 +1,215 @@
+import hashlib
+import logging
+import math
+import os
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, connections
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from api.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "jwt_blacklisted"
+
+# Outcomes of TeleHealthRefreshToken.check_blacklist:
+#   negative        the filter ruled the token out; no query was made
+#   hit             the filter matched and the token is blacklisted
+#   false_positive  the filter matched but the token is not blacklisted
+#   unavailable     the filter was not ready, so the database was asked
+METRIC_PREFIX = "jwt_blacklist.filter"
+METRIC_OUTCOMES = ("negative", "hit", "false_positive", "unavailable")
+
+
+class BloomFilter:
+    """
+    Fixed-size bloom filter over strings. Sized for `capacity` items at the
+    given false positive rate; it only answers "maybe" or "definitely not".
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.capacity = capacity
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, value):
+        # Setting a bit is a read-modify-write of its byte.
+        with self._lock:
+            for position in self._positions(value):
+                self.bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, value):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+
+class BlacklistFilter:
+    """
+    Per-process bloom filter of blacklisted refresh token JTIs.
+
+    A background thread LISTENs for NOTIFY_CHANNEL, then loads every
+    unexpired blacklisted JTI, then adds JTIs as they are announced. Because
+    LISTEN starts before the load, no blacklisting is missed in between. The
+    filter is only trusted while that connection is alive; otherwise callers
+    fall back to the database. It is rebuilt periodically so expired JTIs
+    drop out, and on every reconnect.
+    """
+
+    def __init__(self):
+        self.filter = None
+        self.ready = False
+        self.built_at = 0.0
+        self.pid = os.getpid()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._listen, name="jwt-blacklist-listener", daemon=True
+        )
+        self._thread.start()
+
+    def might_be_blacklisted(self, jti):
+        return jti in self.filter
+
+    def add(self, jti):
+        current = self.filter
+        if current is not None:
+            current.add(jti)
+
+    def rebuild(self):
+        unexpired = BlacklistedToken.objects.filter(
+            token__expires_at__gt=aware_utcnow()
+        )
+        count = unexpired.count()
+        # Leave room for the tokens blacklisted until the next rebuild.
+        capacity = max(settings.JWT_BLACKLIST_FILTER_CAPACITY, count * 2)
+        new_filter = BloomFilter(capacity, settings.JWT_BLACKLIST_FILTER_ERROR_RATE)
+        for jti in unexpired.values_list("token__jti", flat=True).iterator(
+            chunk_size=5000
+        ):
+            new_filter.add(jti)
+
+        self.filter = new_filter
+        self.built_at = time.monotonic()
+        logger.info(f"Built JWT blacklist filter with {count} tokens")
+
+    def _rebuild(self):
+        try:
+            self.rebuild()
+        finally:
+            # Don't hold a database connection between rebuilds.
+            connection.close()
+
+    def _needs_rebuild(self):
+        return (
+            time.monotonic() - self.built_at
+            > settings.JWT_BLACKLIST_FILTER_REBUILD_SECONDS
+            or self.filter.count > self.filter.capacity
+        )
+
+    def _listen(self):
+        wrapper = connections["default"]
+        while True:
+            listener = None
+            try:
+                listener = wrapper.get_new_connection(wrapper.get_connection_params())
+                listener.autocommit = True
+                with listener.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+
+                self._rebuild()
+                self.ready = True
+
+                while True:
+                    if select.select([listener], [], [], 30) == ([], [], []):
+                        # Idle: make sure the connection is still alive.
+                        with listener.cursor() as cursor:
+                            cursor.execute("SELECT 1")
+                    listener.poll()
+                    while listener.notifies:
+                        self.add(listener.notifies.pop(0).payload)
+                    if self._needs_rebuild():
+                        self._rebuild()
+            except Exception:
+                logger.exception("JWT blacklist listener failed; retrying")
+            finally:
+                self.ready = False
+                if listener is not None:
+                    listener.close()
+            time.sleep(5)
+
+
+_blacklist_filter = None
+_lock = threading.Lock()
+
+
+def get_blacklist_filter():
+    """
+    Return this process's BlacklistFilter, starting it on first use, or None
+    when the filter is disabled or the database cannot send notifications.
+    """
+    global _blacklist_filter
+
+    if (
+        not settings.JWT_BLACKLIST_FILTER_ENABLED
+        or connections["default"].vendor != "postgresql"
+    ):
+        return None
+
+    # A forked worker inherits the object but not the listener thread.
+    if _blacklist_filter is None or _blacklist_filter.pid != os.getpid():
+        with _lock:
+            if _blacklist_filter is None or _blacklist_filter.pid != os.getpid():
+                _blacklist_filter = BlacklistFilter()
+                _blacklist_filter.start()
+    return _blacklist_filter
+
+
+def notify_blacklisted(jti):
+    """
+    Announce a blacklisted JTI to every worker. The notification is sent
+    when the current transaction commits.
+    """
+    if connection.vendor != "postgresql":
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [NOTIFY_CHANNEL, jti])
+
+
+def record_outcome(outcome):
+    metrics.increment(f"{METRIC_PREFIX}.{outcome}")
+
+
+def blacklist_filter_stats():
+    counts = metrics.get_counts(
+        [f"{METRIC_PREFIX}.{outcome}" for outcome in METRIC_OUTCOMES]
+    )
+    counts = {name.rsplit(".", 1)[1]: value for name, value in counts.items()}
+    # Share of non-blacklisted tokens the filter failed to rule out.
+    not_blacklisted = counts["negative"] + counts["false_positive"]
+    checked = not_blacklisted + counts["hit"]
+    return {
+        **counts,
+        "skipped_query_rate": counts["negative"] / checked if checked else None,
+        "false_positive_rate": (
+            counts["false_positive"] / not_blacklisted if not_blacklisted else None
+        ),
+    }
@@ -0,0 +1,62 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from api.utils.exceptions import ServiceBusy
+
+_executor = None
+_slots = None
+_pid = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _mark_hashing_thread():
+    _local.in_pool = True
+
+
+def _get_executor():
+    global _executor, _slots, _pid
+
+    # A forked worker inherits the executor but none of its threads.
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                workers = settings.PASSWORD_HASHING_WORKERS
+                _executor = ThreadPoolExecutor(
+                    max_workers=workers,
+                    thread_name_prefix="password-hasher",
+                    initializer=_mark_hashing_thread,
+                )
+                _slots = threading.BoundedSemaphore(
+                    workers + settings.PASSWORD_HASHING_QUEUE_SIZE
+                )
+                _pid = os.getpid()
+    return _executor, _slots
+
+
+def run_hasher(func, *args, **kwargs):
+    """
+    Run a password hashing call on this process's hashing pool.
+
+    The pool has PASSWORD_HASHING_WORKERS threads, so at most that many
+    hashes use the CPU at once, however many request threads want one. The
+    hash libraries release the GIL, which leaves the remaining request
+    threads free to serve other traffic meanwhile. Calls beyond the queue
+    size wait up to PASSWORD_HASHING_WAIT_SECONDS and are then refused with
+    ServiceBusy rather than piling up.
+    """
+    # Hashers may call each other (PBKDF2 verify calls encode); a nested
+    # call must not wait for a pool thread it is already occupying.
+    if not settings.PASSWORD_HASHING_WORKERS or getattr(_local, "in_pool", False):
+        return func(*args, **kwargs)
+
+    executor, slots = _get_executor()
+    if not slots.acquire(timeout=settings.PASSWORD_HASHING_WAIT_SECONDS):
+        raise ServiceBusy(wait=settings.PASSWORD_HASHING_WAIT_SECONDS)
+    try:
+        return executor.submit(func, *args, **kwargs).result()
+    finally:
+        slots.release()
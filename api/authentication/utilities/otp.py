@@ -1,8 +1,24 @@
+import hashlib
+import hmac
 import secrets
 import string
-from api.authentication.models import OTP
+
+from django.conf import settings
+from django.core.cache import caches
+
 from api.authentication.choices import Purpose
 
+# Keys for one (purpose, email):
+#   otp:<purpose>:<email>            digest of the current code
+#   otp:<purpose>:<email>:<digest>   consumable marker; deleting it is the
+#                                    atomic check-and-consume
+#   otp:<purpose>:<email>:attempts   failed verifications of the current code
+#   otp-verified:<purpose>:<email>   set once the code has been consumed
+
+
+def get_otp_cache():
+    return caches[getattr(settings, "OTP_CACHE_ALIAS", "default")]
+
 
 def generate_otp(length=6):
     """Generate a cryptographically secure OTP"""
@@ -10,9 +26,76 @@ def generate_otp(length=6):
     return "".join(secrets.choice(alphabet) for _ in range(length))
 
 
+def _digest(email, otp, purpose):
+    message = f"{purpose}:{email}:{otp}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def _key(email, purpose):
+    return f"otp:{int(purpose)}:{email.lower()}"
+
+
 def create_otp_for_user(user, purpose=Purpose.EMAIL_VERIFICATION):
-    """Create a new OTP for the user, deleting any existing ones"""
-    OTP.objects.filter(user=user, purpose=purpose).delete()
+    """
+    Issue a new OTP for the user and return the plain code.
+    Only its HMAC is stored; the new code replaces any earlier one.
+    """
+    cache = get_otp_cache()
+    timeout = settings.OTP_EXPIRY_MINUTES * 60
     otp = generate_otp()
-    otp_obj = OTP.objects.create(user=user, otp=otp, purpose=purpose)
-    return otp_obj
+    key = _key(user.email, purpose)
+    digest = _digest(user.email.lower(), otp, purpose)
+
+    cache.set_many({key: digest, f"{key}:{digest}": True}, timeout)
+    cache.delete(f"{key}:attempts")
+    return otp
+
+
+def consume_otp(email, otp, purpose):
+    """
+    Return True if `otp` is the current code for (email, purpose), and use it
+    up so no concurrent or later request can verify with it again.
+    """
+    cache = get_otp_cache()
+    key = _key(email, purpose)
+    digest = _digest(email.lower(), otp, purpose)
+
+    current = cache.get(key)
+    if current is None:
+        return False
+
+    if not hmac.compare_digest(current, digest):
+        attempts_key = f"{key}:attempts"
+        cache.add(attempts_key, 0, settings.OTP_EXPIRY_MINUTES * 60)
+        try:
+            attempts = cache.incr(attempts_key)
+        except ValueError:
+            # The counter expired along with the code.
+            return False
+        if attempts >= settings.OTP_MAX_ATTEMPTS:
+            # Too many guesses: the code can no longer be used.
+            cache.delete_many([key, f"{key}:{current}", attempts_key])
+        return False
+
+    if not cache.delete(f"{key}:{digest}"):
+        return False
+
+    cache.delete_many([key, f"{key}:attempts"])
+    cache.set(
+        f"otp-verified:{int(purpose)}:{email.lower()}",
+        True,
+        settings.OTP_VERIFIED_MINUTES * 60,
+    )
+    return True
+
+
+def is_otp_verified(email, purpose):
+    return bool(get_otp_cache().get(f"otp-verified:{int(purpose)}:{email.lower()}"))
+
+
+def clear_otp_verified(email, purpose):
+    """
+    Use up a verification so it authorizes a single action.
+    Returns False if it had already been used or expired.
+    """
+    return get_otp_cache().delete(f"otp-verified:{int(purpose)}:{email.lower()}")
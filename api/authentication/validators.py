@@ -6,7 +6,7 @@ from django.core.exceptions import ValidationError
 from api.authentication.choices import Purpose
 
 from api.users.models import User
-from api.authentication.models import OTP
+from api.authentication.utilities.otp import consume_otp, is_otp_verified
 
 
 def validate_min_length(password):
@@ -38,24 +38,8 @@ def validate_dob_not_in_future(self, dob):
 
 
 def validate_otp(email, otp, purpose):
-    """Validate that the OTP is valid for the given email"""
-    try:
-        user = User.objects.get(email=email)
-        otp_obj = OTP.objects.filter(user=user, otp=otp, purpose=purpose).latest(
-            "created_at"
-        )
-
-        if otp_obj is None:
-            return False, None
-
-        is_valid = not otp_obj.is_used and otp_obj.is_valid()
-        otp_obj.is_used = True
-        otp_obj.save()
-
-        return is_valid, otp_obj
-
-    except Exception as e:
-        return False, None
+    """Validate the OTP for the given email, consuming it if it matches"""
+    return consume_otp(email, otp, purpose)
 
 
 def validate_password_match(self, data):
@@ -68,8 +52,8 @@ def validate_password_match(self, data):
 
 
 def validate_email_otp_verified(self, user):
-    """Validate that the OTP is verified for the given email"""
-    verified_otp = OTP.objects.filter(user=user, is_used=True).exists()
+    """Validate that a password reset OTP was recently verified for the user"""
+    verified_otp = is_otp_verified(user.email, Purpose.PASSWORD_RESET)
 
     if not verified_otp:
         raise serializers.ValidationError(
@@ -1,17 +1,27 @@
+from dj_rest_auth.jwt_auth import get_refresh_view
 from dj_rest_auth.registration.views import RegisterView
 from dj_rest_auth.views import LoginView, PasswordResetView, LogoutView
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.tokens import TokenError
 
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 import logging
 
 from api.authentication.choices import Purpose
+from api.authentication.tokens import (
+    TeleHealthRefreshToken,
+    TeleHealthTokenRefreshSerializer,
+)
+from api.authentication.utilities.blacklist import blacklist_filter_stats
+from api.users.permissions import IsAdmin
+from api.users.models import User
 from api.utils.exception_handler import HandleExceptionAPIView
+from api.utils.throttling import TokenBucketThrottle
 from api.authentication.serializers import (
     TeleHealthLoginSerializer,
     TeleHealthRegisterSerializer,
@@ -57,6 +67,14 @@ class TeleHealthLoginView(HandleExceptionAPIView, LoginView):
 
     serializer_class = TeleHealthLoginSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "login"
+
+    def login(self):
+        super().login()
+        # Session login is off, so Django's user_logged_in handler no longer
+        # stamps last_login; do it with a single UPDATE.
+        User.objects.filter(pk=self.user.pk).update(last_login=timezone.now())
 
     def get_response(self):
         response = super().get_response()
@@ -82,6 +100,8 @@ class TeleHealthPasswordResetView(HandleExceptionAPIView, PasswordResetView):
 
     permission_classes = [AllowAny]
     serializer_class = RequestOTPSerializer
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "password_reset"
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -128,13 +148,32 @@ class TeleHealthLogoutView(APIView):
             return Response({"detail": "Refresh token is required."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            token = RefreshToken(refresh_token)
+            token = TeleHealthRefreshToken(refresh_token)
             token.blacklist()  # blacklist the token if blacklist app is enabled
         except TokenError as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({"detail": "Successfully logged out."}, status=status.HTTP_200_OK)
 
+class TeleHealthTokenRefreshView(get_refresh_view()):
+    """
+    Token refresh whose blacklist check goes through the bloom filter.
+    """
+
+    serializer_class = TeleHealthTokenRefreshSerializer
+
+
+class TokenBlacklistFilterMetricsView(HandleExceptionAPIView, APIView):
+    """
+    How often the blacklist filter let a refresh skip the database.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        return Response(blacklist_filter_stats(), status=status.HTTP_200_OK)
+
+
 # @method_decorator(csrf_exempt, name="dispatch")
 # class TeleHealthLogoutView(HandleExceptionAPIView, LogoutView):
 #     """
@@ -159,6 +198,8 @@ class TeleHealthLogoutView(APIView):
 class SendOTPView(HandleExceptionAPIView, APIView):
     permission_classes = [AllowAny]
     serializer_class = RequestOTPSerializer
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "send_otp"
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
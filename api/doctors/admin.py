@@ -1,5 +1,11 @@
 from django.contrib import admin
-from api.doctors.models import Doctor, Specialization, TimeSlot, LicenseInfo
+from api.doctors.models import (
+    Doctor,
+    Specialization,
+    TimeSlot,
+    LicenseInfo,
+    WeeklyUtilizationRollup,
+)
 
 
 @admin.register(LicenseInfo)
@@ -51,3 +57,13 @@ class DoctorAdmin(admin.ModelAdmin):
 
     search_fields = ("get_name", "get_email")
     ordering = ("-created_at",)
+
+
+@admin.register(WeeklyUtilizationRollup)
+class WeeklyUtilizationRollupAdmin(admin.ModelAdmin):
+    list_display = ["id", "week", "doctor", "offered_slots", "booked_slots"]
+    readonly_fields = ["id", "uuid", "created_at", "updated_at"]
+
+    list_filter = ["week"]
+    raw_id_fields = ["doctor"]
+    ordering = ("-week",)
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from api.doctors.models import TimeSlot
+from api.doctors.utilization import rebuild_utilization_rollups, week_of
+from api.utils.rollups import parse_date_option, rebuild_in_chunks
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the weekly doctor utilization rollups from the time slots, "
+        "a few weeks per transaction. Without --since/--until every week "
+        "that has slots is processed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since", help="A day in the first week to rebuild (YYYY-MM-DD)"
+        )
+        parser.add_argument(
+            "--until", help="A day in the last week to rebuild (YYYY-MM-DD)"
+        )
+        parser.add_argument(
+            "--chunk-weeks",
+            type=int,
+            default=4,
+            help="Weeks recomputed per transaction",
+        )
+
+    def parse_week(self, value, option):
+        day = parse_date_option(value, option)
+        return day - timedelta(days=day.weekday())
+
+    def handle(self, *args, **options):
+        if options["chunk_weeks"] < 1:
+            raise CommandError("--chunk-weeks must be at least 1")
+
+        bounds = TimeSlot.objects.aggregate(
+            first=Min("start_time"), last=Max("start_time")
+        )
+        since = (
+            self.parse_week(options["since"], "--since")
+            if options["since"]
+            else week_of(bounds["first"] or timezone.now())
+        )
+        until = (
+            self.parse_week(options["until"], "--until")
+            if options["until"]
+            else week_of(bounds["last"] or timezone.now())
+        )
+        if since > until:
+            raise CommandError("The range is empty")
+
+        rows = 0
+        for start, end, written in rebuild_in_chunks(
+            rebuild_utilization_rollups,
+            since,
+            until,
+            timedelta(weeks=1),
+            options["chunk_weeks"],
+        ):
+            rows += written
+            self.stdout.write(f"Weeks of {start} to {end}: {written} rollups")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {rows} rollups for the weeks of {since} to {until}"
+            )
+        )
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:38
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeeklyUtilizationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('week', models.DateField()),
+                ('offered_slots', models.IntegerField(default=0)),
+                ('booked_slots', models.IntegerField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='utilization_rollups', to='doctors.doctor')),
+            ],
+            options={
+                'verbose_name': 'Weekly Utilization Rollup',
+                'verbose_name_plural': 'Weekly Utilization Rollups',
+                'db_table': 'weekly_utilization_rollup',
+                'constraints': [models.UniqueConstraint(fields=('week', 'doctor'), name='weekly_utilization_rollup_unique')],
+            },
+        ),
+    ]
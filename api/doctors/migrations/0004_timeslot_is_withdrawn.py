@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0003_weekly_utilization_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeslot',
+            name='is_withdrawn',
+            field=models.BooleanField(db_default=False),
+        ),
+    ]
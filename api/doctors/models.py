@@ -102,6 +102,9 @@ class TimeSlot(BaseModel):
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
     is_booked = models.BooleanField(db_default=False)
+    # Taken off sale by a bulk cancellation; stays booked and is never
+    # released, and is no longer counted as offered.
+    is_withdrawn = models.BooleanField(db_default=False)
 
     def __str__(self):
         return (
@@ -139,3 +142,32 @@ class LicenseInfo(BaseModel):
         indexes = [
             models.Index(fields=["doctor"]),
         ]
+
+
+class WeeklyUtilizationRollup(BaseModel):
+    """
+    Offered and booked time slots of one doctor in one week (starting on
+    Monday), withdrawn slots excluded. Kept current by
+    api.doctors.utilization as slots are created, deleted, booked, released
+    and withdrawn, so utilization reports never scan time_slot.
+    """
+
+    week = models.DateField()
+    doctor = models.ForeignKey(
+        Doctor, on_delete=models.CASCADE, related_name="utilization_rollups"
+    )
+    offered_slots = models.IntegerField(default=0)
+    booked_slots = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.doctor_id} - week of {self.week}"
+
+    class Meta:
+        verbose_name = "Weekly Utilization Rollup"
+        verbose_name_plural = "Weekly Utilization Rollups"
+        db_table = "weekly_utilization_rollup"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["week", "doctor"], name="weekly_utilization_rollup_unique"
+            ),
+        ]
@@ -8,18 +8,18 @@ class IsDoctor(BasePermission):
 
     Global check: User must be authenticated and have a doctor profile.
     Object-level check: only access objects owned by the same patient.
+    For token users both are answered from the role and profile claims.
     """
 
     def has_permission(self, request, view):
         user = request.user
-        return user.is_authenticated and hasattr(user, "doctor")
+        return user.is_authenticated and getattr(user, "doctor", None) is not None
 
     def has_object_permission(self, request, view, obj):
         user = request.user
 
-        try:
-            doctor = user.doctor
-        except Doctor.DoesNotExist:
+        doctor = getattr(user, "doctor", None)
+        if doctor is None:
             return False
 
         if hasattr(obj, "doctor"):
@@ -29,6 +29,6 @@ class IsDoctor(BasePermission):
             return obj == doctor
 
         if hasattr(obj, "user"):
-            return obj.user == user
+            return obj.user_id == user.id
 
         return False
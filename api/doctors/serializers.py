@@ -1,5 +1,6 @@
 import logging
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from django.db import transaction
@@ -38,6 +39,11 @@ from api.doctors.validators import (
 )
 from api.patients.utils.fields import LabelChoiceField
 from api.doctors.utils.utils import get_django_weekday_numbers
+from api.doctors.utilization import (
+    REPORT_GROUPS,
+    create_time_slots,
+    delete_time_slots,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -72,7 +78,7 @@ class TimeSlotSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data["doctor"] = self.context["request"].user.doctor
-        return super().create(validated_data)
+        return create_time_slots([TimeSlot(**validated_data)])[0]
 
 
 class TimeSlotCreateSerializer(serializers.Serializer):
@@ -94,7 +100,7 @@ class TimeSlotCreateSerializer(serializers.Serializer):
         validate_database_duplicates(slots_data, doctor)
         validate_database_overlaps(slots_data, doctor)
 
-        return super().validate(self, attrs)
+        return super().validate(attrs)
 
     @transaction.atomic
     def create(self, validated_data):
@@ -104,7 +110,7 @@ class TimeSlotCreateSerializer(serializers.Serializer):
 
             slots = [TimeSlot(doctor=doctor, **slot) for slot in slots_data]
 
-            created_slots = TimeSlot.objects.bulk_create(slots, batch_size=10)
+            created_slots = create_time_slots(slots, batch_size=10)
             count = len(created_slots)
 
             return count
@@ -134,9 +140,9 @@ class TimeSlotDeleteSerializer(serializers.Serializer):
             uuids = self.validated_data["time_slot_uuids"]
             doctor = self.context["request"].user.doctor
 
-            deleted_count, _ = TimeSlot.objects.filter(
-                uuid__in=uuids, doctor=doctor, is_booked=False
-            ).delete()
+            deleted_count = delete_time_slots(
+                TimeSlot.objects.filter(uuid__in=uuids, doctor=doctor, is_booked=False)
+            )
 
             return deleted_count
         except Exception as e:
@@ -373,8 +379,7 @@ class BulkTimeSlotCreateSerializer(serializers.Serializer):
                         current_slot_start = current_slot_end
 
             if timeslot_objects:
-                created_slots = TimeSlot.objects.bulk_create(timeslot_objects,
-                                                             batch_size=200)
+                created_slots = create_time_slots(timeslot_objects, batch_size=200)
                 return {
                     "created_count": len(created_slots),
                     "total_months": end_month - start_month,
@@ -468,7 +473,7 @@ class BulkTimeSlotDeleteSerializer(serializers.Serializer):
                 "uuid", "start_time", "end_time", "is_booked"
             )
 
-            deleted_count, _ = unbooked_slots.delete()
+            deleted_count = delete_time_slots(unbooked_slots)
 
             return {
                 "deleted_count": deleted_count,
@@ -482,3 +487,42 @@ class BulkTimeSlotDeleteSerializer(serializers.Serializer):
         except Exception as e:
             logger.exception("Unexpected error")
             raise serializers.ValidationError("Error deleting timeslots")
+
+
+class UtilizationReportSerializer(serializers.Serializer):
+    """
+    Query parameters of the utilization report: an inclusive range of dates,
+    widened to whole weeks, optional doctor, state and service filters, and
+    what to group by.
+    """
+
+    since = serializers.DateField()
+    until = serializers.DateField()
+    doctor_uuid = serializers.UUIDField(required=False)
+    state = LabelChoiceField(choices=StateChoices.choices, required=False)
+    service = LabelChoiceField(choices=Services.choices, required=False)
+    # Repeat group_by to group by several keys; without it, by week and doctor.
+    group_by = serializers.MultipleChoiceField(
+        choices=REPORT_GROUPS, required=False
+    )
+
+    def validate(self, attrs):
+        if attrs["until"] < attrs["since"]:
+            raise serializers.ValidationError("until must not be before since.")
+        attrs["since"] -= timedelta(days=attrs["since"].weekday())
+        attrs["until"] -= timedelta(days=attrs["until"].weekday())
+        weeks = (attrs["until"] - attrs["since"]).days // 7 + 1
+        if weeks > settings.UTILIZATION_REPORT_MAX_WEEKS:
+            raise serializers.ValidationError(
+                f"The range can be at most {settings.UTILIZATION_REPORT_MAX_WEEKS} "
+                f"weeks."
+            )
+
+        attrs["doctor"] = None
+        if "doctor_uuid" in attrs:
+            attrs["doctor"] = Doctor.objects.filter(uuid=attrs["doctor_uuid"]).first()
+            if attrs["doctor"] is None:
+                raise serializers.ValidationError({"doctor_uuid": "Doctor not found."})
+        group_by = attrs.get("group_by") or {"week", "doctor"}
+        attrs["group_by"] = [key for key in REPORT_GROUPS if key in group_by]
+        return attrs
@@ -11,6 +11,7 @@ from api.doctors.views import (
     BulkTimeSlotCreateAPIView,
     BulkTimeSlotDeleteAPIView,
     AvailableDoctorDatesAPIView,
+    DoctorUtilizationAPIView,
 )
 
 urlpatterns = [
@@ -48,6 +49,11 @@ urlpatterns = [
         "available/dates",
         AvailableDoctorDatesAPIView.as_view(),
         name="available_doctor_dates",
-    )
+    ),
+    path(
+        "utilization/",
+        DoctorUtilizationAPIView.as_view(),
+        name="doctor-utilization",
+    ),
 
 ]
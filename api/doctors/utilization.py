@@ -0,0 +1,288 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from api.doctors.choices import Services, StateChoices
+from api.doctors.models import (
+    Doctor,
+    DoctorService,
+    LicenseInfo,
+    TimeSlot,
+    WeeklyUtilizationRollup,
+)
+from api.utils.rollups import add_to_rollups
+
+# Slots are created, deleted, booked, released and withdrawn only through the
+# functions below. Each changes the slots and, in the same transaction, adds
+# the difference in offered and booked slots to the WeeklyUtilizationRollup
+# of the doctor and the week (Monday to Sunday) each slot starts in.
+# Withdrawn slots count as neither.
+
+ROLLUP_KEY = ("week", "doctor_id")
+
+
+def week_of(start_time):
+    day = timezone.localdate(start_time)
+    return day - timedelta(days=day.weekday())
+
+
+def _new_deltas():
+    return defaultdict(lambda: {"offered_slots": 0, "booked_slots": 0})
+
+
+def create_time_slots(slots, batch_size=None):
+    """
+    bulk_create `slots` and count them as offered (and booked, if they are).
+    """
+    with transaction.atomic():
+        created = TimeSlot.objects.bulk_create(slots, batch_size=batch_size)
+        deltas = _new_deltas()
+        for slot in created:
+            delta = deltas[(week_of(slot.start_time), slot.doctor_id)]
+            delta["offered_slots"] += 1
+            # An unset is_booked is the database default, False.
+            if slot.is_booked is True:
+                delta["booked_slots"] += 1
+        add_to_rollups(WeeklyUtilizationRollup, ROLLUP_KEY, deltas)
+    return created
+
+
+def _locked_slots(queryset):
+    return list(
+        queryset.select_for_update(of=("self",)).values(
+            "pk", "doctor_id", "start_time", "is_booked", "is_withdrawn"
+        )
+    )
+
+
+def delete_time_slots(queryset):
+    """
+    Delete the slots in `queryset` and stop counting them. Returns the
+    number of slots deleted.
+    """
+    with transaction.atomic():
+        rows = _locked_slots(queryset)
+        if not rows:
+            return 0
+        TimeSlot.objects.filter(pk__in=[row["pk"] for row in rows]).delete()
+
+        deltas = _new_deltas()
+        for row in rows:
+            if row["is_withdrawn"]:
+                continue
+            delta = deltas[(week_of(row["start_time"]), row["doctor_id"])]
+            delta["offered_slots"] -= 1
+            if row["is_booked"]:
+                delta["booked_slots"] -= 1
+        add_to_rollups(WeeklyUtilizationRollup, ROLLUP_KEY, deltas)
+    return len(rows)
+
+
+def set_slots_booked(queryset, is_booked):
+    """
+    Book (or release) the slots in `queryset`. Withdrawn slots are left as
+    they are. Returns the number of slots whose state changed.
+    """
+    with transaction.atomic():
+        rows = [
+            row
+            for row in _locked_slots(queryset)
+            if row["is_booked"] != is_booked and not row["is_withdrawn"]
+        ]
+        if not rows:
+            return 0
+        TimeSlot.objects.filter(pk__in=[row["pk"] for row in rows]).update(
+            is_booked=is_booked
+        )
+
+        deltas = _new_deltas()
+        for row in rows:
+            delta = deltas[(week_of(row["start_time"]), row["doctor_id"])]
+            delta["booked_slots"] += 1 if is_booked else -1
+        add_to_rollups(WeeklyUtilizationRollup, ROLLUP_KEY, deltas)
+    return len(rows)
+
+
+def withdraw_time_slots(queryset):
+    """
+    Take the slots in `queryset` off sale for good: they stay booked, are
+    never released and stop counting as offered. Returns the number of
+    slots withdrawn.
+    """
+    with transaction.atomic():
+        rows = [row for row in _locked_slots(queryset) if not row["is_withdrawn"]]
+        if not rows:
+            return 0
+        TimeSlot.objects.filter(pk__in=[row["pk"] for row in rows]).update(
+            is_booked=True, is_withdrawn=True
+        )
+
+        deltas = _new_deltas()
+        for row in rows:
+            delta = deltas[(week_of(row["start_time"]), row["doctor_id"])]
+            delta["offered_slots"] -= 1
+            if row["is_booked"]:
+                delta["booked_slots"] -= 1
+        add_to_rollups(WeeklyUtilizationRollup, ROLLUP_KEY, deltas)
+    return len(rows)
+
+
+def rebuild_utilization_rollups(since, until):
+    """
+    Recompute the rollups of the weeks starting on the Mondays from `since`
+    to `until`, inclusive, from the slots themselves, in one transaction.
+    Returns the number of rollup rows written.
+
+    A slot booked, released, withdrawn or deleted during the rebuild waits
+    for its lock, so the recount either already includes that change or
+    the change's own delta lands on the fresh rollup row afterwards.
+    """
+    start = timezone.make_aware(datetime.combine(since, time.min))
+    end = timezone.make_aware(datetime.combine(until + timedelta(days=7), time.min))
+    slots = TimeSlot.objects.filter(start_time__gte=start, start_time__lt=end)
+
+    with transaction.atomic():
+        list(slots.select_for_update().values_list("pk", flat=True))
+        WeeklyUtilizationRollup.objects.filter(
+            week__gte=since, week__lte=until
+        ).delete()
+
+        groups = (
+            slots.filter(is_withdrawn=False)
+            .values(
+                "doctor_id",
+                week=Trunc("start_time", "week", output_field=DateField()),
+            )
+            .annotate(
+                offered=Count("pk"), booked=Count("pk", filter=Q(is_booked=True))
+            )
+            .order_by()
+        )
+        rollups = WeeklyUtilizationRollup.objects.bulk_create(
+            (
+                WeeklyUtilizationRollup(
+                    week=group["week"],
+                    doctor_id=group["doctor_id"],
+                    offered_slots=group["offered"],
+                    booked_slots=group["booked"],
+                )
+                for group in groups
+            ),
+            batch_size=1000,
+        )
+    return len(rollups)
+
+
+REPORT_GROUPS = ["week", "doctor", "state", "service"]
+
+
+def _label(choices, value):
+    return None if value is None else choices(value).label
+
+
+def _utilization(offered, booked):
+    return round(booked / offered, 4) if offered else None
+
+
+def utilization_report(since, until, group_by, doctor=None, state=None, service=None):
+    """
+    Offered and booked slots of the weeks starting from `since` to `until`,
+    inclusive, read from the rollups. Rows are grouped by the `group_by` keys
+    (see REPORT_GROUPS). A doctor licensed in several states, or offering
+    several services, counts towards each of them.
+    """
+    rollups = WeeklyUtilizationRollup.objects.filter(week__gte=since, week__lte=until)
+    if doctor is not None:
+        rollups = rollups.filter(doctor=doctor)
+    if state is not None:
+        rollups = rollups.filter(
+            doctor__in=LicenseInfo.objects.filter(state=state).values("doctor_id")
+        )
+    if service is not None:
+        rollups = rollups.filter(
+            doctor__in=DoctorService.objects.filter(service__name=service).values(
+                "doctor_id"
+            )
+        )
+
+    per_doctor = bool({"doctor", "state", "service"} & set(group_by))
+    columns = (["week"] if "week" in group_by else []) + (
+        ["doctor_id"] if per_doctor else []
+    )
+    groups = list(
+        rollups.values(*columns)
+        .annotate(offered=Sum("offered_slots"), booked=Sum("booked_slots"))
+        .order_by(*columns)
+    )
+
+    doctor_ids = {group["doctor_id"] for group in groups} if per_doctor else set()
+    doctors, states, services = {}, defaultdict(set), defaultdict(set)
+    if "doctor" in group_by:
+        doctors = {
+            row["id"]: row
+            for row in Doctor.objects.filter(id__in=doctor_ids).values(
+                "id", "uuid", "user__first_name", "user__last_name"
+            )
+        }
+    if "state" in group_by:
+        for doctor_id, value in LicenseInfo.objects.filter(
+            doctor_id__in=doctor_ids
+        ).values_list("doctor_id", "state"):
+            if state is None or value == state:
+                states[doctor_id].add(value)
+    if "service" in group_by:
+        for doctor_id, value in DoctorService.objects.filter(
+            doctor_id__in=doctor_ids
+        ).values_list("doctor_id", "service__name"):
+            if service is None or value == service:
+                services[doctor_id].add(value)
+
+    totals = defaultdict(lambda: [0, 0])
+    for group in groups:
+        key = {}
+        if "week" in group_by:
+            key["week"] = group["week"]
+        if "doctor" in group_by:
+            row = doctors[group["doctor_id"]]
+            key["doctor_uuid"] = row["uuid"]
+            key["doctor_name"] = (
+                f"{row['user__first_name']} {row['user__last_name']}".strip()
+            )
+        # Doctors with no licence or service are reported under None.
+        for state_value in sorted(states[group.get("doctor_id")]) or [None]:
+            for service_value in sorted(services[group.get("doctor_id")]) or [None]:
+                row_key = dict(key)
+                if "state" in group_by:
+                    row_key["state"] = _label(StateChoices, state_value)
+                if "service" in group_by:
+                    row_key["service"] = _label(Services, service_value)
+                total = totals[tuple(row_key.items())]
+                total[0] += group["offered"]
+                total[1] += group["booked"]
+
+    overall = rollups.aggregate(
+        offered=Sum("offered_slots"), booked=Sum("booked_slots")
+    )
+    offered, booked = overall["offered"] or 0, overall["booked"] or 0
+    return {
+        "since": since,
+        "until": until,
+        "rows": [
+            {
+                **dict(key),
+                "offered_slots": offered_slots,
+                "booked_slots": booked_slots,
+                "utilization": _utilization(offered_slots, booked_slots),
+            }
+            for key, (offered_slots, booked_slots) in totals.items()
+        ],
+        "totals": {
+            "offered_slots": offered,
+            "booked_slots": booked,
+            "utilization": _utilization(offered, booked),
+        },
+    }
@@ -20,10 +20,13 @@ from api.doctors.serializers import (
     LicenseInfoSerializer,
     BulkTimeSlotCreateSerializer,
     BulkTimeSlotDeleteSerializer,
+    UtilizationReportSerializer,
 )
 from api.doctors.filters import DoctorFilter, TimeSlotFilter
 from api.doctors.permissions import IsDoctor
+from api.doctors.utilization import utilization_report
 from api.patients.permissions import IsPatient
+from api.users.permissions import IsAdmin
 from api.doctors.models import Specialization, TimeSlot, LicenseInfo, Doctor
 from api.utils.exception_handler import HandleExceptionAPIView
 
@@ -247,3 +250,27 @@ class BulkTimeSlotCreateAPIView(HandleExceptionAPIView, APIView):
         response = serializer.save()
 
         return Response(response, status=status.HTTP_201_CREATED)
+
+
+class DoctorUtilizationAPIView(HandleExceptionAPIView, APIView):
+    """
+    Offered vs. booked slots per week, doctor, state and service, read from
+    the weekly utilization rollups.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        serializer = UtilizationReportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        report = utilization_report(
+            data["since"],
+            data["until"],
+            data["group_by"],
+            doctor=data["doctor"],
+            state=data.get("state"),
+            service=data.get("service"),
+        )
+        return Response(report, status=status.HTTP_200_OK)
@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import IdempotencyKey
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ("key", "user", "response_status", "created_at", "expires_at")
+    search_fields = ("key", "user__email")
+    list_filter = ("response_status", "created_at")
+    raw_id_fields = ("user",)
+    readonly_fields = ("request_hash", "response_body")
@@ -0,0 +1,125 @@
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.response import Response
+
+from api.idempotency.models import IdempotencyKey
+from api.utils.exceptions import IdempotencyKeyInUse, IdempotencyKeyReused
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+POLL_SECONDS = 0.1
+
+
+class IdempotentReplay(Exception):
+    """
+    Carries a stored response out of `initial`, skipping the handler.
+    """
+
+    def __init__(self, response):
+        self.response = response
+
+
+def request_hash(request):
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.get_full_path()}\n".encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def claim_key(user, key, fingerprint):
+    """
+    Return the IdempotencyKey for (user, key) once it is safe to act on:
+    newly claimed by this request, or completed by an earlier one. While
+    another request holds it, wait up to IDEMPOTENCY_WAIT_SECONDS.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        now = timezone.now()
+        record, created = IdempotencyKey.objects.get_or_create(
+            user=user,
+            key=key,
+            defaults={
+                "request_hash": fingerprint,
+                "locked_at": now,
+                "expires_at": now
+                + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+            },
+        )
+        if created:
+            return record
+
+        if record.expires_at <= now:
+            IdempotencyKey.objects.filter(id=record.id).delete()
+            continue
+        if record.request_hash != fingerprint:
+            raise IdempotencyKeyReused()
+        if record.response_status is not None:
+            return record
+
+        # The request holding the key may have died; take over if so.
+        stale = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS)
+        if record.locked_at < stale and IdempotencyKey.objects.filter(
+            id=record.id, response_status=None, locked_at=record.locked_at
+        ).update(locked_at=now):
+            record.locked_at = now
+            return record
+
+        if time.monotonic() >= deadline:
+            raise IdempotencyKeyInUse()
+        time.sleep(POLL_SECONDS)
+
+
+class IdempotentViewMixin:
+    """
+    Lets clients retry a POST safely by sending an Idempotency-Key header.
+
+    The first request with a key runs normally and its response is stored
+    for IDEMPOTENCY_KEY_TTL_SECONDS. A retry gets that response back,
+    marked with Idempotent-Replayed, without running the view again. A
+    retry that arrives while the first request is still running waits
+    for it. Server errors are not stored, so they can be retried.
+
+    List it before HandleExceptionAPIView in the bases.
+    """
+
+    idempotent_methods = ("POST",)
+
+    def initial(self, request, *args, **kwargs):
+        self.idempotency_record = None
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or request.method not in self.idempotent_methods:
+            return super().initial(request, *args, **kwargs)
+
+        # Hash the body before anything parses it and consumes the stream.
+        fingerprint = request_hash(request)
+        super().initial(request, *args, **kwargs)
+
+        record = claim_key(request.user, key[:255], fingerprint)
+        if record.response_status is not None:
+            response = Response(record.response_body, status=record.response_status)
+            response[REPLAYED_HEADER] = "true"
+            raise IdempotentReplay(response)
+        self.idempotency_record = record
+
+    def handle_exception(self, exc):
+        if isinstance(exc, IdempotentReplay):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        record = getattr(self, "idempotency_record", None)
+        if record is not None:
+            self.idempotency_record = None
+            if response.status_code >= 500 or not hasattr(response, "data"):
+                IdempotencyKey.objects.filter(id=record.id).delete()
+            else:
+                IdempotencyKey.objects.filter(id=record.id).update(
+                    response_status=response.status_code,
+                    response_body=response.data,
+                    locked_at=None,
+                )
+        return super().finalize_response(request, response, *args, **kwargs)
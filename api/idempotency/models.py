@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+from api.base_models import BaseModel
+
+
+class IdempotencyKey(BaseModel):
+    """
+    A client's Idempotency-Key and the response it produced. While the
+    first request is still running, response_status is null and locked_at
+    says since when.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="idempotency_keys",
+    )
+    key = models.CharField(max_length=255)
+    # Hash of method, path and body, so a key can't be reused for a
+    # different request.
+    request_hash = models.CharField(max_length=64)
+
+    locked_at = models.DateTimeField(null=True, blank=True)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = "idempotency_keys"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="idempotency_key_unique_per_user"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id}) - {self.response_status}"
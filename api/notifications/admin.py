@@ -0,0 +1,20 @@
+from django.contrib import admin
+
+from .models import OutboxEmail
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        "uuid",
+        "subject",
+        "priority",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "sent_at",
+        "created_at",
+    )
+    search_fields = ("uuid", "subject")
+    list_filter = ("status", "priority", "created_at")
+    readonly_fields = ("text_body", "html_body", "last_error")
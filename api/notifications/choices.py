@@ -0,0 +1,15 @@
+from django.db import models
+
+
+class EmailPriority(models.IntegerChoices):
+    # Lower values are sent first.
+    HIGH = 0, "High"
+    NORMAL = 1, "Normal"
+    LOW = 2, "Low"
+
+
+class EmailStatus(models.IntegerChoices):
+    PENDING = 1, "Pending"
+    SENDING = 2, "Sending"
+    SENT = 3, "Sent"
+    FAILED = 4, "Failed"
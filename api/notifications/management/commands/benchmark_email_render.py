@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+from api.services.email_templates import CompiledEmailTemplate
+from api.users.models import User
+
+SAMPLE_CONTEXT = {
+    "otp": "123456",
+    "expiry_minutes": 2,
+    "doctor_name": "Dr. Jane Smith",
+    "appointment_date": "2025-06-01",
+    "appointment_time": "10:30",
+    "payment_id": "pi_3Nbenchmark",
+    "amount_paid": "150.00",
+    "amount": "150.00",
+    "refund_amount": "75.00",
+    "original_amount": "150.00",
+    "failure_reason": "Card declined",
+}
+TEMPLATES = (
+    "otp_reset",
+    "welcome",
+    "appointment_confirmation",
+    "payment_failed",
+    "refund_success",
+    "refund_failed",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the per-message cost of rendering email templates with "
+        "render_to_string + strip_tags against the precompiled templates"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        context = {
+            **SAMPLE_CONTEXT,
+            "user": User(first_name="Benchmark", last_name="User"),
+        }
+
+        def render_per_send(name):
+            html = render_to_string(f"emails/{name}.html", context)
+            return html, strip_tags(html)
+
+        # Built directly: with DEBUG on, get_email_template rebuilds each time.
+        compiled = {name: CompiledEmailTemplate(name) for name in TEMPLATES}
+
+        def render_precompiled(name):
+            return compiled[name].render(context)
+
+        for name in TEMPLATES:
+            # Warm both paths so compilation is not counted.
+            render_per_send(name)
+            render_precompiled(name)
+
+            before = self.time(render_per_send, name, iterations)
+            after = self.time(render_precompiled, name, iterations)
+            self.stdout.write(
+                f"{name:<26} render_to_string + strip_tags {before:8.1f}µs   "
+                f"precompiled {after:8.1f}µs   {before / after:4.1f}x"
+            )
+
+    @staticmethod
+    def time(render, name, iterations):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            render(name)
+        return (time.perf_counter() - started) / iterations * 1_000_000
@@ -0,0 +1,62 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.notifications.choices import EmailStatus
+from api.notifications.models import OutboxEmail
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete sent and failed outbox emails older than the retention period "
+        "in small batches, so no batch holds locks for long"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches",
+        )
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=settings.EMAIL_OUTBOX_RETENTION_DAYS,
+            help="Keep emails for this many days after they were queued",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        cutoff = timezone.now() - timedelta(days=options["retention_days"])
+
+        started = time.monotonic()
+        removed = 0
+
+        while True:
+            ids = list(
+                OutboxEmail.objects.filter(
+                    status__in=[EmailStatus.SENT, EmailStatus.FAILED],
+                    created_at__lt=cutoff,
+                )
+                .order_by("created_at")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            deleted, _ = OutboxEmail.objects.filter(id__in=ids).delete()
+            removed += deleted
+
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Removed {removed} sent or failed outbox emails queued before "
+                f"{cutoff:%Y-%m-%d %H:%M:%S} in {time.monotonic() - started:.2f}s"
+            )
+        )
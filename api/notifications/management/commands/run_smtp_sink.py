@@ -0,0 +1,110 @@
+import os
+import socketserver
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """
+    Just enough SMTP to accept mail from Django's SMTP backend and keep it.
+    No TLS or authentication, so run with EMAIL_USE_TLS and EMAIL_USE_SSL
+    off and no EMAIL_HOST_USER.
+    """
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 telehealth-smtp-sink ready")
+        sender, recipients = None, []
+
+        for raw in self.rfile:
+            command = raw.decode(errors="replace").rstrip("\r\n")
+            verb = command[:4].upper()
+
+            if verb == "EHLO":
+                self.reply("250-telehealth-smtp-sink")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 telehealth-smtp-sink")
+            elif verb == "MAIL":
+                sender, recipients = command.split(":", 1)[1].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip())
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data_line in self.rfile:
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    # Undo dot-stuffing.
+                    lines.append(data_line[1:] if data_line[:2] == b".." else data_line)
+                self.server.store(sender, recipients, b"".join(lines))
+                self.reply("250 OK: queued")
+            elif verb in ("RSET", "NOOP"):
+                if verb == "RSET":
+                    sender, recipients = None, []
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPSinkServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, command, output_dir):
+        super().__init__(address, SMTPSinkHandler)
+        self.command = command
+        self.output_dir = output_dir
+        self.received = 0
+
+    def store(self, sender, recipients, message):
+        self.received += 1
+        self.command.stdout.write(
+            f"#{self.received} from {sender} to {', '.join(recipients)}, "
+            f"{len(message)} bytes"
+        )
+        if self.output_dir:
+            name = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{self.received}.eml"
+            with open(os.path.join(self.output_dir, name), "wb") as f:
+                f.write(message)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local SMTP server that accepts every message, for testing "
+        "email delivery without sending real mail"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=1025)
+        parser.add_argument(
+            "--output-dir", default=None, help="Save each message as a .eml file"
+        )
+
+    def handle(self, *args, **options):
+        if options["output_dir"]:
+            os.makedirs(options["output_dir"], exist_ok=True)
+
+        server = SMTPSinkServer(
+            (options["host"], options["port"]), self, options["output_dir"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"SMTP sink listening on {options['host']}:{options['port']}"
+            )
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
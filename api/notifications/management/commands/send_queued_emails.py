@@ -0,0 +1,67 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.notifications.utils.outbox import (
+    OutboxSender,
+    claim_batch,
+    release_stale_claims,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued outbox emails over a reused SMTP connection, most "
+        "urgent first, retrying failures with exponential backoff"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no email is due instead of waiting for more",
+        )
+
+    def handle(self, *args, **options):
+        sender = OutboxSender()
+        total_sent = total_failed = 0
+
+        try:
+            while True:
+                released = release_stale_claims()
+                if released:
+                    logger.warning(f"Requeued {released} emails from a dead worker")
+
+                emails = claim_batch(options["batch_size"])
+                if emails:
+                    sent, failed = sender.send_batch(emails)
+                    total_sent += sent
+                    total_failed += failed
+                    logger.info(f"Sent {sent} queued emails, {failed} failed")
+                    continue
+
+                if options["once"]:
+                    break
+                sender.close_if_idle()
+                time.sleep(options["poll_interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sender.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Sent {total_sent} emails, {total_failed} failed")
+        )
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:10
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('subject', models.CharField(max_length=255)),
+                ('from_email', models.CharField(max_length=255)),
+                ('recipients', models.JSONField()),
+                ('text_body', models.TextField()),
+                ('html_body', models.TextField(blank=True)),
+                ('attachments', models.JSONField(blank=True, default=list)),
+                ('priority', models.IntegerField(choices=[(0, 'High'), (1, 'Normal'), (2, 'Low')], default=1)),
+                ('status', models.IntegerField(choices=[(1, 'Pending'), (2, 'Sending'), (3, 'Sent'), (4, 'Failed')], default=1)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'db_table': 'email_outbox',
+                'indexes': [models.Index(condition=models.Q(('status', 1)), fields=['priority', 'next_attempt_at'], name='email_outbox_pending_idx'), models.Index(condition=models.Q(('status', 2)), fields=['claimed_at'], name='email_outbox_sending_idx')],
+            },
+        ),
+    ]
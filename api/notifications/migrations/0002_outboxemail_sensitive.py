@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:50
+
+from django.db import migrations, models
+
+OTP_SUBJECT = "One-Time Passcode - TeleHealth"
+PENDING, SENDING = 1, 2
+
+
+def flag_otp_emails(apps, schema_editor):
+    OutboxEmail = apps.get_model("notifications", "OutboxEmail")
+    otp_emails = OutboxEmail.objects.filter(subject=OTP_SUBJECT)
+    otp_emails.update(sensitive=True)
+    otp_emails.exclude(status__in=[PENDING, SENDING]).update(
+        text_body="", html_body=""
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxemail',
+            name='sensitive',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(flag_otp_emails, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-19 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_outboxemail_sensitive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='outboxemail',
+            index=models.Index(condition=models.Q(('status__in', [3, 4])), fields=['created_at'], name='email_outbox_done_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import models
+from django.utils import timezone
+
+from api.base_models import BaseModel
+from api.notifications.choices import EmailPriority, EmailStatus
+
+
+class OutboxEmail(BaseModel):
+    """
+    A rendered email waiting to be sent by the send_queued_emails worker.
+    Writing the row in the caller's transaction means the email goes out
+    if and only if that transaction commits.
+    """
+
+    subject = models.CharField(max_length=255)
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField()
+    text_body = models.TextField()
+    html_body = models.TextField(blank=True)
+    # [filename, base64 content, mimetype] triples
+    attachments = models.JSONField(default=list, blank=True)
+
+    priority = models.IntegerField(
+        choices=EmailPriority.choices, default=EmailPriority.NORMAL
+    )
+    status = models.IntegerField(
+        choices=EmailStatus.choices, default=EmailStatus.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    # The bodies hold a secret, such as an OTP, and are blanked as soon as
+    # the email is sent or given up on.
+    sensitive = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = "email_outbox"
+        indexes = [
+            # The worker's queue: due pending emails, most urgent first.
+            models.Index(
+                fields=["priority", "next_attempt_at"],
+                name="email_outbox_pending_idx",
+                condition=models.Q(status=EmailStatus.PENDING),
+            ),
+            models.Index(
+                fields=["claimed_at"],
+                name="email_outbox_sending_idx",
+                condition=models.Q(status=EmailStatus.SENDING),
+            ),
+            # prune_email_outbox: finished emails, oldest first.
+            models.Index(
+                fields=["created_at"],
+                name="email_outbox_done_idx",
+                condition=models.Q(status__in=[EmailStatus.SENT, EmailStatus.FAILED]),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)}"
@@ -0,0 +1,203 @@
+import base64
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.notifications.choices import EmailPriority, EmailStatus
+from api.notifications.models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(
+    subject,
+    recipients,
+    text_body,
+    html_body="",
+    from_email=None,
+    priority=EmailPriority.NORMAL,
+    attachments=None,
+    sensitive=False,
+):
+    """
+    Add a rendered email to the outbox. Call inside the transaction whose
+    outcome the email reports, so a rollback discards it too. The bodies of
+    `sensitive` emails are not kept once they are sent or given up on.
+    """
+    return OutboxEmail.objects.create(
+        subject=subject,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+        text_body=text_body,
+        html_body=html_body,
+        priority=priority,
+        sensitive=sensitive,
+        attachments=[
+            [
+                filename,
+                base64.b64encode(
+                    content.encode() if isinstance(content, str) else content
+                ).decode(),
+                mimetype,
+            ]
+            for filename, content, mimetype in attachments or []
+        ],
+    )
+
+
+def enqueue_emails(emails):
+    """
+    Add several rendered emails to the outbox with one INSERT. `emails` are
+    dicts of enqueue_email's arguments, without attachments.
+    """
+    return OutboxEmail.objects.bulk_create(
+        OutboxEmail(
+            subject=email["subject"],
+            from_email=email.get("from_email") or settings.DEFAULT_FROM_EMAIL,
+            recipients=list(email["recipients"]),
+            text_body=email["text_body"],
+            html_body=email.get("html_body", ""),
+            priority=email.get("priority", EmailPriority.NORMAL),
+        )
+        for email in emails
+    )
+
+
+def build_message(outbox_email, connection=None):
+    message = EmailMultiAlternatives(
+        subject=outbox_email.subject,
+        body=outbox_email.text_body,
+        from_email=outbox_email.from_email,
+        to=outbox_email.recipients,
+        connection=connection,
+    )
+    if outbox_email.html_body:
+        message.attach_alternative(outbox_email.html_body, "text/html")
+    for filename, content, mimetype in outbox_email.attachments:
+        message.attach(filename, base64.b64decode(content), mimetype)
+    return message
+
+
+def claim_batch(batch_size):
+    """
+    Mark up to `batch_size` due emails as SENDING and return them, most
+    urgent first. SKIP LOCKED lets several workers claim side by side.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailStatus.PENDING, next_attempt_at__lte=now)
+            .order_by("priority", "next_attempt_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        OutboxEmail.objects.filter(id__in=ids).update(
+            status=EmailStatus.SENDING, claimed_at=now
+        )
+    return list(
+        OutboxEmail.objects.filter(id__in=ids).order_by("priority", "next_attempt_at")
+    )
+
+
+def release_stale_claims():
+    """
+    Requeue emails whose worker died mid-batch. Such an email may already
+    have been delivered, so delivery is at least once.
+    """
+    cutoff = timezone.now() - timedelta(
+        seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS
+    )
+    return OutboxEmail.objects.filter(
+        status=EmailStatus.SENDING, claimed_at__lt=cutoff
+    ).update(status=EmailStatus.PENDING, claimed_at=None)
+
+
+def retry_delay(attempts):
+    return min(
+        settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS,
+        settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+    )
+
+
+class OutboxSender:
+    """
+    Sends claimed emails over one SMTP connection that stays open between
+    batches and is closed after EMAIL_OUTBOX_CONNECTION_IDLE_SECONDS idle.
+    """
+
+    def __init__(self):
+        self.connection = None
+        self.last_used = 0.0
+
+    def get_connection(self):
+        if self.connection is None:
+            self.connection = get_connection(fail_silently=False)
+            self.connection.open()
+        self.last_used = time.monotonic()
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                logger.warning("Error closing SMTP connection", exc_info=True)
+            self.connection = None
+
+    def close_if_idle(self):
+        idle = time.monotonic() - self.last_used
+        if self.connection and idle > settings.EMAIL_OUTBOX_CONNECTION_IDLE_SECONDS:
+            self.close()
+
+    def send_batch(self, emails):
+        """
+        Send claimed emails and record each outcome. Returns (sent, failed).
+        """
+        sent_ids = []
+        failed = 0
+
+        for email in emails:
+            try:
+                self.get_connection().send_messages([build_message(email)])
+                sent_ids.append(email.id)
+            except Exception as e:
+                logger.warning(f"Failed to send outbox email {email.uuid}: {e}")
+                # The connection may be unusable; open a fresh one next time.
+                self.close()
+                self.mark_failed(email, e)
+                failed += 1
+
+        OutboxEmail.objects.filter(id__in=sent_ids).update(
+            status=EmailStatus.SENT,
+            sent_at=timezone.now(),
+            claimed_at=None,
+            attempts=F("attempts") + 1,
+        )
+        OutboxEmail.objects.filter(id__in=sent_ids, sensitive=True).update(
+            text_body="", html_body=""
+        )
+        return len(sent_ids), failed
+
+    def mark_failed(self, email, error):
+        attempts = email.attempts + 1
+        if attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            status = EmailStatus.FAILED
+            logger.error(f"Giving up on outbox email {email.uuid} after {attempts}")
+        else:
+            status = EmailStatus.PENDING
+
+        OutboxEmail.objects.filter(id=email.id).update(
+            status=status,
+            attempts=attempts,
+            claimed_at=None,
+            last_error=str(error)[:2000],
+            next_attempt_at=timezone.now() + timedelta(seconds=retry_delay(attempts)),
+        )
+        if status == EmailStatus.FAILED and email.sensitive:
+            OutboxEmail.objects.filter(id=email.id).update(text_body="", html_body="")
@@ -3,6 +3,7 @@ from django.contrib import admin
 from api.patients.models import (
     Patient,
     PatientMedicalRecord,
+    MedicalTerm,
 )
 
 
@@ -23,3 +24,11 @@ class PatientAdmin(admin.ModelAdmin):
 
 
 admin.site.register(PatientMedicalRecord)
+
+
+@admin.register(MedicalTerm)
+class MedicalTermAdmin(admin.ModelAdmin):
+    list_display = ["name", "category", "is_active"]
+    list_filter = ["category", "is_active"]
+    search_fields = ["name"]
+    readonly_fields = ["normalized_name", "created_at", "updated_at"]
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PatientsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api.patients"
+
+    def ready(self):
+        import api.patients.signals  # noqa: F401
@@ -36,3 +36,20 @@ class IsIodineAllergic(models.TextChoices):
 class CareProviderType(models.TextChoices):
     PRIMARY_PHYSICIAN = "primary_physician", "Primary Physician"
     PHARMACIST = "pharmacist", "Pharmacist"
+
+
+class MedicalRecordSection(models.TextChoices):
+    IODINE_ALLERGY = "iodine_allergy", "Iodine Allergy"
+    ALLERGIES = "allergies", "Allergies"
+    MEDICATIONS = "medications", "Medications"
+    MEDICAL_HISTORIES = "medical_histories", "Medical Histories"
+    SURGICAL_HISTORIES = "surgical_histories", "Surgical Histories"
+    CANCER_HISTORY = "cancer_history", "Cancer History"
+    ADDICTION_HISTORY = "addiction_history", "Addiction History"
+    CARE_PROVIDERS = "care_providers", "Care Providers"
+
+
+class TermCategory(models.TextChoices):
+    ALLERGY = "allergy", "Allergy"
+    MEDICATION = "medication", "Medication"
+    CANCER_TYPE = "cancer_type", "Cancer Type"
@@ -0,0 +1,105 @@
+import csv
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.patients.utils.export import (
+    RENDERERS,
+    iter_deidentified_records,
+    render_csv,
+)
+
+
+def read_last_exported_id(path, file_format):
+    """
+    Return the id of the last complete row in an earlier export, or 0.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        tail = b""
+        # Read backwards until the tail holds one complete line.
+        while position > 0 and tail.rstrip(b"\n").count(b"\n") < 1:
+            step = min(position, 64 * 1024)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+
+    lines = tail.decode().rstrip("\n").split("\n")
+    last_line = lines[-1] if lines else ""
+    if not last_line:
+        return 0
+
+    if file_format == "jsonl":
+        return json.loads(last_line)["id"]
+
+    value = next(csv.reader([last_line]))[0]
+    return int(value) if value.isdigit() else 0
+
+
+class Command(BaseCommand):
+    help = "Stream de-identified medical records and appointments as JSONL or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format", choices=sorted(RENDERERS), default="jsonl", dest="file_format"
+        )
+        parser.add_argument(
+            "--output", help="File to write to; defaults to stdout", default=None
+        )
+        parser.add_argument(
+            "--after-id",
+            type=int,
+            default=0,
+            help="Only export records with a greater id",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Append to --output, continuing after its last exported id",
+        )
+        parser.add_argument("--chunk-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        file_format = options["file_format"]
+        path = options["output"]
+        after_id = options["after_id"]
+        resuming = options["resume"] and path and os.path.exists(path)
+
+        if options["resume"] and not path:
+            raise CommandError("--resume requires --output.")
+
+        if resuming:
+            after_id = max(after_id, read_last_exported_id(path, file_format))
+
+        exported = 0
+
+        def counted(records):
+            nonlocal exported
+            for record in records:
+                exported += 1
+                yield record
+
+        records = counted(iter_deidentified_records(after_id, options["chunk_size"]))
+        if file_format == "csv":
+            lines = render_csv(records, header=not resuming)
+        else:
+            lines = RENDERERS[file_format](records)
+
+        started = time.monotonic()
+        out = open(path, "a" if resuming else "w", newline="") if path else sys.stdout
+        try:
+            out.writelines(lines)
+        finally:
+            if path:
+                out.close()
+
+        self.stderr.write(
+            self.style.SUCCESS(
+                f"Exported {exported} records after id {after_id} "
+                f"in {time.monotonic() - started:.1f}s"
+            )
+        )
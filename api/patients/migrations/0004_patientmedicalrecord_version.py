@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0003_remove_patientmedicalrecord_appointment_uuid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patientmedicalrecord',
+            name='version',
+            field=models.PositiveIntegerField(default=1, help_text="Bumped on every section write; used for the record's ETag."),
+        ),
+    ]
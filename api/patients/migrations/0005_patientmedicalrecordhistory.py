@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-19 03:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0004_patientmedicalrecord_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientMedicalRecordHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(choices=[('iodine_allergy', 'Iodine Allergy'), ('allergies', 'Allergies'), ('medications', 'Medications'), ('medical_histories', 'Medical Histories'), ('surgical_histories', 'Surgical Histories'), ('cancer_history', 'Cancer History'), ('addiction_history', 'Addiction History'), ('care_providers', 'Care Providers')], max_length=32)),
+                ('sequence', models.PositiveIntegerField(help_text="Position of this change within the section's history")),
+                ('version', models.PositiveIntegerField(help_text='Record version produced by this change')),
+                ('diff', models.JSONField()),
+                ('base', models.JSONField(blank=True, help_text='Section value before this change; set on keyframes only', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history', to='patients.patientmedicalrecord')),
+            ],
+            options={
+                'verbose_name': 'Patient Medical Record History',
+                'verbose_name_plural': 'Patient Medical Record History',
+                'db_table': 'patient_medical_record_history',
+                'indexes': [models.Index(fields=['record', 'created_at'], name='patient_med_record__509673_idx')],
+                'constraints': [models.UniqueConstraint(fields=('record', 'section', 'sequence'), name='unique_medical_record_history_sequence')],
+            },
+        ),
+    ]
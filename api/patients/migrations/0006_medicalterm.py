@@ -0,0 +1,52 @@
+# Generated by Django 5.1.7 on 2026-10-19 03:48
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0005_patientmedicalrecordhistory'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AlterField(
+            model_name='patientmedicalrecord',
+            name='allergies',
+            field=models.JSONField(default=dict, help_text="All allergies: [{'name':str, 'term_id':uuid|null}, ...]"),
+        ),
+        migrations.AlterField(
+            model_name='patientmedicalrecord',
+            name='cancer_history',
+            field=models.JSONField(default=dict, help_text="Patient's Cancer History: [{'cancer_type':str, 'cancer_type_id':uuid|null, 'year_of_diagnosis':year, 'treatment_received':[{'name':choice},...],},]"),
+        ),
+        migrations.AlterField(
+            model_name='patientmedicalrecord',
+            name='medications',
+            field=models.JSONField(default=dict, help_text="All medications: [{'name':str, 'term_id':uuid|null}, ...]"),
+        ),
+        migrations.CreateModel(
+            name='MedicalTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.CharField(choices=[('allergy', 'Allergy'), ('medication', 'Medication'), ('cancer_type', 'Cancer Type')], max_length=20)),
+                ('name', models.CharField(max_length=255)),
+                ('normalized_name', models.CharField(help_text='Lower-cased, whitespace-collapsed name', max_length=255)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'Medical Term',
+                'verbose_name_plural': 'Medical Terms',
+                'db_table': 'medical_term',
+                'indexes': [models.Index(fields=['category', 'normalized_name'], name='medical_term_prefix_idx', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']), django.contrib.postgres.indexes.GinIndex(fields=['normalized_name'], name='medical_term_trgm_idx', opclasses=['gin_trgm_ops'])],
+                'constraints': [models.UniqueConstraint(fields=('category', 'normalized_name'), name='unique_medical_term_per_category')],
+            },
+        ),
+    ]
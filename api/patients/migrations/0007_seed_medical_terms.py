@@ -0,0 +1,161 @@
+import copy
+import uuid
+
+from django.db import migrations
+from django.db.models import F, Max
+from django.utils import timezone
+
+ALLERGIES = [
+    "Penicillin", "Amoxicillin", "Cephalosporins", "Sulfonamides", "Aspirin",
+    "Ibuprofen", "Naproxen", "Codeine", "Morphine", "Iodinated Contrast",
+    "Latex", "Peanuts", "Tree Nuts", "Shellfish", "Fish", "Eggs", "Milk",
+    "Soy", "Wheat", "Sesame", "Bee Stings", "Pollen", "Dust Mites",
+    "Mold", "Pet Dander", "Nickel", "Adhesive Tape", "Chlorhexidine",
+    "Carboplatin", "Paclitaxel", "Heparin", "Vancomycin",
+]
+
+MEDICATIONS = [
+    "Acetaminophen", "Ibuprofen", "Aspirin", "Metformin", "Lisinopril",
+    "Amlodipine", "Atorvastatin", "Simvastatin", "Levothyroxine",
+    "Omeprazole", "Pantoprazole", "Metoprolol", "Losartan",
+    "Hydrochlorothiazide", "Furosemide", "Warfarin", "Apixaban",
+    "Rivaroxaban", "Clopidogrel", "Prednisone", "Dexamethasone",
+    "Ondansetron", "Prochlorperazine", "Gabapentin", "Sertraline",
+    "Escitalopram", "Lorazepam", "Oxycodone", "Tramadol", "Insulin Glargine",
+    "Tamoxifen", "Anastrozole", "Letrozole", "Exemestane", "Capecitabine",
+    "Imatinib", "Methotrexate", "Cyclophosphamide", "Doxorubicin",
+    "Cisplatin", "Carboplatin", "Paclitaxel", "Docetaxel", "Pembrolizumab",
+    "Nivolumab", "Trastuzumab", "Bevacizumab", "Rituximab", "Filgrastim",
+    "Pegfilgrastim", "Enzalutamide", "Abiraterone", "Leuprolide",
+]
+
+CANCER_TYPES = [
+    "Breast Cancer", "Lung Cancer", "Prostate Cancer", "Colorectal Cancer",
+    "Melanoma", "Bladder Cancer", "Kidney Cancer", "Pancreatic Cancer",
+    "Liver Cancer", "Thyroid Cancer", "Ovarian Cancer", "Cervical Cancer",
+    "Endometrial Cancer", "Stomach Cancer", "Esophageal Cancer",
+    "Head and Neck Cancer", "Brain Cancer", "Leukemia", "Hodgkin Lymphoma",
+    "Non-Hodgkin Lymphoma", "Multiple Myeloma", "Sarcoma", "Testicular Cancer",
+    "Basal Cell Carcinoma", "Squamous Cell Carcinoma", "Mesothelioma",
+    "Neuroendocrine Tumor",
+]
+
+# Medical record sections whose entries reference a term, and their keys.
+TERM_SECTIONS = [
+    ("allergies", "allergy", "name", "term_id"),
+    ("medications", "medication", "name", "term_id"),
+    ("cancer_history", "cancer_type", "cancer_type", "cancer_type_id"),
+]
+TERM_FIELDS = [section for section, *_ in TERM_SECTIONS]
+
+
+def normalize(name):
+    return " ".join(name.split()).casefold()
+
+
+def seed_terms(apps, schema_editor):
+    MedicalTerm = apps.get_model("patients", "MedicalTerm")
+    PatientMedicalRecord = apps.get_model("patients", "PatientMedicalRecord")
+
+    terms = [
+        MedicalTerm(
+            uuid=uuid.uuid4(),
+            category=category,
+            name=name,
+            normalized_name=normalize(name),
+        )
+        for category, names in (
+            ("allergy", ALLERGIES),
+            ("medication", MEDICATIONS),
+            ("cancer_type", CANCER_TYPES),
+        )
+        for name in names
+    ]
+    MedicalTerm.objects.bulk_create(terms, ignore_conflicts=True)
+
+    rows = MedicalTerm.objects.values_list(
+        "category", "normalized_name", "uuid", "name"
+    )
+    lookup = {
+        (category, normalized_name): (str(term_uuid), name)
+        for category, normalized_name, term_uuid, name in rows
+    }
+
+    # Attach term ids to entries already stored as free text. Like any other
+    # write, each changed record gets a new version (its ETag) and one
+    # history row per changed section. Those rows are keyframes holding the
+    # old value and a whole-value patch, so reads as of an earlier time
+    # still see the free-text entries.
+    last_id = 0
+    while True:
+        records = list(
+            PatientMedicalRecord.objects.select_for_update()
+            .filter(id__gt=last_id)
+            .order_by("id")
+            .only("id", "version", *TERM_FIELDS)[:500]
+        )
+        if not records:
+            break
+        last_id = records[-1].id
+        link_terms(apps, records, lookup)
+
+
+def link_terms(apps, records, lookup):
+    PatientMedicalRecord = apps.get_model("patients", "PatientMedicalRecord")
+    PatientMedicalRecordHistory = apps.get_model(
+        "patients", "PatientMedicalRecordHistory"
+    )
+
+    changes = []
+    for record in records:
+        for section, category, name_key, id_key in TERM_SECTIONS:
+            entries = getattr(record, section)
+            if not isinstance(entries, list):
+                continue
+            old_value = copy.deepcopy(entries)
+            for entry in entries:
+                if not isinstance(entry, dict) or entry.get(id_key):
+                    continue
+                term = lookup.get((category, normalize(str(entry.get(name_key, "")))))
+                entry[id_key] = term[0] if term else None
+                if term:
+                    entry[name_key] = term[1]
+            if entries != old_value:
+                changes.append((record, section, old_value, entries))
+    if not changes:
+        return
+
+    changed = {record.id: record for record, *_ in changes}
+    PatientMedicalRecord.objects.bulk_update(list(changed.values()), TERM_FIELDS)
+    PatientMedicalRecord.objects.filter(id__in=changed).update(
+        version=F("version") + 1, updated_at=timezone.now()
+    )
+
+    last_sequences = {
+        (row["record_id"], row["section"]): row["last"]
+        for row in PatientMedicalRecordHistory.objects.filter(record_id__in=changed)
+        .values("record_id", "section")
+        .annotate(last=Max("sequence"))
+    }
+    PatientMedicalRecordHistory.objects.bulk_create(
+        PatientMedicalRecordHistory(
+            record_id=record.id,
+            section=section,
+            sequence=last_sequences.get((record.id, section), 0) + 1,
+            version=record.version + 1,
+            diff={"=": new_value},
+            base=old_value,
+        )
+        for record, section, old_value, new_value in changes
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("patients", "0006_medicalterm"),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_terms, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,14 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
 from phonenumber_field.modelfields import PhoneNumberField
 
 from api.base_models import BaseModel
 from api.patients.choices import (
     Gender,
     MaritalStatus,
+    MedicalRecordSection,
+    TermCategory,
 )
 
 User = get_user_model()
@@ -47,16 +50,22 @@ class PatientMedicalRecord(BaseModel):
     )
 
     is_main_record = models.BooleanField(default=False)
+    version = models.PositiveIntegerField(
+        default=1,
+        help_text="Bumped on every section write; used for the record's ETag.",
+    )
 
     iodine_allergy = models.JSONField(
         default=dict,
         help_text="Iodine allergy information: {'is_iodine_allergic':bool}",
     )
     allergies = models.JSONField(
-        default=dict, help_text="All allergies: [{'name':str}, ...]"
+        default=dict,
+        help_text="All allergies: [{'name':str, 'term_id':uuid|null}, ...]",
     )
     medications = models.JSONField(
-        default=dict, help_text="All medications: [{'name':str}, ...]"
+        default=dict,
+        help_text="All medications: [{'name':str, 'term_id':uuid|null}, ...]",
     )
     medical_histories = models.JSONField(
         default=dict, help_text="All medical histories: [{'name':str}, ...]"
@@ -66,7 +75,7 @@ class PatientMedicalRecord(BaseModel):
     )
     cancer_history = models.JSONField(
         default=dict,
-        help_text="Patient's Cancer History: [{'cancer_type':choice, 'year_of_diagnosis':year, 'treatment_received':[{'name':choice},...],},]",
+        help_text="Patient's Cancer History: [{'cancer_type':str, 'cancer_type_id':uuid|null, 'year_of_diagnosis':year, 'treatment_received':[{'name':choice},...],},]",
     )
     addiction_history = models.JSONField(
         default=dict,
@@ -84,3 +93,97 @@ class PatientMedicalRecord(BaseModel):
         verbose_name = "Patient Medical Record"
         verbose_name_plural = "Patient Medical Records"
         db_table = "patient_medical_record"
+
+
+class PatientMedicalRecordHistory(models.Model):
+    """
+    Append-only change log of PatientMedicalRecord sections.
+    Each row stores a compact diff of the one section that changed. Every Nth
+    row of a section is a keyframe that also keeps the section's previous
+    value, so point-in-time reads replay at most N diffs per section.
+    Rows are never updated, so this skips BaseModel's uuid and updated_at.
+    """
+
+    record = models.ForeignKey(
+        PatientMedicalRecord, on_delete=models.CASCADE, related_name="history"
+    )
+    section = models.CharField(max_length=32, choices=MedicalRecordSection.choices)
+    sequence = models.PositiveIntegerField(
+        help_text="Position of this change within the section's history"
+    )
+    version = models.PositiveIntegerField(
+        help_text="Record version produced by this change"
+    )
+    diff = models.JSONField()
+    base = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Section value before this change; set on keyframes only",
+    )
+    changed_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.record_id} - {self.section} #{self.sequence}"
+
+    class Meta:
+        verbose_name = "Patient Medical Record History"
+        verbose_name_plural = "Patient Medical Record History"
+        db_table = "patient_medical_record_history"
+        indexes = [
+            models.Index(fields=["record", "created_at"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["record", "section", "sequence"],
+                name="unique_medical_record_history_sequence",
+            ),
+        ]
+
+
+class MedicalTerm(BaseModel):
+    """
+    Controlled vocabulary for allergy, medication and cancer-type names.
+    Medical record entries reference these by uuid so they can be aggregated.
+    """
+
+    category = models.CharField(max_length=20, choices=TermCategory.choices)
+    name = models.CharField(max_length=255)
+    normalized_name = models.CharField(
+        max_length=255, help_text="Lower-cased, whitespace-collapsed name"
+    )
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.get_category_display()} - {self.name}"
+
+    def save(self, *args, **kwargs):
+        from api.patients.utils.vocabulary import normalize_term
+
+        self.normalized_name = normalize_term(self.name)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = "Medical Term"
+        verbose_name_plural = "Medical Terms"
+        db_table = "medical_term"
+        indexes = [
+            models.Index(
+                fields=["category", "normalized_name"],
+                name="medical_term_prefix_idx",
+                opclasses=["varchar_pattern_ops", "varchar_pattern_ops"],
+            ),
+            GinIndex(
+                fields=["normalized_name"],
+                name="medical_term_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["category", "normalized_name"],
+                name="unique_medical_term_per_category",
+            ),
+        ]
@@ -5,21 +5,23 @@ class IsPatient(BasePermission):
     Custom permission to allow only authenticated patients to access data.
     1. User must be authenticated and have a patient profile.
     2. Object-level: only access objects owned by the same patient.
+    For token users the profile comes from the role and profile claims, so
+    neither check queries the database.
     """
 
     def has_permission(self, request, view):
         user = request.user
-        return user.is_authenticated and hasattr(user, "patient")
+        return user.is_authenticated and getattr(user, "patient", None) is not None
 
     def has_object_permission(self, request, view, obj):
         user = request.user
 
-        if not user.is_authenticated or not hasattr(user, "patient"):
+        if not user.is_authenticated or getattr(user, "patient", None) is None:
             return False
 
         if hasattr(obj, "patient"):
             return obj.patient == user.patient
         elif hasattr(obj, "user"):
-            return obj.user == user.patient.user
+            return obj.user_id == user.id
 
         return False
@@ -13,6 +13,7 @@ from api.patients.choices import (
     TreatmentType,
     AddictionType,
     MaritalStatus,
+    TermCategory,
 )
 from api.patients.validators import (
     validate_fields,
@@ -20,11 +21,14 @@ from api.patients.validators import (
     validate_care_providers_types,
     validate_is_appointment_update,
     validate_only_one_main_record,
+    validate_medical_term,
 )
 from api.patients.utils.fields import LabelChoiceField
 from api.patients.utils.update_handler import (
     update_json_field,
 )
+from api.patients.utils.etag import make_etag
+from api.utils.exceptions import PreconditionFailed
 
 logger = logging.getLogger(__name__)
 
@@ -42,8 +46,14 @@ class IodineAllergySerializer(serializers.Serializer):
             patient = self.context["request"].user.patient
             is_appointment_update = self.context.get("is_appointment_update", False)
             return update_json_field(
-                patient, "iodine_allergy", validated_data, is_appointment_update
+                patient,
+                "iodine_allergy",
+                validated_data,
+                is_appointment_update,
+                self.context.get("if_match"),
             )
+        except PreconditionFailed:
+            raise
         except Exception as e:
             logger.exception("Unexpected error")
             raise serializers.ValidationError(
@@ -55,6 +65,12 @@ class AllergySerializer(serializers.Serializer):
     name = serializers.CharField(
         max_length=255,
     )
+    term_id = serializers.UUIDField(required=False, allow_null=True)
+
+    def validate(self, attrs):
+        return validate_medical_term(
+            self, attrs, TermCategory.ALLERGY, "name", "term_id"
+        )
 
 
 class AllergyListSerializer(serializers.Serializer):
@@ -70,8 +86,14 @@ class AllergyListSerializer(serializers.Serializer):
             patient = self.context["request"].user.patient
             is_appointment_update = self.context.get("is_appointment_update", False)
             return update_json_field(
-                patient, "allergies", validated_data, is_appointment_update
+                patient,
+                "allergies",
+                validated_data,
+                is_appointment_update,
+                self.context.get("if_match"),
             )
+        except PreconditionFailed:
+            raise
         except Exception as e:
             logger.exception("Unexpected error")
             raise serializers.ValidationError(
@@ -83,6 +105,12 @@ class MedicationSerializer(serializers.Serializer):
     name = serializers.CharField(
         max_length=255,
     )
+    term_id = serializers.UUIDField(required=False, allow_null=True)
+
+    def validate(self, attrs):
+        return validate_medical_term(
+            self, attrs, TermCategory.MEDICATION, "name", "term_id"
+        )
 
 
 class MedicationListSerializer(serializers.Serializer):
@@ -98,8 +126,14 @@ class MedicationListSerializer(serializers.Serializer):
             patient = self.context["request"].user.patient
             is_appointment_update = self.context.get("is_appointment_update", False)
             return update_json_field(
-                patient, "medications", validated_data, is_appointment_update
+                patient,
+                "medications",
+                validated_data,
+                is_appointment_update,
+                self.context.get("if_match"),
             )
+        except PreconditionFailed:
+            raise
         except Exception as e:
             logger.exception("Unexpected error")
             raise serializers.ValidationError(
@@ -126,8 +160,14 @@ class MedicalHistoryListSerializer(serializers.Serializer):
             patient = self.context["request"].user.patient
             is_appointment_update = self.context.get("is_appointment_update", False)
             return update_json_field(
-                patient, "medical_histories", validated_data, is_appointment_update
+                patient,
+                "medical_histories",
+                validated_data,
+                is_appointment_update,
+                self.context.get("if_match"),
             )
+        except PreconditionFailed:
+            raise
         except Exception as e:
             logger.exception("Unexpected error")
             raise serializers.ValidationError(
@@ -154,8 +194,14 @@ class SurgicalHistoryListSerializer(serializers.Serializer):
             patient = self.context["request"].user.patient
             is_appointment_update = self.context.get("is_appointment_update", False)
             return update_json_field(
-                patient, "surgical_histories", validated_data, is_appointment_update
+                patient,
+                "surgical_histories",
+                validated_data,
+                is_appointment_update,
+                self.context.get("if_match"),
             )
+        except PreconditionFailed:
+            raise
         except Exception as e:
             logger.exception("Unexpected error")
             raise serializers.ValidationError(
@@ -187,8 +233,14 @@ class CareProviderListSerializer(serializers.Serializer):
             patient = self.context["request"].user.patient
             is_appointment_update = self.context.get("is_appointment_update", False)
             return update_json_field(
-                patient, "care_providers", validated_data, is_appointment_update
+                patient,
+                "care_providers",
+                validated_data,
+                is_appointment_update,
+                self.context.get("if_match"),
             )
+        except PreconditionFailed:
+            raise
         except Exception as e:
             logger.exception("Unexpected error")
             raise serializers.ValidationError(
@@ -202,9 +254,15 @@ class TreatmentReceivedSerializer(serializers.Serializer):
 
 class CancerHistorySerializer(serializers.Serializer):
     cancer_type = serializers.CharField(max_length=255)
+    cancer_type_id = serializers.UUIDField(required=False, allow_null=True)
     year_of_diagnosis = serializers.IntegerField(min_value=1900, max_value=2100)
     treatment_received = TreatmentReceivedSerializer(many=True)
 
+    def validate(self, attrs):
+        return validate_medical_term(
+            self, attrs, TermCategory.CANCER_TYPE, "cancer_type", "cancer_type_id"
+        )
+
 
 class CancerHistoryListSerializer(serializers.Serializer):
     appointment_uuid = serializers.UUIDField(required=False, write_only=True)
@@ -219,8 +277,14 @@ class CancerHistoryListSerializer(serializers.Serializer):
             patient = self.context["request"].user.patient
             is_appointment_update = self.context.get("is_appointment_update", False)
             return update_json_field(
-                patient, "cancer_history", validated_data, is_appointment_update
+                patient,
+                "cancer_history",
+                validated_data,
+                is_appointment_update,
+                self.context.get("if_match"),
             )
+        except PreconditionFailed:
+            raise
         except Exception as e:
             logger.exception("Unexpected error")
             raise serializers.ValidationError(
@@ -253,8 +317,14 @@ class AddictionHistoryListSerializer(serializers.Serializer):
             patient = self.context["request"].user.patient
             is_appointment_update = self.context.get("is_appointment_update", False)
             return update_json_field(
-                patient, "addiction_history", validated_data, is_appointment_update
+                patient,
+                "addiction_history",
+                validated_data,
+                is_appointment_update,
+                self.context.get("if_match"),
             )
+        except PreconditionFailed:
+            raise
         except Exception as e:
             logger.exception("Unexpected error")
             raise serializers.ValidationError(
@@ -263,6 +333,10 @@ class AddictionHistoryListSerializer(serializers.Serializer):
 
 
 class PatientMedicalRecordSerializer(serializers.ModelSerializer):
+    etag = serializers.SerializerMethodField()
+
+    def get_etag(self, obj):
+        return make_etag(obj.uuid, obj.version)
 
     def validate(self, attrs):
         validate_only_one_main_record(self, attrs)
@@ -284,6 +358,7 @@ class PatientMedicalRecordSerializer(serializers.ModelSerializer):
         model = PatientMedicalRecord
         fields = [
             "uuid",
+            "etag",
             "is_main_record",
             "iodine_allergy",
             "allergies",
@@ -298,6 +373,7 @@ class PatientMedicalRecordSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = [
             "uuid",
+            "etag",
             "is_main_record",
             "iodine_allergy",
             "allergies",
@@ -312,6 +388,34 @@ class PatientMedicalRecordSerializer(serializers.ModelSerializer):
         ]
 
 
+class MedicalTermAutocompleteSerializer(serializers.Serializer):
+    """
+    Query parameters for medical term autocomplete.
+    """
+
+    category = serializers.ChoiceField(choices=TermCategory.choices)
+    q = serializers.CharField(max_length=100, trim_whitespace=True)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+class DeidentifiedExportSerializer(serializers.Serializer):
+    """
+    Query parameters for the de-identified export.
+    """
+
+    file_format = serializers.ChoiceField(choices=["jsonl", "csv"], default="jsonl")
+    after_id = serializers.IntegerField(min_value=0, default=0)
+
+
+class MedicalRecordAsOfSerializer(serializers.Serializer):
+    """
+    Query parameters for reading a medical record as of a point in time.
+    """
+
+    as_of = serializers.DateTimeField()
+    appointment_uuid = serializers.UUIDField(required=False)
+
+
 class PatientSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(source="user.email", read_only=True)
     first_name = serializers.CharField(source="user.first_name")
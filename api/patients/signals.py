@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.patients.models import MedicalTerm
+from api.patients.utils.vocabulary import invalidate_term_index
+
+
+@receiver(post_save, sender=MedicalTerm)
+@receiver(post_delete, sender=MedicalTerm)
+def medical_term_changed(sender, **kwargs):
+    # Only this process is invalidated; other workers pick the change up
+    # when their copy reaches VOCABULARY_CACHE_SECONDS.
+    invalidate_term_index()
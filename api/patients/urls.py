@@ -10,6 +10,9 @@ from api.patients.views import (
     CareProviderBulkUpdateView,
     AddictionHistoryBulkUpdateView,
     PatientRetreiveView,
+    MedicalRecordHistoryView,
+    MedicalTermAutocompleteView,
+    DeidentifiedExportView,
 )
 
 
@@ -51,4 +54,19 @@ urlpatterns = [
         name="cancer-history-update",
     ),
     path("me/", PatientRetreiveView.as_view(), name="patient-retrieve"),
+    path(
+        "medical-record/history/",
+        MedicalRecordHistoryView.as_view(),
+        name="medical-record-history",
+    ),
+    path(
+        "terms/autocomplete/",
+        MedicalTermAutocompleteView.as_view(),
+        name="medical-term-autocomplete",
+    ),
+    path(
+        "export/deidentified/",
+        DeidentifiedExportView.as_view(),
+        name="deidentified-export",
+    ),
 ]
@@ -0,0 +1,29 @@
+import uuid
+
+from django.utils.http import parse_etags, quote_etag
+
+
+def make_etag(record_uuid, version):
+    """
+    Build the ETag for a medical record from its uuid and version stamp.
+    """
+    return quote_etag(f"{record_uuid}:{version}")
+
+
+def parse_record_etag(header):
+    """
+    Parse an If-Match / If-None-Match header into a (uuid, version) tuple.
+    Returns None when the header is missing or not one of our ETags.
+    """
+    if not header:
+        return None
+
+    for etag in parse_etags(header):
+        opaque = etag.removeprefix("W/").strip('"')
+        record_uuid, _, version = opaque.rpartition(":")
+        try:
+            return uuid.UUID(record_uuid), int(version)
+        except ValueError:
+            continue
+
+    return None
@@ -0,0 +1,180 @@
+import csv
+import hashlib
+import hmac
+import io
+import json
+
+from django.conf import settings
+from django.utils import timezone
+
+from api.patients.choices import MedicalRecordSection
+from api.patients.models import PatientMedicalRecord
+
+# Three-digit zip prefixes covering 20,000 people or fewer; HIPAA Safe Harbor
+# requires these to be reported as "000".
+RESTRICTED_ZIP3 = {
+    "036", "059", "063", "102", "203", "556", "692", "790", "821",
+    "823", "830", "831", "878", "879", "884", "890", "893",
+}
+
+# Ages above this are reported as a single "90 or over" group.
+MAX_REPORTED_AGE = 89
+
+# Care providers hold names and phone numbers, so they are never exported.
+EXPORTED_SECTIONS = [
+    section
+    for section in MedicalRecordSection.values
+    if section != MedicalRecordSection.CARE_PROVIDERS
+]
+
+SOURCE_FIELDS = [
+    "id",
+    "patient_id",
+    "is_main_record",
+    "created_at",
+    "patient__date_of_birth",
+    "patient__gender",
+    "patient__sex_assigned_at_birth",
+    "patient__marital_status",
+    "patient__state",
+    "patient__zip_code",
+    "appointment__appointment_type",
+    "appointment__status",
+    "appointment__time_slot__start_time",
+    "appointment__time_slot__doctor__specialization__name",
+    *EXPORTED_SECTIONS,
+]
+
+EXPORT_COLUMNS = [
+    "id",
+    "patient_key",
+    "is_main_record",
+    "record_year",
+    "birth_year",
+    "age_90_or_over",
+    "gender",
+    "sex_assigned_at_birth",
+    "marital_status",
+    "state",
+    "zip3",
+    "appointment_type",
+    "appointment_status",
+    "appointment_year",
+    "specialization",
+    *EXPORTED_SECTIONS,
+]
+
+
+def pseudonymize(patient_id):
+    """
+    Stable per-patient key so rows of one patient can be linked across
+    exports without revealing who the patient is.
+    """
+    key = getattr(settings, "EXPORT_PSEUDONYM_KEY", None) or settings.SECRET_KEY
+    digest = hmac.new(key.encode(), f"patient:{patient_id}".encode(), hashlib.sha256)
+    return digest.hexdigest()[:16]
+
+
+def generalize_zip(zip_code):
+    zip3 = (zip_code or "")[:3]
+    if len(zip3) < 3 or not zip3.isdigit():
+        return None
+    return "000" if zip3 in RESTRICTED_ZIP3 else zip3
+
+
+def deidentify(row, today):
+    """
+    Map one SOURCE_FIELDS row to an EXPORT_COLUMNS row.
+    Names, contact details and full dates never leave this function.
+    """
+    date_of_birth = row["patient__date_of_birth"]
+    age = today.year - date_of_birth.year - (
+        (today.month, today.day) < (date_of_birth.month, date_of_birth.day)
+    )
+    over_age = age > MAX_REPORTED_AGE
+    start_time = row["appointment__time_slot__start_time"]
+
+    return {
+        "id": row["id"],
+        "patient_key": pseudonymize(row["patient_id"]),
+        "is_main_record": row["is_main_record"],
+        "record_year": row["created_at"].year,
+        "birth_year": None if over_age else date_of_birth.year,
+        "age_90_or_over": over_age,
+        "gender": row["patient__gender"],
+        "sex_assigned_at_birth": row["patient__sex_assigned_at_birth"] or None,
+        "marital_status": row["patient__marital_status"],
+        "state": row["patient__state"] or None,
+        "zip3": generalize_zip(row["patient__zip_code"]),
+        "appointment_type": row["appointment__appointment_type"],
+        "appointment_status": row["appointment__status"],
+        "appointment_year": start_time.year if start_time else None,
+        "specialization": row[
+            "appointment__time_slot__doctor__specialization__name"
+        ],
+        **{section: row[section] for section in EXPORTED_SECTIONS},
+    }
+
+
+def iter_deidentified_records(after_id=0, chunk_size=None):
+    """
+    Yield de-identified records with id > after_id in id order.
+
+    QuerySet.iterator() reads through a server-side cursor on PostgreSQL,
+    fetching chunk_size rows at a time, so memory stays flat however large
+    the table is.
+    """
+    chunk_size = chunk_size or getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+    today = timezone.localdate()
+    rows = (
+        PatientMedicalRecord.objects.filter(id__gt=after_id)
+        .order_by("id")
+        .values(*SOURCE_FIELDS)
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield deidentify(row, today)
+
+
+def render_jsonl(records):
+    for record in records:
+        yield json.dumps(record, separators=(",", ":"), default=str) + "\n"
+
+
+def render_csv(records, header=True):
+    """
+    Yield CSV lines. Medical record sections are JSON-encoded cells.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return value
+
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+        yield flush()
+
+    for record in records:
+        writer.writerow(
+            [
+                json.dumps(record[column], separators=(",", ":"))
+                if column in EXPORTED_SECTIONS
+                else record[column]
+                for column in EXPORT_COLUMNS
+            ]
+        )
+        yield flush()
+
+
+RENDERERS = {
+    "jsonl": render_jsonl,
+    "csv": render_csv,
+}
+
+CONTENT_TYPES = {
+    "jsonl": "application/x-ndjson",
+    "csv": "text/csv",
+}
@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.db.models import Max, Q
+
+from api.patients.choices import MedicalRecordSection
+from api.patients.models import PatientMedicalRecordHistory
+from api.patients.utils.json_diff import apply_diff, compute_diff
+
+
+def get_keyframe_interval():
+    return getattr(settings, "MEDICAL_RECORD_HISTORY_KEYFRAME_INTERVAL", 20)
+
+
+def record_section_change(
+    record_id, section, old_value, new_value, version, changed_by_id=None
+):
+    """
+    Append a history row for one section write. Must run in the same
+    transaction as the record update so the log never drifts from the data.
+    """
+    if old_value == new_value:
+        return None
+
+    last_sequence = (
+        PatientMedicalRecordHistory.objects.filter(
+            record_id=record_id, section=section
+        )
+        .order_by("-sequence")
+        .values_list("sequence", flat=True)
+        .first()
+    ) or 0
+    sequence = last_sequence + 1
+    is_keyframe = (sequence - 1) % get_keyframe_interval() == 0
+
+    return PatientMedicalRecordHistory.objects.create(
+        record_id=record_id,
+        section=section,
+        sequence=sequence,
+        version=version,
+        diff=compute_diff(old_value, new_value),
+        base=old_value if is_keyframe else None,
+        changed_by_id=changed_by_id,
+    )
+
+
+def reconstruct_record(record, as_of):
+    """
+    Rebuild every section of `record` as it was at `as_of`.
+    Returns None if the record did not exist yet.
+
+    Per section this reads the latest keyframe at or before `as_of` and the
+    diffs after it, so the cost is bounded by the keyframe interval rather
+    than by the length of the history.
+    """
+    if record.created_at > as_of:
+        return None
+
+    history = PatientMedicalRecordHistory.objects.filter(record=record)
+    sections = {
+        section: getattr(record, section) for section in MedicalRecordSection.values
+    }
+
+    keyframe_starts = dict(
+        history.filter(created_at__lte=as_of, base__isnull=False)
+        .values("section")
+        .annotate(start=Max("sequence"))
+        .values_list("section", "start")
+    )
+
+    if keyframe_starts:
+        window = Q()
+        for section, start in keyframe_starts.items():
+            window |= Q(section=section, sequence__gte=start)
+
+        rows = (
+            history.filter(window, created_at__lte=as_of)
+            .order_by("section", "sequence")
+            .values_list("section", "diff", "base")
+        )
+        for section, diff, base in rows:
+            value = sections[section] if base is None else base
+            sections[section] = apply_diff(value, diff)
+
+    # Sections untouched before `as_of` still hold the value recorded as the
+    # base of their first change; sections never changed keep their value.
+    untouched = [s for s in MedicalRecordSection.values if s not in keyframe_starts]
+    first_changes = history.filter(section__in=untouched, sequence=1).values_list(
+        "section", "base"
+    )
+    for section, base in first_changes:
+        sections[section] = base
+
+    return {"uuid": record.uuid, "as_of": as_of, **sections}
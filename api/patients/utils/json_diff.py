@@ -0,0 +1,80 @@
+import json
+
+# Patch format (kept terse because one is stored per write):
+#   {"=": value}                    replace the value entirely
+#   {"d": {key: patch}, "r": [key]} patch/add keys of a dict, remove others
+#   {"l": [start, stop, items]}     replace list[start:stop] with items
+
+
+def compute_diff(old, new):
+    """
+    Return a compact patch that turns `old` into `new`.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        patch = _diff_dict(old, new)
+    elif isinstance(old, list) and isinstance(new, list):
+        patch = _diff_list(old, new)
+    else:
+        return {"=": new}
+
+    replacement = {"=": new}
+    if len(_dumps(patch)) >= len(_dumps(replacement)):
+        return replacement
+    return patch
+
+
+def apply_diff(value, patch):
+    """
+    Apply a patch produced by compute_diff to `value`.
+    """
+    if "=" in patch:
+        return patch["="]
+
+    if "l" in patch:
+        start, stop, items = patch["l"]
+        return value[:start] + items + value[stop:]
+
+    result = dict(value)
+    for key in patch.get("r", []):
+        result.pop(key, None)
+    for key, sub_patch in patch.get("d", {}).items():
+        result[key] = apply_diff(result.get(key), sub_patch)
+    return result
+
+
+def _diff_dict(old, new):
+    changed = {}
+    for key, value in new.items():
+        if key not in old:
+            changed[key] = {"=": value}
+        elif old[key] != value:
+            changed[key] = compute_diff(old[key], value)
+
+    removed = [key for key in old if key not in new]
+
+    patch = {}
+    if changed:
+        patch["d"] = changed
+    if removed:
+        patch["r"] = removed
+    return patch
+
+
+def _diff_list(old, new):
+    start = 0
+    while start < len(old) and start < len(new) and old[start] == new[start]:
+        start += 1
+
+    end = 0
+    while (
+        end < len(old) - start
+        and end < len(new) - start
+        and old[-1 - end] == new[-1 - end]
+    ):
+        end += 1
+
+    return {"l": [start, len(old) - end, new[start:len(new) - end]]}
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(",", ":"), default=str)
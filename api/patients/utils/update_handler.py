@@ -1,27 +1,33 @@
 import logging
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from rest_framework import serializers
 from api.patients.models import PatientMedicalRecord
-from api.appointments.models import Appointment
+from api.patients.choices import MedicalRecordSection
+from api.patients.utils.history import record_section_change
+from api.patients.utils.etag import make_etag
+from api.utils.exceptions import PreconditionFailed
 
 logger = logging.getLogger(__name__)
 
 
-def update_json_field(patient, field_name, validated_data, is_appointment_update):
+def update_json_field(
+    patient, field_name, validated_data, is_appointment_update, if_match
+):
     """
     Update a JSON field in the user's medical record.
+
+    `if_match` is the (record_uuid, version) pair the client last read. The
+    version is checked in the UPDATE's WHERE clause, so a concurrent writer
+    makes this raise PreconditionFailed instead of being silently overwritten.
+    The section's previous value read here is therefore exactly the one being
+    replaced, which is what the history diff is computed against.
+    Returns the record's new ETag.
     """
     try:
         # TODO add validations in the validator.py
-        field_names = [
-            "iodine_allergy",
-            "allergies",
-            "medications",
-            "medical_histories",
-            "surgical_histories",
-            "cancer_history",
-            "addiction_history",
-            "care_providers",
-        ]
+        field_names = MedicalRecordSection.values
         if field_name not in field_names:
             raise serializers.ValidationError(
                 {
@@ -46,7 +52,7 @@ def update_json_field(patient, field_name, validated_data, is_appointment_update
             )
 
         if not is_appointment_update:
-            medical_record = PatientMedicalRecord.objects.get(
+            medical_records = PatientMedicalRecord.objects.filter(
                 patient=patient, is_main_record=True
             )
 
@@ -55,23 +61,38 @@ def update_json_field(patient, field_name, validated_data, is_appointment_update
                 raise serializers.ValidationError(
                     {"detail": "appointment_uuid is required for appointment updates."}
                 )
-            appointment = Appointment.objects.get(
-                uuid=appointment_uuid, medical_record__patient=patient
+            medical_records = PatientMedicalRecord.objects.filter(
+                patient=patient, appointment__uuid=appointment_uuid
             )
-            if not appointment:
-                raise serializers.ValidationError(
-                    {"detail": "Appointment with the given UUID does not exist."}
-                )
-            medical_record = appointment.medical_record
-            if not medical_record:
-                raise serializers.ValidationError(
-                    {"detail": "Medical record does not exist for the appointment."}
-                )
 
-        setattr(medical_record, field_name, data)
+        record_uuid, version = if_match
+        current = medical_records.values("id", "uuid", "version", field_name).first()
+        if current is None:
+            raise PatientMedicalRecord.DoesNotExist
+        if (current["uuid"], current["version"]) != (record_uuid, version):
+            raise PreconditionFailed()
+
+        with transaction.atomic():
+            updated = PatientMedicalRecord.objects.filter(
+                pk=current["id"], version=version
+            ).update(
+                **{field_name: data},
+                version=F("version") + 1,
+                updated_at=timezone.now(),
+            )
+            if not updated:
+                raise PreconditionFailed()
+
+            record_section_change(
+                current["id"],
+                field_name,
+                current[field_name],
+                data,
+                version + 1,
+                changed_by_id=patient.user_id,
+            )
 
-        medical_record.save(update_fields=[f"{field_name}"])
-        return medical_record
+        return make_etag(record_uuid, version + 1)
 
     except PatientMedicalRecord.DoesNotExist:
         logger.error(
@@ -0,0 +1,137 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+
+from api.patients.models import MedicalTerm
+
+# Sorts after any character a normalized name can contain, so
+# bisect_left(keys, prefix + _PREFIX_END) is the end of the prefix range.
+_PREFIX_END = "\U0010ffff"
+
+
+def normalize_term(name):
+    """
+    Canonical form used for matching: case-folded, single-spaced.
+    """
+    return " ".join(name.split()).casefold()
+
+
+class TermIndex:
+    """
+    Immutable in-process prefix index over active MedicalTerms.
+
+    Each category keeps a sorted array of keys; a prefix query is two
+    bisections plus a slice. Every word start of a name is indexed, so
+    "cancer" also finds "Breast Cancer".
+    """
+
+    def __init__(self, terms):
+        entries = defaultdict(list)
+        self._by_name = {}
+        self._by_id = {}
+
+        for category, normalized_name, term_id, name in terms:
+            term = (str(term_id), name)
+            self._by_name[(category, normalized_name)] = term
+            self._by_id[term[0]] = (category, name)
+
+            words = normalized_name.split(" ")
+            for i in range(len(words)):
+                entries[category].append((" ".join(words[i:]), i, term))
+
+        self._keys = {}
+        self._terms = {}
+        for category, rows in entries.items():
+            # Sorted by key, which the bisection in search() relies on; the
+            # word offset only breaks ties, so where two terms share a key
+            # the one matching from its first word comes first.
+            rows.sort(key=lambda row: (row[0], row[1]))
+            self._keys[category] = [row[0] for row in rows]
+            self._terms[category] = [row[2] for row in rows]
+
+    def search(self, category, prefix, limit):
+        keys = self._keys.get(category)
+        if not keys:
+            return []
+
+        prefix = normalize_term(prefix)
+        start = bisect_left(keys, prefix)
+        stop = bisect_left(keys, prefix + _PREFIX_END, lo=start)
+
+        results, seen = [], set()
+        for term_id, name in self._terms[category][start:stop]:
+            if term_id in seen:
+                continue
+            seen.add(term_id)
+            results.append({"term_id": term_id, "name": name})
+            if len(results) == limit:
+                break
+        return results
+
+    def get_by_name(self, category, name):
+        """
+        Return (term_id, canonical name) for an exact name match, or None.
+        """
+        return self._by_name.get((category, normalize_term(name)))
+
+    def get_by_id(self, category, term_id):
+        """
+        Return the canonical name of `term_id` if it belongs to `category`.
+        """
+        term = self._by_id.get(str(term_id))
+        if term is None or term[0] != category:
+            return None
+        return term[1]
+
+
+_index = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def get_term_index():
+    """
+    Return this process's TermIndex, rebuilding it when it was invalidated
+    or is older than VOCABULARY_CACHE_SECONDS.
+    """
+    global _index, _loaded_at
+
+    ttl = getattr(settings, "VOCABULARY_CACHE_SECONDS", 300)
+    index = _index
+    if index is not None and time.monotonic() - _loaded_at < ttl:
+        return index
+
+    with _lock:
+        if _index is None or time.monotonic() - _loaded_at >= ttl:
+            terms = MedicalTerm.objects.filter(is_active=True).values_list(
+                "category", "normalized_name", "uuid", "name"
+            )
+            _index = TermIndex(terms.iterator())
+            _loaded_at = time.monotonic()
+        return _index
+
+
+def search_terms_fuzzy(category, query, limit):
+    """
+    Trigram similarity search for queries with no prefix match (typos,
+    misspelled brand names). Served by medical_term_trgm_idx.
+    """
+    query = normalize_term(query)
+    terms = (
+        MedicalTerm.objects.filter(
+            category=category, is_active=True, normalized_name__trigram_similar=query
+        )
+        .annotate(similarity=TrigramSimilarity("normalized_name", query))
+        .order_by("-similarity", "normalized_name")
+        .values_list("uuid", "name")[:limit]
+    )
+    return [{"term_id": str(term_id), "name": name} for term_id, name in terms]
+
+
+def invalidate_term_index():
+    global _index
+    _index = None
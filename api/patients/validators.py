@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from api.patients.models import PatientMedicalRecord
+from api.patients.utils.vocabulary import get_term_index
 
 
 def validate_fields(self, attrs):
@@ -91,3 +92,31 @@ def validate_only_one_main_record(self, attrs):
             )
 
         return attrs
+
+
+def validate_medical_term(self, attrs, category, name_field, id_field):
+    """
+    Resolve an entry to its canonical MedicalTerm.
+    A given term id must exist in `category` and replaces the submitted name
+    with the canonical one; otherwise the name is matched exactly and the id
+    is left null for free text that is not in the vocabulary yet.
+    """
+    index = get_term_index()
+    term_id = attrs.get(id_field)
+
+    if term_id:
+        name = index.get_by_id(category, term_id)
+        if name is None:
+            raise serializers.ValidationError(
+                {id_field: f"Unknown {category.replace('_', ' ')} term."}
+            )
+        attrs[name_field] = name
+        attrs[id_field] = str(term_id)
+        return attrs
+
+    term = index.get_by_name(category, attrs[name_field])
+    if term:
+        attrs[id_field], attrs[name_field] = term
+    else:
+        attrs[id_field] = None
+    return attrs
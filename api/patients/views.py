@@ -1,14 +1,20 @@
 from rest_framework.generics import RetrieveUpdateAPIView
 from rest_framework.permissions import IsAuthenticated
 from api.patients.permissions import IsPatient
+from api.users.permissions import IsAdmin
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ValidationError, NotFound
+from django.http import StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 
 
 from api.utils.exception_handler import HandleExceptionAPIView
+from api.utils.exceptions import PreconditionFailed, PreconditionRequired
+from api.patients.models import Patient, PatientMedicalRecord
+from api.patients.utils.etag import make_etag, parse_record_etag
 from api.patients.serializers import (
     PatientSerializer,
     IodineAllergySerializer,
@@ -19,6 +25,16 @@ from api.patients.serializers import (
     CareProviderListSerializer,
     AddictionHistoryListSerializer,
     CancerHistoryListSerializer,
+    MedicalRecordAsOfSerializer,
+    MedicalTermAutocompleteSerializer,
+    DeidentifiedExportSerializer,
+)
+from api.patients.utils.history import reconstruct_record
+from api.patients.utils.vocabulary import get_term_index, search_terms_fuzzy
+from api.patients.utils.export import (
+    CONTENT_TYPES,
+    RENDERERS,
+    iter_deidentified_records,
 )
 
 import logging
@@ -28,65 +44,120 @@ logger = logging.getLogger(__name__)
 
 @method_decorator(csrf_exempt, name="dispatch")
 class BaseMedicalRecordFieldUpdateView(HandleExceptionAPIView, APIView):
+    """
+    GET returns one section of the medical record with an ETag.
+    PATCH requires that ETag in If-Match; a stale one gets a 412.
+    """
+
     permission_classes = [IsAuthenticated, IsPatient]
     serializer_class = None
+    field_name = None
     is_appointment_update = False
 
-    def get_serializer_context(self, request):
+    def get_serializer_context(self, request, if_match=None):
         return {
             "request": request,
             "is_appointment_update": self.is_appointment_update,
+            "if_match": if_match,
         }
 
+    def get_medical_records(self, request):
+        medical_records = PatientMedicalRecord.objects.filter(
+            patient=request.user.patient
+        )
+        if not self.is_appointment_update:
+            return medical_records.filter(is_main_record=True)
+
+        appointment_uuid = request.query_params.get("appointment_uuid")
+        if not appointment_uuid:
+            raise ValidationError(
+                {"appointment_uuid": "This field is required for appointment updates."}
+            )
+        return medical_records.filter(appointment__uuid=appointment_uuid)
+
+    def get(self, request):
+        medical_records = self.get_medical_records(request)
+
+        if_none_match = parse_record_etag(request.headers.get("If-None-Match"))
+        if if_none_match:
+            current = medical_records.values_list("uuid", "version").first()
+            if current == if_none_match:
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                response["ETag"] = make_etag(*current)
+                return response
+
+        record = medical_records.values("uuid", "version", self.field_name).get()
+        response = Response(
+            {self.field_name: record[self.field_name]}, status=status.HTTP_200_OK
+        )
+        response["ETag"] = make_etag(record["uuid"], record["version"])
+        return response
+
     def patch(self, request):
+        if not request.headers.get("If-Match"):
+            raise PreconditionRequired()
+
+        if_match = parse_record_etag(request.headers.get("If-Match"))
+        if not if_match:
+            raise PreconditionFailed()
 
         serializer = self.serializer_class(
             data=request.data,
-            context=self.get_serializer_context(request),
+            context=self.get_serializer_context(request, if_match),
         )
         serializer.is_valid(raise_exception=True)
-        serializer.update(None, serializer.validated_data)
-        return Response({"message": "Successfully Updated"},
-                        status=status.HTTP_200_OK)
+        etag = serializer.update(None, serializer.validated_data)
+        response = Response({"message": "Successfully Updated"},
+                            status=status.HTTP_200_OK)
+        response["ETag"] = etag
+        return response
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class IodineAllergyUpdateView(BaseMedicalRecordFieldUpdateView):
+    field_name = "iodine_allergy"
     serializer_class = IodineAllergySerializer
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class AllergyBulkUpdateView(BaseMedicalRecordFieldUpdateView):
+    field_name = "allergies"
     serializer_class = AllergyListSerializer
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class MedicationBulkUpdateView(BaseMedicalRecordFieldUpdateView):
+    field_name = "medications"
     serializer_class = MedicationListSerializer
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class MedicalHistoryBulkUpdateView(BaseMedicalRecordFieldUpdateView):
+    field_name = "medical_histories"
     serializer_class = MedicalHistoryListSerializer
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class SurgicalHistoryBulkUpdateView(BaseMedicalRecordFieldUpdateView):
+    field_name = "surgical_histories"
     serializer_class = SurgicalHistoryListSerializer
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class CareProviderBulkUpdateView(BaseMedicalRecordFieldUpdateView):
+    field_name = "care_providers"
     serializer_class = CareProviderListSerializer
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class AddictionHistoryBulkUpdateView(BaseMedicalRecordFieldUpdateView):
+    field_name = "addiction_history"
     serializer_class = AddictionHistoryListSerializer
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class CancerHistoryBulkUpdateView(BaseMedicalRecordFieldUpdateView):
+    field_name = "cancer_history"
     serializer_class = CancerHistoryListSerializer
 
 
@@ -96,7 +167,94 @@ class PatientRetreiveView(HandleExceptionAPIView, RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated, IsPatient]
 
     def get_object(self):
-        return self.request.user.patient
+        # The serializer reads every field, so load the full row up front
+        # rather than through the token user's lazy profile.
+        return Patient.objects.select_related("user").get(
+            pk=self.request.user.patient.pk
+        )
 
     def patch(self, request, *args, **kwargs):
         return self.partial_update(request, *args, **kwargs)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class MedicalRecordHistoryView(HandleExceptionAPIView, APIView):
+    """
+    Reconstruct the patient's medical record as it was at `as_of`.
+    Reads the main record unless `appointment_uuid` is given.
+    """
+
+    permission_classes = [IsAuthenticated, IsPatient]
+    serializer_class = MedicalRecordAsOfSerializer
+
+    def get(self, request):
+        serializer = self.serializer_class(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        as_of = serializer.validated_data["as_of"]
+        appointment_uuid = serializer.validated_data.get("appointment_uuid")
+
+        medical_records = PatientMedicalRecord.objects.filter(
+            patient=request.user.patient
+        )
+        if appointment_uuid:
+            record = medical_records.get(appointment__uuid=appointment_uuid)
+        else:
+            record = medical_records.get(is_main_record=True)
+
+        snapshot = reconstruct_record(record, as_of)
+        if snapshot is None:
+            raise NotFound("The medical record did not exist at that time.")
+
+        return Response(snapshot, status=status.HTTP_200_OK)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class MedicalTermAutocompleteView(HandleExceptionAPIView, APIView):
+    """
+    Prefix search over allergy, medication and cancer-type names.
+    Served from the worker's in-memory index; the database is only hit for
+    the trigram fallback when nothing starts with the query.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = MedicalTermAutocompleteSerializer
+
+    def get(self, request):
+        serializer = self.serializer_class(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        category = serializer.validated_data["category"]
+        query = serializer.validated_data["q"]
+        limit = serializer.validated_data["limit"]
+
+        results = get_term_index().search(category, query, limit)
+        if not results and len(query) >= 3:
+            results = search_terms_fuzzy(category, query, limit)
+
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class DeidentifiedExportView(HandleExceptionAPIView, APIView):
+    """
+    Stream de-identified medical records and appointments for research.
+    Rows are in id order; to resume a broken download pass the last
+    received id as `after_id`.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdmin]
+    serializer_class = DeidentifiedExportSerializer
+
+    def get(self, request):
+        serializer = self.serializer_class(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        file_format = serializer.validated_data["file_format"]
+        after_id = serializer.validated_data["after_id"]
+
+        records = iter_deidentified_records(after_id)
+        response = StreamingHttpResponse(
+            RENDERERS[file_format](records), content_type=CONTENT_TYPES[file_format]
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="medical-records-after-{after_id}.{file_format}"'
+        )
+        return response
@@ -2,7 +2,9 @@ from django.contrib import admin
 from .models import (
     AppointmentPayment,
     AppointmentPaymentRefund,
+    DailyRevenueRollup,
     RefundPolicy,
+    StripeWebhookEvent,
 )
 
 @admin.register(AppointmentPayment)
@@ -17,7 +19,7 @@ class AppointmentPaymentAdmin(admin.ModelAdmin):
 class AppointmentPaymentRefundAdmin(admin.ModelAdmin):
     list_display = ("uuid", "appointment_payment", "refund_policy", 
                     "amount", "reason", "created_at")
-    search_fields = ("uuid", "reason")
+    search_fields = ("uuid", "reason", "stripe_refund_id")
     list_filter = ("refund_policy", "created_at")
     raw_id_fields = ("appointment_payment",)
 
@@ -26,4 +28,19 @@ class RefundPolicyAdmin(admin.ModelAdmin):
     list_display = ("uuid", "name", "refund_type", "hours_before_min", 
                     "hours_before_max", "created_at", "updated_at")
     search_fields = ("uuid", "name")
-    list_filter = ("refund_type", "created_at", "updated_at")
\ No newline at end of file
+    list_filter = ("refund_type", "created_at", "updated_at")
+
+@admin.register(DailyRevenueRollup)
+class DailyRevenueRollupAdmin(admin.ModelAdmin):
+    list_display = ("day", "doctor", "appointment_type", "currency", "payments",
+                    "gross_amount", "refunds", "refunded_amount")
+    list_filter = ("appointment_type", "currency", "day")
+    raw_id_fields = ("doctor",)
+
+@admin.register(StripeWebhookEvent)
+class StripeWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ("stripe_event_id", "event_type", "ordering_key", "status",
+                    "attempts", "stripe_created", "processed_at")
+    search_fields = ("stripe_event_id", "ordering_key")
+    list_filter = ("status", "event_type", "created_at")
+    readonly_fields = ("payload", "last_error")
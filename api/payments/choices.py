@@ -23,3 +23,9 @@ class RefundPaymentChoices(models.IntegerChoices):
     SUCCEEDED = 2, "Succeeded"
     FAILED = 3, "Failed"
     CANCELLED = 4, "Cancelled"
+
+
+class WebhookEventStatus(models.IntegerChoices):
+    PENDING = 1, "Pending"
+    PROCESSED = 2, "Processed"
+    FAILED = 3, "Failed"
@@ -0,0 +1,173 @@
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+
+import requests
+import stripe
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from api.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "stripe"
+OPERATIONS = (
+    "payment_intents.create",
+    "payment_intents.list",
+    "refunds.create",
+    "refunds.list",
+)
+
+
+class PooledRequestsClient(stripe.RequestsClient):
+    """
+    Stripe HTTP client whose threads share one keep-alive connection pool.
+    Each request's read timeout is capped by the calling thread's deadline.
+    """
+
+    def __init__(self, pool_size, connect_timeout):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self.connect_timeout = connect_timeout
+        self._deadline = threading.local()
+        # Given a session, RequestsClient uses it in every thread.
+        super().__init__(session=session)
+
+    def set_deadline(self, deadline):
+        self._deadline.value = deadline
+
+    @property
+    def _timeout(self):
+        remaining = getattr(self._deadline, "value", None)
+        if remaining is None:
+            return self._default_timeout
+        remaining = max(0.001, remaining - time.monotonic())
+        return (min(self.connect_timeout, remaining), remaining)
+
+    @_timeout.setter
+    def _timeout(self, value):
+        self._default_timeout = value
+
+
+def is_retryable(error):
+    """
+    Whether repeating the request (with the same idempotency key) may
+    succeed: connection failures, rate limits, conflicts and server errors,
+    unless Stripe says otherwise.
+    """
+    if isinstance(error, stripe.error.APIConnectionError):
+        return error.should_retry
+    should_retry = (error.headers or {}).get("stripe-should-retry")
+    if should_retry is not None:
+        return should_retry == "true"
+    status = error.http_status
+    return status is not None and (status in (409, 429) or status >= 500)
+
+
+class StripeGateway:
+    """
+    The one way this project talks to Stripe.
+
+    Calls go through a StripeClient with a pooled HTTP client, are bounded by
+    a deadline covering every attempt, and are retried a bounded number of
+    times with backoff. Writes always carry an idempotency key, generated if
+    the caller gives none, so a retry never repeats one. Latency and error
+    counts are recorded per operation.
+    """
+
+    def __init__(self):
+        self.http_client = PooledRequestsClient(
+            pool_size=settings.STRIPE_HTTP_POOL_SIZE,
+            connect_timeout=settings.STRIPE_CONNECT_TIMEOUT_SECONDS,
+        )
+        self.client = stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY,
+            http_client=self.http_client,
+            base_addresses={"api": settings.STRIPE_API_BASE},
+            # Retries are done here, where the deadline is known.
+            max_network_retries=0,
+        )
+        self.pid = os.getpid()
+
+    def request(
+        self, operation, *args, params=None, idempotency_key=None, deadline=None
+    ):
+        """
+        Call `operation`, a StripeClient service method such as
+        "refunds.create", with `params`. Raises the last StripeError once
+        retries or the deadline (seconds, default STRIPE_DEADLINE_SECONDS)
+        run out.
+        """
+        service, method = operation.split(".")
+        call = getattr(getattr(self.client, service), method)
+        options = {}
+        if method not in ("retrieve", "list"):
+            options["idempotency_key"] = idempotency_key or str(uuid.uuid4())
+
+        metric = f"{METRIC_PREFIX}.{operation}"
+        started = time.monotonic()
+        expires = started + (deadline or settings.STRIPE_DEADLINE_SECONDS)
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                self.http_client.set_deadline(expires)
+                try:
+                    return call(*args, params=params or {}, options=options)
+                except stripe.error.StripeError as e:
+                    delay = settings.STRIPE_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+                    delay *= random.uniform(0.5, 1.0)
+                    if (
+                        attempt > settings.STRIPE_MAX_RETRIES
+                        or not is_retryable(e)
+                        or time.monotonic() + delay >= expires
+                    ):
+                        metrics.increment(f"{metric}.errors")
+                        raise
+                    logger.warning(
+                        f"Retrying Stripe {operation} in {delay:.2f}s "
+                        f"after attempt {attempt}: {e}"
+                    )
+                    metrics.increment(f"{metric}.retries")
+                    time.sleep(delay)
+        finally:
+            self.http_client.set_deadline(None)
+            metrics.observe_latency(f"{metric}.latency", time.monotonic() - started)
+
+
+_gateway = None
+_lock = threading.Lock()
+
+
+def get_stripe_gateway():
+    """
+    Return this process's StripeGateway, so its connection pool is shared
+    by every thread.
+    """
+    global _gateway
+
+    # A forked worker must not share its parent's sockets.
+    if _gateway is None or _gateway.pid != os.getpid():
+        with _lock:
+            if _gateway is None or _gateway.pid != os.getpid():
+                _gateway = StripeGateway()
+    return _gateway
+
+
+def gateway_stats():
+    stats = {}
+    for operation in OPERATIONS:
+        metric = f"{METRIC_PREFIX}.{operation}"
+        counts = metrics.get_counts([f"{metric}.retries", f"{metric}.errors"])
+        stats[operation] = {
+            "retries": counts[f"{metric}.retries"],
+            "errors": counts[f"{metric}.errors"],
+            "latency": metrics.latency_summary(f"{metric}.latency"),
+        }
+    return stats
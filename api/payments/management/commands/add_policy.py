@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from api.payments.models import RefundPolicy
 from api.payments.choices import RefundPolicyChoices
+from api.payments.refund_policies import find_interval_problems
 
 
 class Command(BaseCommand):
@@ -102,9 +103,10 @@ class Command(BaseCommand):
 
         # Display current active policies
         self.stdout.write("\nCurrent active refund policies:")
-        for policy in RefundPolicy.objects.filter(is_active=True).order_by(
+        active_policies = RefundPolicy.objects.filter(is_active=True).order_by(
             "hours_before_min"
-        ):
+        )
+        for policy in active_policies:
             if policy.hours_before_max:
                 range_text = (
                     f"{policy.hours_before_min}-{policy.hours_before_max} hours"
@@ -115,3 +117,8 @@ class Command(BaseCommand):
             self.stdout.write(
                 f"  • {policy.name}: {policy.refund_percentage}% ({range_text})"
             )
+
+        for problem in find_interval_problems(
+            (p.hours_before_min, p.hours_before_max, p.name) for p in active_policies
+        ):
+            self.stdout.write(self.style.ERROR(f"✗ {problem}"))
@@ -0,0 +1,72 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.payments.webhooks import StripeEventProcessor, process_next_event
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Process stored Stripe webhook events with a pool of worker threads, "
+        "keeping each payment intent's events in order"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=settings.STRIPE_WEBHOOK_WORKERS
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds a worker waits when no event is ready",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no event is ready instead of waiting for more",
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        processed = []
+
+        def work():
+            processor = StripeEventProcessor()
+            try:
+                while not stop.is_set():
+                    try:
+                        event = process_next_event(processor)
+                    except Exception:
+                        logger.exception("Stripe event worker error")
+                        event = None
+                    if event is not None:
+                        processed.append(event.pk)
+                    elif options["once"]:
+                        return
+                    else:
+                        stop.wait(options["poll_interval"])
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=work, name=f"stripe-events-{i}")
+            for i in range(options["workers"])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {len(processed)} events"))
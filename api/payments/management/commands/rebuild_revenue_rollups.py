@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.payments.rollups import rebuild_revenue_rollups
+from api.utils.rollups import parse_date_option, rebuild_in_chunks
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily revenue rollups of a range of days from the "
+        "payments and refunds themselves, e.g. after a backfill or a status "
+        "changed outside the app."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since", help="First day to rebuild (YYYY-MM-DD). Defaults to --days ago."
+        )
+        parser.add_argument(
+            "--until", help="Last day to rebuild (YYYY-MM-DD). Defaults to today."
+        )
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument(
+            "--chunk-days",
+            type=int,
+            default=7,
+            help="Days recomputed per transaction",
+        )
+
+    def handle(self, *args, **options):
+        until = (
+            parse_date_option(options["until"], "--until")
+            if options["until"]
+            else timezone.localdate()
+        )
+        since = (
+            parse_date_option(options["since"], "--since")
+            if options["since"]
+            else until - timedelta(days=options["days"] - 1)
+        )
+        if since > until:
+            raise CommandError("The range is empty")
+        if options["chunk_days"] < 1:
+            raise CommandError("--chunk-days must be at least 1")
+
+        rows = 0
+        for start, end, written in rebuild_in_chunks(
+            rebuild_revenue_rollups,
+            since,
+            until,
+            timedelta(days=1),
+            options["chunk_days"],
+        ):
+            rows += written
+            self.stdout.write(f"{start} to {end}: {written} rollups")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {rows} rollups from {since} to {until}")
+        )
@@ -0,0 +1,30 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from api.payments.services import (
+    reconcile_payment,
+    reconcile_refund,
+    stale_payments,
+    stale_refunds,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Finish payments and refunds whose Stripe call never completed. "
+        "Run periodically, e.g. every few minutes from a scheduler."
+    )
+
+    def handle(self, *args, **options):
+        payments = Counter(reconcile_payment(p) for p in stale_payments().iterator())
+        refunds = Counter(reconcile_refund(r) for r in stale_refunds().iterator())
+
+        for name, outcomes in (("payments", payments), ("refunds", refunds)):
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{name.capitalize()}: {outcomes['completed']} completed, "
+                    f"{outcomes['canceled']} canceled, "
+                    f"{outcomes['pending']} still pending"
+                )
+            )
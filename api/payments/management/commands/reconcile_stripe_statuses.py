@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.payments.reconciliation import StripeReconciliation
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare payment and refund statuses with Stripe for a time window, "
+        "correct the ones that have drifted (e.g. after a missed webhook) and "
+        "report every discrepancy. Run daily from a scheduler."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            help="Start of the window (ISO 8601). Defaults to --hours ago.",
+        )
+        parser.add_argument(
+            "--until", help="End of the window (ISO 8601). Defaults to now."
+        )
+        parser.add_argument("--hours", type=float, default=24)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument(
+            "--slice-minutes",
+            type=int,
+            default=60,
+            help="The window is paged in slices of this length, in parallel",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Report without correcting"
+        )
+
+    def parse(self, value, option):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f"{option} is not a valid datetime: {value}")
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def handle(self, *args, **options):
+        until = (
+            self.parse(options["until"], "--until")
+            if options["until"]
+            else timezone.now()
+        )
+        since = (
+            self.parse(options["since"], "--since")
+            if options["since"]
+            else until - timedelta(hours=options["hours"])
+        )
+        if since >= until:
+            raise CommandError("The window is empty")
+
+        reports = StripeReconciliation(
+            since,
+            until,
+            workers=options["workers"],
+            slice_length=timedelta(minutes=options["slice_minutes"]),
+            dry_run=options["dry_run"],
+        ).run()
+
+        for name, report in reports.items():
+            for stripe_id, status, stripe_status in report["mismatches"]:
+                self.stdout.write(
+                    f"{stripe_id}: local status {status}, Stripe {stripe_status}"
+                )
+            for stripe_id in report["untracked"]:
+                self.stdout.write(f"{stripe_id}: on Stripe but not recorded here")
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{name.capitalize()}: {report['checked']} checked, "
+                    f"{len(report['mismatches'])} mismatched, "
+                    f"{report['corrected']} corrected, "
+                    f"{len(report['untracked'])} missing locally"
+                )
+            )
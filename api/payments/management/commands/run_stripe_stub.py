@@ -0,0 +1,352 @@
+import hashlib
+import hmac
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def parse_form(body):
+    """
+    Decode Stripe's form encoding, where metadata[key]=value nests.
+    """
+    data = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        parts = key.replace("]", "").split("[")
+        target = data
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return data
+
+
+class StripeStubHandler(BaseHTTPRequestHandler):
+    """
+    Just enough of the Stripe API for this project's payment flow.
+    """
+
+    ROUTES = [
+        ("POST", r"/v1/payment_intents", "create_payment_intent"),
+        ("POST", r"/v1/payment_intents/(?P<id>\w+)/confirm", "confirm_payment_intent"),
+        ("POST", r"/v1/payment_intents/(?P<id>\w+)/cancel", "cancel_payment_intent"),
+        ("GET", r"/v1/payment_intents", "list_payment_intents"),
+        ("GET", r"/v1/payment_intents/(?P<id>\w+)", "retrieve_payment_intent"),
+        ("POST", r"/v1/refunds", "create_refund"),
+        ("GET", r"/v1/refunds", "list_refunds"),
+        ("GET", r"/v1/charges/(?P<id>\w+)", "retrieve_charge"),
+    ]
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; don't let Nagle delay them.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode() if length else ""
+        params = parse_form(body if method == "POST" else url.query)
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if random.random() < self.server.error_rate:
+            return self.send_error_json(500, "api_error", "Injected failure")
+
+        key = self.headers.get("Idempotency-Key")
+        if method == "POST" and key:
+            with self.server.lock:
+                stored = self.server.idempotent.get(key)
+            if stored is not None:
+                return self.send_json(*stored)
+
+        for route_method, pattern, name in self.ROUTES:
+            match = re.fullmatch(pattern, url.path)
+            if route_method == method and match:
+                with self.server.lock:
+                    response = getattr(self, name)(params, **match.groupdict())
+                if method == "POST" and key:
+                    with self.server.lock:
+                        self.server.idempotent[key] = response
+                return self.send_json(*response)
+
+        self.send_error_json(404, "invalid_request_error", f"No route {url.path}")
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Request-Id", f"req_{secrets.token_hex(8)}")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_error_json(self, status, type, message):
+        self.send_json(status, {"error": {"type": type, "message": message}})
+
+    def page(self, url, objects, params):
+        """
+        One page of a list endpoint: newest first, filtered by created[...]
+        and continued with starting_after.
+        """
+        created = params.get("created", {})
+        bounds = {
+            "gt": lambda value, bound: value > bound,
+            "gte": lambda value, bound: value >= bound,
+            "lt": lambda value, bound: value < bound,
+            "lte": lambda value, bound: value <= bound,
+        }
+        objects = [
+            obj
+            for obj in reversed(objects)
+            if all(
+                bounds[op](obj["created"], int(bound))
+                for op, bound in created.items()
+            )
+        ]
+        after = params.get("starting_after")
+        if after:
+            ids = [obj["id"] for obj in objects]
+            objects = objects[ids.index(after) + 1:] if after in ids else []
+        limit = int(params.get("limit", 10))
+        return 200, {
+            "object": "list",
+            "url": url,
+            "has_more": len(objects) > limit,
+            "data": objects[:limit],
+        }
+
+    def not_found(self, kind, id):
+        return 404, {
+            "error": {
+                "type": "invalid_request_error",
+                "code": "resource_missing",
+                "message": f"No such {kind}: '{id}'",
+            }
+        }
+
+    # Handlers run under server.lock and return (status, body).
+
+    def create_payment_intent(self, params):
+        intent_id = self.server.new_id("pi")
+        intent = {
+            "id": intent_id,
+            "object": "payment_intent",
+            "amount": int(params["amount"]),
+            "currency": params.get("currency", "usd"),
+            "metadata": params.get("metadata", {}),
+            "status": "requires_payment_method",
+            "client_secret": f"{intent_id}_secret_{secrets.token_hex(8)}",
+            "payment_method": None,
+            "latest_charge": None,
+            "created": int(time.time()),
+        }
+        self.server.payment_intents[intent_id] = intent
+        return 200, intent
+
+    def list_payment_intents(self, params):
+        return self.page(
+            "/v1/payment_intents", list(self.server.payment_intents.values()), params
+        )
+
+    def retrieve_payment_intent(self, params, id):
+        intent = self.server.payment_intents.get(id)
+        return (200, intent) if intent else self.not_found("payment_intent", id)
+
+    def confirm_payment_intent(self, params, id):
+        intent = self.server.payment_intents.get(id)
+        if intent is None:
+            return self.not_found("payment_intent", id)
+
+        charge_id = self.server.new_id("ch")
+        self.server.charges[charge_id] = {
+            "id": charge_id,
+            "object": "charge",
+            "amount": intent["amount"],
+            "amount_refunded": 0,
+            "payment_intent": id,
+            "refunds": {"object": "list", "data": []},
+        }
+        intent.update(
+            status="succeeded",
+            payment_method=params.get("payment_method", "pm_card_visa"),
+            latest_charge=charge_id,
+        )
+        self.server.send_event("payment_intent.succeeded", intent)
+        return 200, intent
+
+    def cancel_payment_intent(self, params, id):
+        intent = self.server.payment_intents.get(id)
+        if intent is None:
+            return self.not_found("payment_intent", id)
+        intent["status"] = "canceled"
+        self.server.send_event("payment_intent.canceled", intent)
+        return 200, intent
+
+    def create_refund(self, params):
+        intent = self.server.payment_intents.get(params.get("payment_intent"))
+        if intent is None or intent["status"] != "succeeded":
+            return 400, {
+                "error": {
+                    "type": "invalid_request_error",
+                    "message": "This PaymentIntent has no successful charge",
+                }
+            }
+
+        charge = self.server.charges[intent["latest_charge"]]
+        amount = int(params.get("amount", charge["amount"]))
+        refund = {
+            "id": self.server.new_id("re"),
+            "object": "refund",
+            "amount": amount,
+            "charge": charge["id"],
+            "payment_intent": intent["id"],
+            "metadata": params.get("metadata", {}),
+            "reason": params.get("reason"),
+            "status": "succeeded",
+            "created": int(time.time()),
+        }
+        self.server.refunds.append(refund)
+        charge["amount_refunded"] += amount
+        charge["refunds"]["data"].insert(0, refund)
+        self.server.send_event("refund.created", refund)
+        self.server.send_event("charge.refunded", charge)
+        return 200, refund
+
+    def list_refunds(self, params):
+        intent_id = params.get("payment_intent")
+        refunds = [
+            refund
+            for refund in self.server.refunds
+            if intent_id is None or refund["payment_intent"] == intent_id
+        ]
+        return self.page("/v1/refunds", refunds, params)
+
+    def retrieve_charge(self, params, id):
+        charge = self.server.charges.get(id)
+        return (200, charge) if charge else self.not_found("charge", id)
+
+
+class StripeStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, command, webhook_url, latency, error_rate, verbose):
+        super().__init__(address, StripeStubHandler)
+        self.command = command
+        self.webhook_url = webhook_url
+        self.latency = latency
+        self.error_rate = error_rate
+        self.verbose = verbose
+
+        self.lock = threading.Lock()
+        self.idempotent = {}
+        self.payment_intents = {}
+        self.charges = {}
+        self.refunds = []
+
+    def new_id(self, prefix):
+        return f"{prefix}_stub{secrets.token_hex(10)}"
+
+    def send_event(self, type, obj):
+        """
+        Deliver a signed webhook for `obj` in the background.
+        """
+        if not self.webhook_url:
+            return
+        event = {
+            "id": self.new_id("evt"),
+            "object": "event",
+            "type": type,
+            "created": int(time.time()),
+            "data": {"object": json.loads(json.dumps(obj))},
+        }
+        threading.Thread(target=self._deliver, args=(event,), daemon=True).start()
+
+    def _deliver(self, event):
+        payload = json.dumps(event)
+        timestamp = int(time.time())
+        signature = hmac.new(
+            settings.STRIPE_WEBHOOK_SECRET.encode(),
+            f"{timestamp}.{payload}".encode(),
+            hashlib.sha256,
+        ).hexdigest()
+        try:
+            response = requests.post(
+                self.webhook_url,
+                data=payload,
+                headers={
+                    "Content-Type": "application/json",
+                    "Stripe-Signature": f"t={timestamp},v1={signature}",
+                },
+                timeout=10,
+            )
+            self.command.stdout.write(
+                f"{event['type']} {event['id']} -> {response.status_code}"
+            )
+        except requests.RequestException as e:
+            self.command.stderr.write(f"Could not deliver {event['type']}: {e}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local stand-in for the Stripe API, for developing and load "
+        "testing the payment flow offline. Set STRIPE_API_BASE to its address. "
+        "Confirm an intent with POST /v1/payment_intents/<id>/confirm."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=12111)
+        parser.add_argument(
+            "--webhook-url",
+            default=None,
+            help="Send signed webhook events here, e.g. "
+            "http://127.0.0.1:8000/api/payments/stripe/webhook/",
+        )
+        parser.add_argument(
+            "--latency-ms", type=int, default=0, help="Delay added to every response"
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="Fraction of requests answered with a 500",
+        )
+        parser.add_argument("--verbose", action="store_true")
+
+    def handle(self, *args, **options):
+        server = StripeStubServer(
+            (options["host"], options["port"]),
+            self,
+            webhook_url=options["webhook_url"],
+            latency=options["latency_ms"] / 1000,
+            error_rate=options["error_rate"],
+            verbose=options["verbose"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stripe stub listening on http://{options['host']}:{options['port']}"
+            )
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
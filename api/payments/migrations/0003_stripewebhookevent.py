@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:13
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_remove_appointmentpayment_appointment_uuid_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('stripe_event_id', models.CharField(max_length=255, unique=True)),
+                ('event_type', models.CharField(max_length=100)),
+                ('ordering_key', models.CharField(max_length=255)),
+                ('stripe_created', models.DateTimeField()),
+                ('payload', models.JSONField()),
+                ('status', models.IntegerField(choices=[(1, 'Pending'), (2, 'Processed'), (3, 'Failed')], default=1)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 1)), fields=['stripe_created', 'id'], name='stripe_event_pending_idx'), models.Index(fields=['ordering_key', 'stripe_created'], name='stripe_event_ordering_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_stripewebhookevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointmentpaymentrefund',
+            name='appointment_status',
+            field=models.IntegerField(blank=True, choices=[(0, 'Pending'), (1, 'Confirmed'), (2, 'Cancelled'), (3, 'Refunded'), (4, 'Completed'), (5, 'Rescheduled'), (6, 'Refund Pending')], help_text='Status given to the appointment once Stripe accepts the refund', null=True),
+        ),
+        migrations.AddField(
+            model_name='appointmentpaymentrefund',
+            name='stripe_refund_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='appointmentpayment',
+            name='stripe_client_secret',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='appointmentpayment',
+            name='stripe_payment_intent_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_two_phase_stripe_calls'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointmentpayment',
+            name='stripe_charge_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:35
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0002_initial'),
+        ('payments', '0005_appointmentpayment_stripe_charge_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('day', models.DateField()),
+                ('appointment_type', models.IntegerField(choices=[(0, 'Surveillance'), (1, 'Diagnosis'), (2, 'Screening'), (3, 'Second Opinion'), (4, 'General'), (5, 'Follow Up')])),
+                ('currency', models.CharField(max_length=3)),
+                ('payments', models.IntegerField(default=0)),
+                ('gross_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('refunds', models.IntegerField(default=0)),
+                ('refunded_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_rollups', to='doctors.doctor')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'doctor', 'appointment_type', 'currency'), name='daily_revenue_rollup_unique')],
+            },
+        ),
+    ]
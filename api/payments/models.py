@@ -1,9 +1,15 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
+
+from api.appointments.choices import Status as AppointmentStatus
 from api.base_models import BaseModel
+from api.doctors.choices import Services
 from api.payments.choices import (
     PaymentStatusChoices,
     RefundPolicyChoices,
     RefundPaymentChoices,
+    WebhookEventStatus,
 )
 
 
@@ -12,8 +18,11 @@ class AppointmentPayment(BaseModel):
     Model to store appointment payment details.
     """
 
-    stripe_payment_intent_id = models.CharField(max_length=255, unique=True)
-    stripe_client_secret = models.CharField(max_length=255)
+    # Empty until Stripe has created the intent; see create_payment_intent.
+    stripe_payment_intent_id = models.CharField(
+        max_length=255, unique=True, null=True, blank=True
+    )
+    stripe_client_secret = models.CharField(max_length=255, blank=True)
 
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, default="usd")
@@ -31,6 +40,15 @@ class AppointmentPayment(BaseModel):
     )
 
     payment_method_id = models.CharField(max_length=255, blank=True)
+    # The successful charge, recorded from webhooks so refund events can be
+    # matched to the payment without asking Stripe.
+    stripe_charge_id = models.CharField(
+        max_length=255, unique=True, null=True, blank=True
+    )
+
+    @property
+    def idempotency_key(self):
+        return f"payment-intent-{self.uuid}"
 
     def __str__(self):
         return f"Payment for Appointment {self.appointment} - {self.status}"
@@ -54,6 +72,24 @@ class RefundPolicy(BaseModel):
     )
     is_active = models.BooleanField(default=True)
 
+    def clean(self):
+        # Gaps can only be judged once every policy is in place; the refund
+        # policy table logs them when it loads.
+        if self.hours_before_min >= self.hours_before_max:
+            raise ValidationError(
+                "hours_before_max must be greater than hours_before_min"
+            )
+        if self.is_active:
+            overlapping = RefundPolicy.objects.filter(
+                is_active=True,
+                hours_before_min__lt=self.hours_before_max,
+                hours_before_max__gt=self.hours_before_min,
+            ).exclude(pk=self.pk)
+            if overlapping.exists():
+                raise ValidationError(
+                    f"Overlaps the active policy {overlapping.first().name}"
+                )
+
     def __str__(self):
         return f"{self.name} - {self.get_refund_type_display()}"
 
@@ -87,5 +123,93 @@ class AppointmentPaymentRefund(BaseModel):
 
     reason = models.CharField(max_length=255, blank=True, null=True)
 
+    # Empty until Stripe has accepted the refund; see submit_refund.
+    stripe_refund_id = models.CharField(
+        max_length=255, unique=True, null=True, blank=True
+    )
+    appointment_status = models.IntegerField(
+        choices=AppointmentStatus.choices,
+        null=True,
+        blank=True,
+        help_text="Status given to the appointment once Stripe accepts the refund",
+    )
+
+    @property
+    def idempotency_key(self):
+        return f"refund-{self.uuid}"
+
     def __str__(self):
         return f"Refund for Payment {self.appointment_payment} - {self.status}"
+
+
+class DailyRevenueRollup(BaseModel):
+    """
+    Payments and refunds of one day, doctor, appointment type and currency.
+    Kept current by api.payments.rollups as payment and refund statuses
+    change, so revenue reports never scan the payments themselves.
+
+    Payments count on the day they were created once they have succeeded,
+    refunds on the day they were requested once Stripe has paid them out.
+    """
+
+    day = models.DateField()
+    doctor = models.ForeignKey(
+        "doctors.Doctor", on_delete=models.CASCADE, related_name="revenue_rollups"
+    )
+    appointment_type = models.IntegerField(choices=Services.choices)
+    currency = models.CharField(max_length=3)
+
+    payments = models.IntegerField(default=0)
+    gross_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    refunds = models.IntegerField(default=0)
+    refunded_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "doctor", "appointment_type", "currency"],
+                name="daily_revenue_rollup_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.doctor_id} {self.appointment_type} {self.currency}"
+
+
+class StripeWebhookEvent(BaseModel):
+    """
+    Inbox of verified Stripe webhook events, one row per Stripe event id, so
+    redelivered events are stored once. process_stripe_events works through
+    it; events sharing an ordering_key (their payment intent) are processed
+    one at a time in the order Stripe created them.
+    """
+
+    stripe_event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    ordering_key = models.CharField(max_length=255)
+    stripe_created = models.DateTimeField()
+    payload = models.JSONField()
+
+    status = models.IntegerField(
+        choices=WebhookEventStatus.choices, default=WebhookEventStatus.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["stripe_created", "id"],
+                name="stripe_event_pending_idx",
+                condition=models.Q(status=WebhookEventStatus.PENDING),
+            ),
+            models.Index(
+                fields=["ordering_key", "stripe_created"],
+                name="stripe_event_ordering_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.stripe_event_id} - {self.status}"
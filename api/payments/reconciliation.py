@@ -0,0 +1,236 @@
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+
+from api.payments.choices import PaymentStatusChoices, RefundPaymentChoices
+from api.payments.gateway import get_stripe_gateway
+from api.payments.models import AppointmentPayment, AppointmentPaymentRefund
+from api.payments.rollups import set_payment_status, set_refund_status
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 100
+# Ids per IN (...) when reading and correcting local rows.
+BATCH_SIZE = 500
+
+# Stripe status -> (local status to correct to, local statuses that agree).
+# A payment marked failed goes back to requires_payment_method on Stripe,
+# and a refunded payment's intent stays succeeded.
+PAYMENT_STATUSES = {
+    "requires_payment_method": (
+        PaymentStatusChoices.REQUIRES_PAYMENT_METHOD,
+        {PaymentStatusChoices.REQUIRES_PAYMENT_METHOD, PaymentStatusChoices.FAILED},
+    ),
+    "requires_confirmation": (
+        PaymentStatusChoices.REQUIRES_CONFIRMATION,
+        {PaymentStatusChoices.REQUIRES_CONFIRMATION},
+    ),
+    "requires_action": (
+        PaymentStatusChoices.REQUIRES_ACTION,
+        {PaymentStatusChoices.REQUIRES_ACTION},
+    ),
+    "processing": (
+        PaymentStatusChoices.PROCESSING,
+        {PaymentStatusChoices.PROCESSING},
+    ),
+    "succeeded": (
+        PaymentStatusChoices.SUCCEEDED,
+        {PaymentStatusChoices.SUCCEEDED, PaymentStatusChoices.REFUNDED},
+    ),
+    "canceled": (
+        PaymentStatusChoices.CANCELED,
+        {PaymentStatusChoices.CANCELED},
+    ),
+}
+REFUND_STATUSES = {
+    "pending": (
+        RefundPaymentChoices.REQUIRES_ACTION,
+        {RefundPaymentChoices.REQUIRES_ACTION},
+    ),
+    "requires_action": (
+        RefundPaymentChoices.REQUIRES_ACTION,
+        {RefundPaymentChoices.REQUIRES_ACTION},
+    ),
+    "succeeded": (
+        RefundPaymentChoices.SUCCEEDED,
+        {RefundPaymentChoices.SUCCEEDED},
+    ),
+    "failed": (
+        RefundPaymentChoices.FAILED,
+        {RefundPaymentChoices.FAILED},
+    ),
+    "canceled": (
+        RefundPaymentChoices.CANCELLED,
+        {RefundPaymentChoices.CANCELLED},
+    ),
+}
+
+
+class RateLimiter:
+    """
+    Spaces calls from any number of threads at least 1 / rate seconds apart.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def window_slices(start, end, slice_length):
+    while start < end:
+        yield start, min(start + slice_length, end)
+        start += slice_length
+
+
+def fetch_slice(operation, start, end, limiter):
+    """
+    Page through every object `operation` lists with a created time in
+    [start, end). Returns {id: object}.
+    """
+    gateway = get_stripe_gateway()
+    # Stripe times are whole seconds; rounding both ends the same way keeps
+    # adjacent slices from overlapping or leaving gaps.
+    params = {
+        "created": {
+            "gte": math.ceil(start.timestamp()),
+            "lt": math.ceil(end.timestamp()),
+        },
+        "limit": PAGE_SIZE,
+    }
+    objects = {}
+    while True:
+        limiter.wait()
+        page = gateway.request(operation, params=params)
+        for obj in page.data:
+            objects[obj.id] = obj
+        if not page.has_more or not page.data:
+            return objects
+        params["starting_after"] = page.data[-1].id
+
+
+class StripeReconciliation:
+    """
+    Compares what Stripe holds for a time window with the local payments
+    and refunds, and corrects local statuses that have drifted, e.g. after
+    a missed webhook.
+
+    The window is cut into slices that a thread pool pages through at once,
+    all threads sharing one rate limit. The diff is done in memory by
+    Stripe id, and corrections are applied a status pair at a time with
+    UPDATE ... WHERE status = <what was read>, so a row a webhook changed in
+    the meantime is left alone.
+    """
+
+    def __init__(self, start, end, workers=4, slice_length=None, dry_run=False):
+        self.start = start
+        self.end = end
+        self.workers = workers
+        self.slice_length = slice_length or timedelta(hours=1)
+        self.dry_run = dry_run
+        self.limiter = RateLimiter(settings.STRIPE_RECONCILE_REQUESTS_PER_SECOND)
+
+    def run(self):
+        """
+        Returns {"payments": report, "refunds": report}; see `diff`.
+        """
+        remote = {"payment_intents.list": {}, "refunds.list": {}}
+        slices = list(window_slices(self.start, self.end, self.slice_length))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = []
+            for operation in remote:
+                for start, end in slices:
+                    future = executor.submit(
+                        fetch_slice, operation, start, end, self.limiter
+                    )
+                    futures.append((operation, future))
+            for operation, future in futures:
+                remote[operation].update(future.result())
+
+        return {
+            "payments": self.diff(
+                AppointmentPayment,
+                "stripe_payment_intent_id",
+                PAYMENT_STATUSES,
+                set_payment_status,
+                remote["payment_intents.list"],
+                ours=lambda obj: "appointment_uuid" in (obj.metadata or {}),
+            ),
+            "refunds": self.diff(
+                AppointmentPaymentRefund,
+                "stripe_refund_id",
+                REFUND_STATUSES,
+                set_refund_status,
+                remote["refunds.list"],
+                ours=lambda obj: "refund_id" in (obj.metadata or {}),
+            ),
+        }
+
+    def diff(self, model, id_field, statuses, set_status, remote, ours):
+        """
+        Match `remote` Stripe objects to `model` rows by `id_field` and
+        correct mismatched statuses with `set_status`, which keeps the
+        revenue rollups in step. The report holds the number of objects
+        checked and corrected, the mismatches found as
+        (stripe id, local status label, Stripe status) and the ids of objects
+        created by this project that have no local row.
+        """
+        local = {}
+        ids = list(remote)
+        for i in range(0, len(ids), BATCH_SIZE):
+            local.update(
+                (stripe_id, (pk, status))
+                for pk, stripe_id, status in model.objects.filter(
+                    **{f"{id_field}__in": ids[i:i + BATCH_SIZE]}
+                ).values_list("pk", id_field, "status")
+            )
+
+        labels = dict(model._meta.get_field("status").flatchoices)
+        mismatches = []
+        corrections = defaultdict(list)
+        untracked = []
+        for stripe_id, obj in remote.items():
+            if stripe_id not in local:
+                if ours(obj):
+                    untracked.append(stripe_id)
+                continue
+            pk, status = local[stripe_id]
+            if obj.status not in statuses:
+                logger.warning(f"Unknown Stripe status {obj.status} on {stripe_id}")
+                continue
+            correct, agreeing = statuses[obj.status]
+            if status not in agreeing:
+                mismatches.append((stripe_id, labels[status], obj.status))
+                corrections[(status, correct)].append(pk)
+
+        corrected = 0
+        if not self.dry_run:
+            for (status, correct), pks in corrections.items():
+                for i in range(0, len(pks), BATCH_SIZE):
+                    corrected += set_status(
+                        model.objects.filter(
+                            pk__in=pks[i:i + BATCH_SIZE], status=status
+                        ),
+                        correct,
+                    )
+
+        return {
+            "checked": len(remote),
+            "corrected": corrected,
+            "mismatches": mismatches,
+            "untracked": untracked,
+        }
@@ -0,0 +1,225 @@
+import hashlib
+import logging
+import threading
+import time
+from bisect import bisect_right
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ValidationError
+
+from api.payments.choices import PaymentStatusChoices, RefundPaymentChoices
+from api.payments.models import (
+    AppointmentPayment,
+    AppointmentPaymentRefund,
+    RefundPolicy,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def find_interval_problems(intervals):
+    """
+    Describe the overlaps and gaps in `intervals`, (min, max, name) tuples
+    of hours before the appointment, which should cover [0, last max)
+    exactly once.
+    """
+    problems = []
+    covered_to = 0
+    for low, high, name in sorted(intervals):
+        if low >= high:
+            problems.append(f"{name} covers no hours ({low}-{high})")
+            continue
+        if low > covered_to:
+            problems.append(f"No policy covers {covered_to}-{low} hours")
+        elif low < covered_to:
+            problems.append(
+                f"{name} overlaps another policy at {low}-{min(high, covered_to)} hours"
+            )
+        covered_to = max(covered_to, high)
+    return problems
+
+
+class RefundPolicyTable:
+    """
+    Immutable in-process interval index over active RefundPolicies.
+
+    Policies are sorted by hours_before_min, so finding the one that
+    applies to an appointment is one bisection over the interval starts.
+    """
+
+    def __init__(self, policies):
+        self._policies = sorted(
+            policies, key=lambda p: (p.hours_before_min, p.hours_before_max)
+        )
+        self._starts = [policy.hours_before_min for policy in self._policies]
+        # Identifies this set of policies in caches shared by every worker.
+        self.version = hashlib.sha256(
+            repr(
+                [
+                    (p.pk, p.hours_before_min, p.hours_before_max, p.refund_percentage)
+                    for p in self._policies
+                ]
+            ).encode()
+        ).hexdigest()[:16]
+        self.problems = find_interval_problems(
+            (p.hours_before_min, p.hours_before_max, p.name) for p in self._policies
+        )
+
+    def policy_for(self, hours_until):
+        """
+        Return the policy for cancelling `hours_until` hours before the
+        appointment, or None if no policy covers it. Appointments that have
+        started count as 0 hours away.
+        """
+        hours_until = max(hours_until, 0)
+        i = bisect_right(self._starts, hours_until) - 1
+        if i < 0:
+            return None
+        policy = self._policies[i]
+        return policy if hours_until < policy.hours_before_max else None
+
+
+# Bumped in the shared cache whenever a policy changes, so every worker
+# rebuilds its table on its next lookup rather than when its copy expires.
+POLICY_GENERATION_KEY = "refund-policy-generation"
+
+_table = None
+_generation = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def get_refund_policy_table():
+    """
+    Return this process's RefundPolicyTable, rebuilding it when the shared
+    policy generation has moved on or it is older than
+    REFUND_POLICY_CACHE_SECONDS.
+    """
+    global _table, _generation, _loaded_at
+
+    ttl = getattr(settings, "REFUND_POLICY_CACHE_SECONDS", 300)
+    generation = cache.get(POLICY_GENERATION_KEY, 0)
+    table = _table
+    if (
+        table is not None
+        and _generation == generation
+        and time.monotonic() - _loaded_at < ttl
+    ):
+        return table
+
+    with _lock:
+        if (
+            _table is None
+            or _generation != generation
+            or time.monotonic() - _loaded_at >= ttl
+        ):
+            _table = RefundPolicyTable(RefundPolicy.objects.filter(is_active=True))
+            _generation = generation
+            _loaded_at = time.monotonic()
+            for problem in _table.problems:
+                logger.error(f"Refund policies: {problem}")
+        return _table
+
+
+def invalidate_refund_policy_table():
+    """
+    Make every worker rebuild its RefundPolicyTable on its next lookup.
+    """
+    global _table
+    try:
+        cache.incr(POLICY_GENERATION_KEY)
+    except ValueError:
+        # No generation yet (or it was evicted): start one. If another
+        # process started it first, count this change on top of it.
+        if not cache.add(POLICY_GENERATION_KEY, 1, timeout=None):
+            cache.incr(POLICY_GENERATION_KEY)
+    _table = None
+
+
+def refund_quote_key(appointment_uuid, table):
+    return f"refund-quote:{table.version}:{appointment_uuid}"
+
+
+def invalidate_refund_quote(appointment_uuid):
+    cache.delete(refund_quote_key(appointment_uuid, get_refund_policy_table()))
+
+
+def get_refund_quote(appointment_uuid, user):
+    """
+    What the patient `user` would get back for cancelling the appointment
+    now. The quote is cached until the appointment crosses into the next
+    policy's interval (at most REFUND_QUOTE_CACHE_SECONDS), and dropped
+    when a refund is requested.
+    """
+    table = get_refund_policy_table()
+    key = refund_quote_key(appointment_uuid, table)
+    cached = cache.get(key)
+    if cached is not None and cached["user_id"] == user.pk:
+        return cached["quote"]
+
+    payment = (
+        AppointmentPayment.objects.filter(
+            appointment__uuid=appointment_uuid,
+            appointment__medical_record__patient__user=user,
+        )
+        .annotate(
+            refund_open=Exists(
+                AppointmentPaymentRefund.objects.filter(
+                    appointment_payment=OuterRef("pk"),
+                    status__in=[
+                        RefundPaymentChoices.REQUIRES_ACTION,
+                        RefundPaymentChoices.SUCCEEDED,
+                    ],
+                )
+            )
+        )
+        .values(
+            "amount",
+            "currency",
+            "status",
+            "refund_open",
+            "appointment__time_slot__start_time",
+        )
+        .order_by("-created_at")
+        .first()
+    )
+    if payment is None:
+        raise NotFound("Payment not found")
+    if payment["status"] != PaymentStatusChoices.SUCCEEDED:
+        raise ValidationError({"detail": "Only succeeded payments can be refunded"})
+    if payment["refund_open"]:
+        raise ValidationError({"detail": "Payment already has a refund"})
+
+    start_time = payment["appointment__time_slot__start_time"]
+    now = timezone.now()
+    policy = table.policy_for((start_time - now).total_seconds() / 3600)
+    if policy is None:
+        raise ValidationError({"detail": "No active refund policy found"})
+
+    refund_amount = (
+        payment["amount"] * policy.refund_percentage / 100
+    ).quantize(Decimal("0.01"))
+    valid_until = start_time - timedelta(hours=policy.hours_before_min)
+    quote = {
+        "appointment_uuid": str(appointment_uuid),
+        "appointment_start_time": start_time,
+        "amount_paid": str(payment["amount"]),
+        "currency": payment["currency"],
+        "refund_policy": policy.name,
+        "refund_percentage": str(policy.refund_percentage),
+        "refund_amount": str(refund_amount),
+        "valid_until": valid_until,
+    }
+
+    timeout = min(
+        (valid_until - now).total_seconds(),
+        getattr(settings, "REFUND_QUOTE_CACHE_SECONDS", 3600),
+    )
+    if timeout >= 1:
+        cache.set(key, {"user_id": user.pk, "quote": quote}, int(timeout))
+    return quote
@@ -0,0 +1,272 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from api.doctors.choices import Services
+from api.payments.choices import PaymentStatusChoices, RefundPaymentChoices
+from api.payments.models import (
+    AppointmentPayment,
+    AppointmentPaymentRefund,
+    DailyRevenueRollup,
+)
+from api.utils.rollups import add_to_rollups
+
+# A refunded payment was still collected; its refund is counted separately.
+COUNTED_PAYMENT_STATUSES = {
+    PaymentStatusChoices.SUCCEEDED,
+    PaymentStatusChoices.REFUNDED,
+}
+COUNTED_REFUND_STATUSES = {RefundPaymentChoices.SUCCEEDED}
+
+# Every payment and refund status change goes through set_payment_status or
+# set_refund_status. They lock the rows, update them, and in the same
+# transaction add or subtract the amounts of the rows that started or
+# stopped counting to their DailyRevenueRollup. Rows are bucketed by the day
+# they were created and by their appointment's doctor and type; payments
+# with no appointment or slot are not counted anywhere.
+
+# The DailyRevenueRollup columns matching the tuples _bucket returns.
+ROLLUP_KEY = ("day", "doctor_id", "appointment_type", "currency")
+PAYMENT_FIELDS = {
+    "created": "created_at",
+    "doctor": "appointment__time_slot__doctor_id",
+    "appointment_type": "appointment__appointment_type",
+    "currency": "currency",
+}
+REFUND_FIELDS = {
+    "created": "created_at",
+    "doctor": "appointment_payment__appointment__time_slot__doctor_id",
+    "appointment_type": "appointment_payment__appointment__appointment_type",
+    "currency": "appointment_payment__currency",
+}
+
+
+def _bucket(row, fields):
+    return (
+        timezone.localdate(row[fields["created"]]),
+        row[fields["doctor"]],
+        row[fields["appointment_type"]],
+        row[fields["currency"]],
+    )
+
+
+def _change_status(queryset, status, fields, counted, columns, **updates):
+    """
+    Set `status` (and `updates`) on every row of `queryset` and move the
+    rows whose counted state changes in or out of the rollups. Returns the
+    number of rows updated.
+    """
+    count_column, amount_column = columns
+    with transaction.atomic():
+        rows = list(
+            queryset.select_for_update(of=("self",)).values(
+                "pk", "status", "amount", *fields.values()
+            )
+        )
+        if not rows:
+            return 0
+        queryset.model.objects.filter(pk__in=[row["pk"] for row in rows]).update(
+            status=status, **updates
+        )
+
+        deltas = defaultdict(lambda: {count_column: 0, amount_column: 0})
+        for row in rows:
+            if (row["status"] in counted) == (status in counted):
+                continue
+            if row[fields["doctor"]] is None:
+                continue
+            sign = 1 if status in counted else -1
+            delta = deltas[_bucket(row, fields)]
+            delta[count_column] += sign
+            delta[amount_column] += sign * row["amount"]
+        add_to_rollups(DailyRevenueRollup, ROLLUP_KEY, deltas)
+    return len(rows)
+
+
+def set_payment_status(queryset, status, **updates):
+    """
+    Move the payments in `queryset` to `status`, also setting `updates`,
+    and keep the revenue rollups in step.
+    """
+    return _change_status(
+        queryset,
+        status,
+        PAYMENT_FIELDS,
+        COUNTED_PAYMENT_STATUSES,
+        ("payments", "gross_amount"),
+        **updates,
+    )
+
+
+def set_refund_status(queryset, status):
+    """
+    Move the refunds in `queryset` to `status` and keep the revenue rollups
+    in step.
+    """
+    return _change_status(
+        queryset,
+        status,
+        REFUND_FIELDS,
+        COUNTED_REFUND_STATUSES,
+        ("refunds", "refunded_amount"),
+    )
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def rebuild_revenue_rollups(since, until):
+    """
+    Recompute the rollups of the days from `since` to `until`, inclusive,
+    from the payments and refunds themselves, in one transaction. Returns
+    the number of rollup rows written.
+
+    A webhook or reconciliation run that moves one of these payments or
+    refunds meanwhile blocks on its row: it committed before the totals
+    were read, or it adds its amount to the rewritten row once this
+    transaction commits.
+    """
+    start, end = _day_start(since), _day_start(until + timedelta(days=1))
+    payments = AppointmentPayment.objects.filter(
+        created_at__gte=start, created_at__lt=end
+    )
+    refunds = AppointmentPaymentRefund.objects.filter(
+        created_at__gte=start, created_at__lt=end
+    )
+
+    with transaction.atomic():
+        for queryset in (payments, refunds):
+            list(queryset.select_for_update().values_list("pk", flat=True))
+        DailyRevenueRollup.objects.filter(day__gte=since, day__lte=until).delete()
+
+        totals = defaultdict(dict)
+        for queryset, fields, counted, (count_column, amount_column) in (
+            (
+                payments,
+                PAYMENT_FIELDS,
+                COUNTED_PAYMENT_STATUSES,
+                ("payments", "gross_amount"),
+            ),
+            (
+                refunds,
+                REFUND_FIELDS,
+                COUNTED_REFUND_STATUSES,
+                ("refunds", "refunded_amount"),
+            ),
+        ):
+            groups = (
+                queryset.filter(status__in=counted)
+                .exclude(**{f"{fields['doctor']}__isnull": True})
+                .values(
+                    fields["doctor"],
+                    fields["appointment_type"],
+                    fields["currency"],
+                    day=TruncDate(fields["created"]),
+                )
+                .annotate(count=Count("pk"), amount=Sum("amount"))
+                .order_by()
+            )
+            for group in groups:
+                key = (
+                    group["day"],
+                    group[fields["doctor"]],
+                    group[fields["appointment_type"]],
+                    group[fields["currency"]],
+                )
+                totals[key][count_column] = group["count"]
+                totals[key][amount_column] = group["amount"]
+
+        DailyRevenueRollup.objects.bulk_create(
+            (
+                DailyRevenueRollup(
+                    day=day,
+                    doctor_id=doctor_id,
+                    appointment_type=appointment_type,
+                    currency=currency,
+                    **values,
+                )
+                for (
+                    day,
+                    doctor_id,
+                    appointment_type,
+                    currency,
+                ), values in totals.items()
+            ),
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+REPORT_GROUPS = {
+    "day": ["day"],
+    "doctor": [
+        "doctor__uuid",
+        "doctor__user__first_name",
+        "doctor__user__last_name",
+    ],
+    "appointment_type": ["appointment_type"],
+}
+
+
+def revenue_report(since, until, group_by, doctor=None, appointment_type=None):
+    """
+    Payments, refunds and net revenue from `since` to `until`, inclusive,
+    read from the rollups only. Rows are grouped by the `group_by` keys
+    (see REPORT_GROUPS) and always by currency; totals are per currency.
+    """
+    rollups = DailyRevenueRollup.objects.filter(day__gte=since, day__lte=until)
+    if doctor is not None:
+        rollups = rollups.filter(doctor=doctor)
+    if appointment_type is not None:
+        rollups = rollups.filter(appointment_type=appointment_type)
+
+    sums = {
+        "payments_total": Sum("payments"),
+        "gross_total": Sum("gross_amount"),
+        "refunds_total": Sum("refunds"),
+        "refunded_total": Sum("refunded_amount"),
+    }
+    columns = [column for key in group_by for column in REPORT_GROUPS[key]]
+
+    def present(values):
+        cents = Decimal("0.01")
+        gross = (values["gross_total"] or Decimal("0")).quantize(cents)
+        refunded = (values["refunded_total"] or Decimal("0")).quantize(cents)
+        row = {
+            "currency": values["currency"],
+            "payments": values["payments_total"] or 0,
+            "gross_amount": str(gross),
+            "refunds": values["refunds_total"] or 0,
+            "refunded_amount": str(refunded),
+            "net_amount": str(gross - refunded),
+        }
+        if "day" in values:
+            row["day"] = values["day"]
+        if "doctor__uuid" in values:
+            row["doctor_uuid"] = values["doctor__uuid"]
+            row["doctor_name"] = (
+                f"{values['doctor__user__first_name']} "
+                f"{values['doctor__user__last_name']}"
+            ).strip()
+        if "appointment_type" in values:
+            row["appointment_type"] = Services(values["appointment_type"]).label
+        return row
+
+    rows = (
+        rollups.values(*columns, "currency")
+        .annotate(**sums)
+        .order_by(*columns, "currency")
+    )
+    totals = rollups.values("currency").annotate(**sums).order_by("currency")
+    return {
+        "since": since,
+        "until": until,
+        "rows": [present(values) for values in rows],
+        "totals": [present(values) for values in totals],
+    }
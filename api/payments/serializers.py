@@ -4,6 +4,7 @@ import logging
 from rest_framework import serializers
 from decimal import Decimal
 from datetime import timedelta
+from django.conf import settings
 from django.utils import timezone
 from django.core.validators import EmailValidator
 from api.appointments.models import Appointment
@@ -17,6 +18,8 @@ from api.payments.models import (
 logger = logging.getLogger(__name__)
 
 from api.patients.utils.fields import LabelChoiceField
+from api.payments.refund_policies import get_refund_policy_table
+from api.payments.rollups import REPORT_GROUPS
 from api.payments.validators import (
     validate_currency,
     validate_pending_payments,
@@ -25,7 +28,8 @@ from api.payments.validators import (
 from api.payments.choices import (
     RefundPolicyChoices,
 )
-from api.doctors.models import TimeSlot
+from api.doctors.choices import Services
+from api.doctors.models import Doctor, TimeSlot
 from api.doctors.validators import (
     validate_start_time_lt_end_time,
     future_start_time,
@@ -133,25 +137,8 @@ class AppointmentRefundSerializer(serializers.ModelSerializer):
         ]
 
     def _get_applicable_refund_policy(self, appointment_time):
-        now = timezone.now()
-        time_until_appointment = appointment_time - now
-        hours_until = time_until_appointment.total_seconds() / 3600
-
-        if hours_until < 4:
-            # 0% refund
-            return RefundPolicy.objects.filter(
-                is_active=True, hours_before_min=0, hours_before_max=4
-            ).first()
-        elif hours_until < 24:
-            # 50% refund
-            return RefundPolicy.objects.filter(
-                is_active=True, hours_before_min=4, hours_before_max=24
-            ).first()
-        else:
-            # 100% refund
-            return RefundPolicy.objects.filter(
-                is_active=True, hours_before_min=24, hours_before_max=99999
-            ).first()
+        hours_until = (appointment_time - timezone.now()).total_seconds() / 3600
+        return get_refund_policy_table().policy_for(hours_until)
 
     def validate(self, attrs):
         """Validate refund eligibility and find applicable policy"""
@@ -192,6 +179,7 @@ class AppointmentRefundSerializer(serializers.ModelSerializer):
             reason=validated_data.get(
                 "reason", f"Refund based on {applicable_policy.name}"
             ),
+            appointment_status=validated_data.get("appointment_status"),
         )
 
         return refund
@@ -217,3 +205,36 @@ class RefundPolicySerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["id", "uuid", "created_at", "updated_at"]
+
+
+class RevenueReportSerializer(serializers.Serializer):
+    """
+    Query parameters of the revenue report: an inclusive range of days,
+    optional doctor and appointment type filters, and what to group by.
+    """
+
+    since = serializers.DateField()
+    until = serializers.DateField()
+    doctor_uuid = serializers.UUIDField(required=False)
+    appointment_type = LabelChoiceField(choices=Services.choices, required=False)
+    # Repeat group_by to group by several keys; without it, by all of them.
+    group_by = serializers.MultipleChoiceField(
+        choices=list(REPORT_GROUPS), required=False
+    )
+
+    def validate(self, data):
+        if data["until"] < data["since"]:
+            raise serializers.ValidationError("until must not be before since.")
+        if (data["until"] - data["since"]).days >= settings.REVENUE_REPORT_MAX_DAYS:
+            raise serializers.ValidationError(
+                f"The range can be at most {settings.REVENUE_REPORT_MAX_DAYS} days."
+            )
+
+        data["doctor"] = None
+        if "doctor_uuid" in data:
+            data["doctor"] = Doctor.objects.filter(uuid=data["doctor_uuid"]).first()
+            if data["doctor"] is None:
+                raise serializers.ValidationError({"doctor_uuid": "Doctor not found."})
+        group_by = data.get("group_by") or set(REPORT_GROUPS)
+        data["group_by"] = [key for key in REPORT_GROUPS if key in group_by]
+        return data
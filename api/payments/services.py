@@ -0,0 +1,221 @@
+import logging
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from api.appointments.models import Appointment
+from api.payments.choices import PaymentStatusChoices, RefundPaymentChoices
+from api.payments.gateway import get_stripe_gateway
+from api.payments.models import AppointmentPayment, AppointmentPaymentRefund
+from api.payments.rollups import set_refund_status
+
+logger = logging.getLogger(__name__)
+
+# Stripe calls are made outside any database transaction. The local record
+# is committed first, the call is made with an idempotency key derived from
+# the record, and the result is saved in a second, short transaction. If the
+# process dies or the outcome of the call is unknown, reconcile_stripe_calls
+# repeats the call with the same key, which Stripe answers with the original
+# result instead of acting twice.
+
+
+def is_rejected(error):
+    """
+    Whether Stripe answered and declined the request, so nothing was
+    created. Without a response, or on a server error or an idempotency
+    conflict, the request may still have gone through.
+    """
+    status = error.http_status
+    return status is not None and status < 500 and status != 409
+
+
+def create_payment_intent(payment):
+    """
+    Create the Stripe PaymentIntent for a committed payment and store its id
+    and client secret. If Stripe rejects it the payment is cancelled; either
+    way the StripeError is re-raised.
+    """
+    try:
+        payment_intent = get_stripe_gateway().request(
+            "payment_intents.create",
+            params={
+                "amount": int(payment.amount * 100),
+                "currency": payment.currency,
+                "metadata": {
+                    "appointment_uuid": str(payment.appointment.uuid),
+                },
+                "automatic_payment_methods": {
+                    "enabled": True,
+                },
+            },
+            idempotency_key=payment.idempotency_key,
+        )
+    except stripe.error.StripeError as e:
+        if is_rejected(e):
+            AppointmentPayment.objects.filter(
+                id=payment.id, stripe_payment_intent_id=None
+            ).update(status=PaymentStatusChoices.CANCELED)
+        raise
+
+    payment.stripe_payment_intent_id = payment_intent.id
+    payment.stripe_client_secret = payment_intent.client_secret
+    AppointmentPayment.objects.filter(id=payment.id).update(
+        stripe_payment_intent_id=payment.stripe_payment_intent_id,
+        stripe_client_secret=payment.stripe_client_secret,
+    )
+    return payment
+
+
+def submit_refund(refund):
+    """
+    Create the Stripe Refund for a committed refund record and apply it. If
+    Stripe rejects it the refund is cancelled; either way the StripeError is
+    re-raised. Returns the Stripe refund id.
+    """
+    payment = refund.appointment_payment
+    try:
+        stripe_refund = get_stripe_gateway().request(
+            "refunds.create",
+            params={
+                "payment_intent": payment.stripe_payment_intent_id,
+                "amount": int(refund.amount * 100),
+                "reason": "requested_by_customer",
+                "metadata": {
+                    "refund_id": str(refund.uuid),
+                    "appointment_id": str(payment.appointment.uuid),
+                },
+            },
+            idempotency_key=refund.idempotency_key,
+        )
+    except stripe.error.StripeError as e:
+        if is_rejected(e):
+            set_refund_status(
+                AppointmentPaymentRefund.objects.filter(
+                    id=refund.id, stripe_refund_id=None
+                ),
+                RefundPaymentChoices.CANCELLED,
+            )
+        raise
+
+    finalize_refund(refund, stripe_refund.id)
+    return stripe_refund.id
+
+
+def finalize_refund(refund, stripe_refund_id):
+    """
+    Record the Stripe refund id and move the appointment to the status the
+    refund was requested with. Safe to call more than once.
+    """
+    with transaction.atomic():
+        refund = AppointmentPaymentRefund.objects.select_for_update().get(
+            id=refund.id
+        )
+        if refund.stripe_refund_id:
+            return refund
+
+        refund.stripe_refund_id = stripe_refund_id
+        refund.save(update_fields=["stripe_refund_id"])
+
+        # A webhook may already have settled the refund; don't undo that.
+        if (
+            refund.appointment_status is not None
+            and refund.status == RefundPaymentChoices.REQUIRES_ACTION
+        ):
+            Appointment.objects.filter(payments__refunds=refund).update(
+                status=refund.appointment_status
+            )
+    return refund
+
+
+def find_stripe_refund(refund):
+    """
+    Look up a refund on Stripe by the refund_id in its metadata.
+    """
+    refunds = get_stripe_gateway().request(
+        "refunds.list",
+        params={
+            "payment_intent": refund.appointment_payment.stripe_payment_intent_id,
+            "limit": 100,
+        },
+    )
+    for stripe_refund in refunds.auto_paging_iter():
+        if stripe_refund.metadata.get("refund_id") == str(refund.uuid):
+            return stripe_refund
+    return None
+
+
+def reconcile_payment(payment):
+    """
+    Finish a payment whose PaymentIntent was never stored.
+    Returns "completed", "canceled" or "pending".
+    """
+    age = timezone.now() - payment.created_at
+    if age > timedelta(seconds=settings.STRIPE_IDEMPOTENCY_KEY_TTL_SECONDS):
+        # Retrying could now create a second intent. The patient never got
+        # a client secret, so an intent that does exist was never paid.
+        AppointmentPayment.objects.filter(
+            id=payment.id, stripe_payment_intent_id=None
+        ).update(status=PaymentStatusChoices.CANCELED)
+        return "canceled"
+
+    try:
+        create_payment_intent(payment)
+    except stripe.error.StripeError as e:
+        logger.warning(f"Could not reconcile payment {payment.uuid}: {e}")
+        return "canceled" if is_rejected(e) else "pending"
+    return "completed"
+
+
+def reconcile_refund(refund):
+    """
+    Finish a refund whose Stripe call never completed.
+    Returns "completed", "canceled" or "pending".
+    """
+    age = timezone.now() - refund.created_at
+    try:
+        if age <= timedelta(seconds=settings.STRIPE_IDEMPOTENCY_KEY_TTL_SECONDS):
+            submit_refund(refund)
+            return "completed"
+
+        # The key has expired, so a retry could refund twice. Look for the
+        # refund on Stripe instead.
+        stripe_refund = find_stripe_refund(refund)
+    except stripe.error.StripeError as e:
+        logger.warning(f"Could not reconcile refund {refund.uuid}: {e}")
+        return "canceled" if is_rejected(e) else "pending"
+
+    if stripe_refund is None:
+        set_refund_status(
+            AppointmentPaymentRefund.objects.filter(
+                id=refund.id, stripe_refund_id=None
+            ),
+            RefundPaymentChoices.CANCELLED,
+        )
+        return "canceled"
+    finalize_refund(refund, stripe_refund.id)
+    return "completed"
+
+
+def stale_payments():
+    cutoff = timezone.now() - timedelta(
+        seconds=settings.STRIPE_RECONCILE_AFTER_SECONDS
+    )
+    return AppointmentPayment.objects.filter(
+        stripe_payment_intent_id=None,
+        status=PaymentStatusChoices.REQUIRES_PAYMENT_METHOD,
+        created_at__lt=cutoff,
+    ).select_related("appointment")
+
+
+def stale_refunds():
+    cutoff = timezone.now() - timedelta(
+        seconds=settings.STRIPE_RECONCILE_AFTER_SECONDS
+    )
+    return AppointmentPaymentRefund.objects.filter(
+        stripe_refund_id=None,
+        status=RefundPaymentChoices.REQUIRES_ACTION,
+        created_at__lt=cutoff,
+    ).select_related("appointment_payment__appointment")
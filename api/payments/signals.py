@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.payments.models import RefundPolicy
+from api.payments.refund_policies import invalidate_refund_policy_table
+
+
+@receiver(post_save, sender=RefundPolicy)
+@receiver(post_delete, sender=RefundPolicy)
+def refund_policy_changed(sender, **kwargs):
+    # After commit, so no worker rebuilds from the old policies and keeps
+    # them under the new generation.
+    transaction.on_commit(invalidate_refund_policy_table)
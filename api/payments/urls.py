@@ -2,7 +2,10 @@ from django.urls import path
 from api.payments.views import (
     CreatePaymentIntentView,
     AppointmentRefundView,
+    RefundQuoteView,
+    RevenueReportView,
     StripeWebhookView,
+    StripeGatewayMetricsView,
 )
 
 urlpatterns = [
@@ -12,5 +15,14 @@ urlpatterns = [
         name="create-payment-intent",
     ),
     path("stripe/refund/", AppointmentRefundView.as_view(), name="stripe-refund"),
+    path(
+        "stripe/refund/quote/", RefundQuoteView.as_view(), name="stripe-refund-quote"
+    ),
     path("stripe/webhook/", StripeWebhookView.as_view(), name="stripe-webhook"),
+    path("revenue/", RevenueReportView.as_view(), name="revenue-report"),
+    path(
+        "stripe/metrics/",
+        StripeGatewayMetricsView.as_view(),
+        name="stripe-gateway-metrics",
+    ),
 ]
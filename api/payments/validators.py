@@ -2,7 +2,7 @@ from rest_framework import serializers
 from api.appointments.models import Appointment
 from api.appointments.choices import Status
 from api.payments.models import AppointmentPayment
-from api.payments.choices import PaymentStatusChoices
+from api.payments.choices import PaymentStatusChoices, RefundPaymentChoices
 
 
 def validate_currency(value):
@@ -63,7 +63,7 @@ def validate_appointment_payment(appointment_uuid):
         if not payment.appointment:
             raise serializers.ValidationError("Payment has no associated appointment")
 
-        if payment.refunds.filter(status=PaymentStatusChoices.SUCCEEDED).exists():
+        if payment.refunds.filter(status=RefundPaymentChoices.SUCCEEDED).exists():
             raise serializers.ValidationError("Payment already has a succeeded refund")
 
     except AppointmentPayment.DoesNotExist:
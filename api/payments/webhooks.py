@@ -0,0 +1,418 @@
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from api.appointments.choices import Status as AppointmentStatus
+from api.appointments.models import Appointment
+from api.doctors.models import TimeSlot
+from api.doctors.utilization import set_slots_booked
+from api.payments.choices import (
+    PaymentStatusChoices,
+    RefundPaymentChoices,
+    WebhookEventStatus,
+)
+from api.payments.models import (
+    AppointmentPayment,
+    AppointmentPaymentRefund,
+    StripeWebhookEvent,
+)
+from api.payments.rollups import set_payment_status, set_refund_status
+from api.services.send_email import EmailService
+
+logger = logging.getLogger(__name__)
+
+
+def get_ordering_key(event_type, obj):
+    """
+    The payment intent an event belongs to, which serializes its processing.
+    """
+    if event_type.startswith("payment_intent."):
+        return obj["id"]
+    return obj.get("payment_intent") or obj.get("charge") or obj["id"]
+
+
+def record_event(event):
+    """
+    Add a verified event to the inbox. Returns False if Stripe had already
+    delivered it.
+    """
+    obj = event["data"]["object"]
+    _, created = StripeWebhookEvent.objects.get_or_create(
+        stripe_event_id=event["id"],
+        defaults={
+            "event_type": event["type"],
+            "ordering_key": get_ordering_key(event["type"], obj),
+            "stripe_created": datetime.fromtimestamp(
+                event["created"], tz=dt_timezone.utc
+            ),
+            "payload": event,
+        },
+    )
+    return created
+
+
+def next_event_queryset():
+    """
+    Due pending events whose ordering_key has no earlier pending event,
+    oldest first. A worker holds the row lock of the event it is processing,
+    so SKIP LOCKED hands concurrent workers other payment intents, and the
+    later events of an intent wait until its earlier one is done.
+    """
+    earlier = StripeWebhookEvent.objects.filter(
+        ordering_key=OuterRef("ordering_key"),
+        status=WebhookEventStatus.PENDING,
+    ).filter(
+        Q(stripe_created__lt=OuterRef("stripe_created"))
+        | Q(stripe_created=OuterRef("stripe_created"), id__lt=OuterRef("id"))
+    )
+    return (
+        StripeWebhookEvent.objects.select_for_update(skip_locked=True)
+        .filter(status=WebhookEventStatus.PENDING, next_attempt_at__lte=timezone.now())
+        .exclude(Exists(earlier))
+        .order_by("stripe_created", "id")
+    )
+
+
+def latest_charge_id(payment_intent):
+    """
+    The id of a PaymentIntent's latest charge. Older API versions embed the
+    charges list instead of latest_charge.
+    """
+    charge = payment_intent.get("latest_charge")
+    if isinstance(charge, dict):
+        return charge["id"]
+    if charge:
+        return charge
+    charges = (payment_intent.get("charges") or {}).get("data") or []
+    return charges[0]["id"] if charges else None
+
+
+def retry_delay(attempts):
+    return min(
+        settings.STRIPE_WEBHOOK_RETRY_MAX_SECONDS,
+        settings.STRIPE_WEBHOOK_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+    )
+
+
+def process_next_event(processor):
+    """
+    Claim and process one event. Returns it, or None if none is ready.
+    """
+    with transaction.atomic():
+        event = next_event_queryset().first()
+        if event is None:
+            return None
+
+        try:
+            with transaction.atomic():
+                processor.process(event)
+        except Exception as e:
+            logger.exception(f"Error processing Stripe event {event.stripe_event_id}")
+            event.attempts += 1
+            event.last_error = str(e)[:2000]
+            event.next_attempt_at = timezone.now() + timedelta(
+                seconds=retry_delay(event.attempts)
+            )
+            if event.attempts >= settings.STRIPE_WEBHOOK_MAX_ATTEMPTS:
+                # Give up so later events of this payment intent can proceed.
+                event.status = WebhookEventStatus.FAILED
+            event.save(
+                update_fields=["attempts", "last_error", "next_attempt_at", "status"]
+            )
+        else:
+            event.attempts += 1
+            event.status = WebhookEventStatus.PROCESSED
+            event.processed_at = timezone.now()
+            event.save(update_fields=["attempts", "status", "processed_at"])
+    return event
+
+
+class StripeEventProcessor:
+    """
+    Applies Stripe events to payments, appointments and refunds.
+    """
+
+    HANDLERS = {
+        "payment_intent.requires_action": "_handle_payment_requires_action",
+        "payment_intent.succeeded": "_handle_payment_succeeded",
+        "payment_intent.payment_failed": "_handle_payment_failed",
+        "payment_intent.canceled": "_handle_payment_canceled",
+        "charge.succeeded": "_handle_charge_succeeded",
+        # Refund Events
+        "refund.created": "_handle_refund_created",
+        "refund.updated": "_handle_refund_updated",
+        "charge.refunded": "_handle_charge_refunded",
+        "refund.failed": "_handle_refund_failed",
+        # TODO: Dispute Events (related to refunds/chargebacks)
+        # "charge.dispute.created": "_handle_dispute_created",
+        # "charge.dispute.updated": "_handle_dispute_updated",
+        # "charge.dispute.closed": "_handle_dispute_closed",
+    }
+
+    def process(self, event):
+        handler = getattr(self, self.HANDLERS[event.event_type])
+        handler(event.payload["data"]["object"])
+
+    def _load_payment(self, lookup):
+        """
+        The payment matching `lookup` with its appointment, slot, doctor and
+        patient joined in, so handlers need no further queries to send
+        email. Returns None if there is no such payment.
+        """
+        try:
+            return AppointmentPayment.objects.select_related(
+                "appointment__time_slot__doctor__user",
+                "appointment__medical_record__patient__user",
+            ).get(lookup)
+        except AppointmentPayment.DoesNotExist:
+            return None
+
+    def _appointment_details(self, appointment):
+        return {
+            "doctor_name": appointment.time_slot.doctor.user.get_full_name(),
+            "date": appointment.time_slot.start_time.date(),
+            "time": appointment.time_slot.start_time,
+        }
+
+    def _set_payment_status(self, payment, status, **fields):
+        set_payment_status(
+            AppointmentPayment.objects.filter(pk=payment.pk), status, **fields
+        )
+        payment.status = status
+
+    def _set_appointment_status(self, appointment, status):
+        Appointment.objects.filter(pk=appointment.pk).update(status=status)
+        appointment.status = status
+
+    def _find_refund(self, payment, refund_obj):
+        """
+        The local refund for a Stripe refund: by its id, or by the refund_id
+        submit_refund put in its metadata, or else the payment's latest.
+        """
+        refunds = payment.refunds.order_by("-created_at")
+        metadata_id = (refund_obj.get("metadata") or {}).get("refund_id")
+        lookup = Q(stripe_refund_id=refund_obj["id"])
+        if metadata_id:
+            lookup |= Q(uuid=metadata_id)
+        return refunds.filter(lookup).first() or refunds.first()
+
+    def _record_charge(self, payment_intent_id, charge_id):
+        """Remember which payment a successful charge belongs to."""
+        if payment_intent_id and charge_id:
+            AppointmentPayment.objects.filter(
+                stripe_payment_intent_id=payment_intent_id
+            ).update(stripe_charge_id=charge_id)
+
+    def _handle_charge_succeeded(self, charge_obj):
+        """Handle a successful charge by recording its payment."""
+        self._record_charge(charge_obj.get("payment_intent"), charge_obj["id"])
+
+    def _handle_payment_requires_action(self, payment_intent):
+        """Handle payment that requires additional action."""
+        updated = set_payment_status(
+            AppointmentPayment.objects.filter(
+                stripe_payment_intent_id=payment_intent["id"]
+            ),
+            PaymentStatusChoices.REQUIRES_ACTION,
+        )
+
+        if updated:
+            logger.info(f"Payment requires action: {payment_intent['id']}")
+        else:
+            logger.error(
+                f"Payment not found for payment_intent: {payment_intent['id']}"
+            )
+
+    def _handle_payment_succeeded(self, payment_intent):
+        """Handle successful payment."""
+        payment = self._load_payment(Q(stripe_payment_intent_id=payment_intent["id"]))
+        if payment is None:
+            logger.error(
+                f"Payment not found for payment_intent: {payment_intent['id']}"
+            )
+            return
+
+        fields = {"payment_method_id": payment_intent.get("payment_method") or ""}
+        charge_id = latest_charge_id(payment_intent)
+        if charge_id:
+            fields["stripe_charge_id"] = charge_id
+        self._set_payment_status(payment, PaymentStatusChoices.SUCCEEDED, **fields)
+        payment.payment_method_id = fields["payment_method_id"]
+
+        appointment = payment.appointment
+        if not appointment:
+            logger.error(f"Payment {payment.uuid} has no associated appointment.")
+            return
+
+        self._set_appointment_status(appointment, AppointmentStatus.CONFIRMED)
+
+        EmailService.send_appointment_confirmation_email(
+            user=appointment.medical_record.patient.user,
+            appointment_details=self._appointment_details(appointment),
+            payment_id=payment.payment_method_id,
+            amount_paid=payment.amount,
+        )
+
+        logger.info(f"Payment succeeded: {payment_intent['id']}")
+
+    def _handle_payment_failed(self, payment_intent):
+        """Handle failed payment."""
+        payment = self._load_payment(Q(stripe_payment_intent_id=payment_intent["id"]))
+        if payment is None:
+            logger.error(
+                f"Payment not found for payment_intent: {payment_intent['id']}"
+            )
+            return
+
+        self._set_payment_status(payment, PaymentStatusChoices.FAILED)
+
+        appointment = payment.appointment
+        if not appointment:
+            logger.error(f"Payment {payment.uuid} has no associated appointment.")
+            return
+
+        # The appointment stays pending so the patient can pay again.
+        EmailService.send_payment_failed_email(
+            user=appointment.medical_record.patient.user,
+            appointment_details=self._appointment_details(appointment),
+            payment_id=payment.id,
+            amount=payment.amount,
+        )
+
+        logger.info(f"Payment failed: {payment_intent['id']}")
+
+    def _handle_payment_canceled(self, payment_intent):
+        """Handle canceled payment."""
+        payment = self._load_payment(Q(stripe_payment_intent_id=payment_intent["id"]))
+        if payment is None:
+            logger.error(
+                f"Payment not found for payment_intent: {payment_intent['id']}"
+            )
+            return
+
+        self._set_payment_status(payment, PaymentStatusChoices.CANCELED)
+
+        if not payment.appointment:
+            logger.error(f"Payment {payment.uuid} has no associated appointment.")
+            return
+
+        self._set_appointment_status(payment.appointment, AppointmentStatus.CANCELLED)
+
+        logger.info(f"Payment canceled: {payment_intent['id']}")
+
+    # REFUND HANDLING METHODS
+    def _handle_charge_refunded(self, charge_obj):
+        """Handle when a charge is refunded - main refund event."""
+        logger.info(f"Handling charge.refunded for charge: {charge_obj['id']}")
+
+        payment_intent_id = charge_obj.get("payment_intent")
+        if not payment_intent_id:
+            logger.error("No payment_intent found in charge object")
+            return
+        self._record_charge(payment_intent_id, charge_obj["id"])
+
+        payment = self._load_payment(Q(stripe_payment_intent_id=payment_intent_id))
+        if payment is None:
+            logger.error(f"Payment not found for payment_intent: {payment_intent_id}")
+            return
+
+        refunds = charge_obj.get("refunds", {}).get("data", [])
+        if not refunds:
+            logger.warning(f"No refunds found in charge object: {charge_obj['id']}")
+            return
+
+        # Stripe lists the newest refund first.
+        refund_data = refunds[0]
+        status_mapping = {
+            "pending": RefundPaymentChoices.REQUIRES_ACTION,
+            "succeeded": RefundPaymentChoices.SUCCEEDED,
+            "failed": RefundPaymentChoices.FAILED,
+            "canceled": RefundPaymentChoices.CANCELLED,
+        }
+        mapped_status = status_mapping.get(
+            refund_data["status"], RefundPaymentChoices.REQUIRES_ACTION
+        )
+
+        refund_record = self._find_refund(payment, refund_data)
+        if not refund_record:
+            logger.error(f"No refund record found for payment {payment.id}")
+            return
+
+        set_refund_status(
+            AppointmentPaymentRefund.objects.filter(pk=refund_record.pk), mapped_status
+        )
+        logger.info(
+            f"Updated refund record {refund_record.id} to status: {mapped_status}"
+        )
+
+        if mapped_status != RefundPaymentChoices.SUCCEEDED:
+            return
+
+        self._set_payment_status(payment, PaymentStatusChoices.REFUNDED)
+        appointment = payment.appointment
+        if not appointment:
+            logger.error(f"Payment {payment.uuid} has no associated appointment.")
+            return
+        self._set_appointment_status(appointment, AppointmentStatus.REFUNDED)
+        # Slots withdrawn by a bulk cancellation are not released.
+        set_slots_booked(TimeSlot.objects.filter(pk=appointment.time_slot_id), False)
+
+        logger.info(f"Payment {payment.id} marked as refunded due to charge refund")
+
+        EmailService.send_refund_success_email(
+            user=appointment.medical_record.patient.user,
+            appointment_details=self._appointment_details(appointment),
+            refund_amount=refund_record.amount,
+            original_amount=payment.amount,
+        )
+
+    def _handle_refund_created(self, refund_obj):
+        """Handle refund creation."""
+        logger.info(f"Handling refund.created for refund: {refund_obj['id']}")
+
+    def _handle_refund_updated(self, refund_obj):
+        """Handle refund status updates."""
+        logger.info(f"Handling refund.updated for refund: {refund_obj['id']}")
+
+    def _handle_refund_failed(self, refund_obj):
+        """Handle failed refund."""
+        logger.info(f"Handling refund.failed for refund: {refund_obj['id']}")
+
+        charge_id = refund_obj.get("charge")
+        if not charge_id:
+            logger.error("No charge found in refund object")
+            return
+
+        lookup = Q(stripe_charge_id=charge_id)
+        # Payments from before charge ids were recorded are found by the
+        # refund's payment intent instead.
+        if refund_obj.get("payment_intent"):
+            lookup |= Q(stripe_payment_intent_id=refund_obj["payment_intent"])
+        payment = self._load_payment(lookup)
+        if payment is None:
+            logger.error(f"Payment not found for refund {refund_obj['id']}")
+            return
+
+        refund_record = self._find_refund(payment, refund_obj)
+        if not refund_record:
+            logger.error(f"No refund record found for payment {payment.id}")
+            return
+
+        set_refund_status(
+            AppointmentPaymentRefund.objects.filter(pk=refund_record.pk),
+            RefundPaymentChoices.FAILED,
+        )
+
+        if payment.appointment:
+            EmailService.send_refund_failed_email(
+                user=payment.appointment.medical_record.patient.user,
+                appointment_details=self._appointment_details(payment.appointment),
+                refund_amount=refund_record.amount,
+                failure_reason=refund_obj.get(
+                    "failure_reason", "Unknown error in while refunding payment"
+                ),
+            )
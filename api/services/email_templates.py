@@ -0,0 +1,158 @@
+import html
+import re
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.template import Context, Engine, engines
+from django.template.loader_tags import ExtendsNode
+
+CONTENT_BLOCK = "content"
+CONTENT_MARKER = "\x00email-content\x00"
+MISSING_MARKER = "\x00missing-variable\x00"
+
+CONTENT_BLOCK_RE = re.compile(
+    r"({%\s*block\s+" + CONTENT_BLOCK + r"\s*%})"
+    r"(.*?)"
+    r"({%\s*endblock(?:\s+\w+)?\s*%})",
+    re.S,
+)
+HIDDEN_ELEMENTS_RE = re.compile(
+    r"<(head|style|title|script)\b.*?</\1\s*>", re.S | re.I
+)
+LIST_ITEM_RE = re.compile(r"<li\b[^>]*>", re.I)
+LINE_BREAK_RE = re.compile(r"<\s*(?:br|tr)\b[^>]*>", re.I)
+PARAGRAPH_BREAK_RE = re.compile(
+    r"<\s*/?(?:p|div|h[1-6]|ul|ol|table)\b[^>]*>", re.I
+)
+TAG_RE = re.compile(r"<[^>]+>")
+
+
+def html_to_text(markup):
+    """
+    Plain text for an HTML fragment: invisible elements dropped, block
+    elements set apart by blank lines, list items bulleted. Django template tags
+    and variables pass through untouched, so this also works on template
+    source.
+    """
+    markup = HIDDEN_ELEMENTS_RE.sub("", markup)
+    # Source line breaks are just whitespace in HTML; only tags break lines.
+    markup = " ".join(markup.split())
+    markup = LIST_ITEM_RE.sub("\n- ", markup)
+    markup = LINE_BREAK_RE.sub("\n", markup)
+    markup = PARAGRAPH_BREAK_RE.sub("\n\n", markup)
+    text = html.unescape(TAG_RE.sub("", markup))
+
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    return "\n".join(lines).strip()
+
+
+class CompiledEmailTemplate:
+    """
+    An email template prepared once per process.
+
+    The shared layout (everything outside the content block) holds no
+    variables, so it is rendered once, to HTML and to text, and split
+    around the content. The content block is compiled on its own, and a
+    plain text twin of it is derived from its source. A send then only
+    renders the two content fragments.
+    """
+
+    def __init__(self, template_name):
+        path = f"emails/{template_name}.html"
+        template = engines["django"].engine.get_template(path)
+
+        extends = template.nodelist.get_nodes_by_type(ExtendsNode)
+        if not extends or CONTENT_BLOCK not in extends[0].blocks:
+            raise ImproperlyConfigured(
+                f"{path} must extend a layout and define a '{CONTENT_BLOCK}' block"
+            )
+        self.template = template
+        self.content = extends[0].blocks[CONTENT_BLOCK].nodelist
+
+        match = CONTENT_BLOCK_RE.search(template.source)
+        self.text_content = template.engine.from_string(html_to_text(match.group(2)))
+
+        layout_html = self._render_layout(template)
+        self.html_head, self.html_tail = layout_html.split(CONTENT_MARKER)
+        layout_text = html_to_text(layout_html)
+        self.text_head, self.text_tail = (
+            part.strip() for part in layout_text.split(CONTENT_MARKER)
+        )
+
+    @staticmethod
+    def _render_layout(template):
+        # Render the page with the content block swapped for a marker. Any
+        # variable outside the content block renders as MISSING_MARKER,
+        # which would make the layout unsafe to reuse.
+        source = CONTENT_BLOCK_RE.sub(
+            lambda m: f"{m.group(1)}{CONTENT_MARKER}{m.group(3)}", template.source
+        )
+        engine = template.engine
+        probe = Engine(
+            dirs=engine.dirs,
+            app_dirs=engine.app_dirs,
+            libraries=engine.libraries,
+            builtins=engine.builtins,
+            string_if_invalid=MISSING_MARKER,
+        )
+        layout = probe.from_string(source).render(Context())
+        if MISSING_MARKER in layout:
+            raise ImproperlyConfigured(
+                f"{template.origin.template_name} uses variables outside its "
+                f"'{CONTENT_BLOCK}' block"
+            )
+        return layout
+
+    def render(self, context=None):
+        """
+        Return (html, text) for the given context.
+        """
+        context = context or {}
+
+        html_context = Context(context)
+        with html_context.bind_template(self.template):
+            content_html = self.content.render(html_context)
+
+        content_text = self.text_content.render(Context(context, autoescape=False))
+
+        return (
+            f"{self.html_head}{content_html}{self.html_tail}",
+            "\n\n".join(
+                part
+                for part in (self.text_head, content_text.strip(), self.text_tail)
+                if part
+            ),
+        )
+
+
+_compiled = {}
+_lock = threading.Lock()
+
+
+def get_email_template(template_name):
+    """
+    Return the CompiledEmailTemplate for `template_name`, building it on
+    first use. With DEBUG on it is rebuilt every time, so template edits
+    show up without a restart.
+    """
+    if settings.DEBUG:
+        return CompiledEmailTemplate(template_name)
+
+    compiled = _compiled.get(template_name)
+    if compiled is None:
+        with _lock:
+            compiled = _compiled.get(template_name)
+            if compiled is None:
+                compiled = _compiled[template_name] = CompiledEmailTemplate(
+                    template_name
+                )
+    return compiled
+
+
+def render_email(template_name, context=None):
+    return get_email_template(template_name).render(context)
@@ -1,11 +1,13 @@
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.core.mail import send_mail
 from django.conf import settings
-from django.utils.html import strip_tags
 import logging
 from typing import Dict, Any
 
+from api.notifications.choices import EmailPriority
+from api.notifications.utils.outbox import enqueue_email, enqueue_emails
+from api.services.email_templates import render_email
+
 logger = logging.getLogger(__name__)
 
 
@@ -21,9 +23,15 @@ class EmailService:
         from_email=None,
         fail_silently=False,
         attachments=None,
+        priority=EmailPriority.NORMAL,
+        sensitive=False,
     ):
         """
-        Send templated email with HTML and plain text versions
+        Send templated email with HTML and plain text versions.
+
+        With EMAIL_OUTBOX_ENABLED the rendered email is added to the outbox
+        in the current transaction and sent by the send_queued_emails
+        worker; otherwise it is sent before returning.
 
         Args:
             template_name: Name of the template (without .html extension)
@@ -32,19 +40,33 @@ class EmailService:
             context: Template context variables
             from_email: Sender email (defaults to DEFAULT_FROM_EMAIL)
             fail_silently: Whether to suppress exceptions
-            attachments: List of file attachments
+            attachments: List of (filename, content, mimetype) attachments
+            priority: EmailPriority; the outbox sends HIGH first
+            sensitive: Whether the email holds a secret the outbox must not
+                keep once it is sent
 
         Returns:
-            bool: True if email sent successfully, False otherwise
+            bool: True if email was queued or sent, False otherwise
         """
         try:
             context = context or {}
             from_email = from_email or settings.DEFAULT_FROM_EMAIL
 
-            html_template = f"emails/{template_name}.html"
-            html_content = render_to_string(html_template, context)
+            html_content, text_content = render_email(template_name, context)
 
-            text_content = strip_tags(html_content)
+            if settings.EMAIL_OUTBOX_ENABLED:
+                enqueue_email(
+                    subject=subject,
+                    recipients=recipient_list,
+                    text_body=text_content,
+                    html_body=html_content,
+                    from_email=from_email,
+                    priority=priority,
+                    attachments=attachments,
+                    sensitive=sensitive,
+                )
+                logger.info(f"Queued templated email to {', '.join(recipient_list)}")
+                return True
 
             email = EmailMultiAlternatives(
                 subject=subject,
@@ -72,6 +94,55 @@ class EmailService:
                 raise
             return False
 
+    @staticmethod
+    def send_templated_emails(
+        template_name, subject, messages, priority=EmailPriority.NORMAL
+    ):
+        """
+        Send one templated email per (recipient_list, context) in `messages`
+        as a batch: a single outbox INSERT with EMAIL_OUTBOX_ENABLED,
+        otherwise a single SMTP connection.
+
+        Returns:
+            int: Number of emails queued or sent
+        """
+        from_email = settings.DEFAULT_FROM_EMAIL
+        rendered = [
+            (recipient_list, *render_email(template_name, context))
+            for recipient_list, context in messages
+        ]
+        if not rendered:
+            return 0
+
+        if settings.EMAIL_OUTBOX_ENABLED:
+            enqueue_emails(
+                {
+                    "subject": subject,
+                    "recipients": recipient_list,
+                    "text_body": text_content,
+                    "html_body": html_content,
+                    "priority": priority,
+                }
+                for recipient_list, html_content, text_content in rendered
+            )
+            logger.info(f"Queued {len(rendered)} {template_name} emails")
+            return len(rendered)
+
+        emails = []
+        for recipient_list, html_content, text_content in rendered:
+            email = EmailMultiAlternatives(
+                subject=subject,
+                body=text_content,
+                from_email=from_email,
+                to=recipient_list,
+            )
+            email.attach_alternative(html_content, "text/html")
+            emails.append(email)
+
+        sent = get_connection().send_messages(emails)
+        logger.info(f"Sent {sent} {template_name} emails")
+        return sent
+
     @staticmethod
     def send_otp_email(user, otp: str) -> bool:
         context = {
@@ -85,6 +156,8 @@ class EmailService:
             subject="One-Time Passcode - TeleHealth",
             recipient_list=[user.email],
             context=context,
+            priority=EmailPriority.HIGH,
+            sensitive=True,
         )
 
     @staticmethod
@@ -96,6 +169,7 @@ class EmailService:
             subject="Welcome to TeleHealth",
             recipient_list=[user.email],
             context=context,
+            priority=EmailPriority.LOW,
         )
 
     @staticmethod
@@ -181,3 +255,32 @@ class EmailService:
             recipient_list=[user.email],
             context=context,
         )
+
+    @staticmethod
+    def send_appointment_cancelled_emails(cancellations, reason=""):
+        """
+        Tell each patient their appointment was cancelled by the doctor.
+        `cancellations` are (user, appointment_details, refund_amount).
+        """
+        messages = [
+            (
+                [user.email],
+                {
+                    "user": user,
+                    "appointment": appointment_details,
+                    "doctor_name": appointment_details.get("doctor_name", "Doctor"),
+                    "appointment_date": appointment_details.get("date", "Date"),
+                    "appointment_time": appointment_details.get("time", "Time"),
+                    "refund_amount": refund_amount,
+                    "reason": reason,
+                },
+            )
+            for user, appointment_details, refund_amount in cancellations
+        ]
+
+        return EmailService.send_templated_emails(
+            template_name="appointment_cancelled",
+            subject="Appointment Cancelled - TeleHealth",
+            messages=messages,
+            priority=EmailPriority.HIGH,
+        )
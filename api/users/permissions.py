@@ -0,0 +1,13 @@
+from rest_framework.permissions import BasePermission
+
+from api.users.choices import Role
+
+
+class IsAdmin(BasePermission):
+    """
+    Custom permission to allow only authenticated admins to access data.
+    """
+
+    def has_permission(self, request, view):
+        user = request.user
+        return user.is_authenticated and getattr(user, "role", None) == Role.ADMIN
@@ -10,6 +10,7 @@ from api.users.serializers import CheckSerializer
 from api.users.models import User
 
 from api.utils.exception_handler import HandleExceptionAPIView
+from api.utils.throttling import TokenBucketThrottle
 
 import logging
 
@@ -23,6 +24,8 @@ logger = logging.getLogger(__name__)
 @method_decorator(csrf_exempt, name="dispatch")
 class CheckUserView(HandleExceptionAPIView, APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "check_user"
 
     def post(self, request):
 
@@ -0,0 +1,15 @@
+def id_ranges(queryset, batch_size):
+    """
+    Yield (after, upto) primary key bounds that together cover every row of
+    `queryset` present when the walk starts, `batch_size` ids per range.
+    Filtering on `id__gt=after, id__lte=upto` keeps each query a short
+    primary key range scan, whatever else it filters on.
+    """
+    ids = queryset.order_by("pk").values_list("pk", flat=True)
+    first, last = ids.first(), ids.last()
+    if first is None:
+        return
+    after = first - 1
+    while after < last:
+        yield after, after + batch_size
+        after += batch_size
@@ -1,3 +1,4 @@
+import math
 import traceback
 import logging
 from rest_framework.views import APIView
@@ -15,6 +16,13 @@ from rest_framework.exceptions import (
     UnsupportedMediaType,
     AuthenticationFailed,
 )
+from api.utils.exceptions import (
+    IdempotencyKeyInUse,
+    IdempotencyKeyReused,
+    PreconditionFailed,
+    PreconditionRequired,
+    ServiceBusy,
+)
 from django.core.exceptions import (
     ValidationError as DjangoValidationError,
     PermissionDenied as DjangoPermissionDenied,
@@ -73,7 +81,37 @@ class _HandleExceptionMixin:
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        elif isinstance(exc, (ParseError, Throttled, UnsupportedMediaType)):
+        elif isinstance(exc, Throttled):
+            logger.warning(f"Throttled: {exc}")
+            response = Response(
+                {"errors": {"non_field_errors": [str(exc)]}},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+            if exc.wait is not None:
+                response["Retry-After"] = str(math.ceil(exc.wait))
+            return response
+
+        elif isinstance(exc, ServiceBusy):
+            logger.warning(f"Service busy: {exc}")
+            response = Response(
+                {"errors": {"non_field_errors": [str(exc)]}},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+            if exc.wait is not None:
+                response["Retry-After"] = str(math.ceil(exc.wait))
+            return response
+
+        elif isinstance(
+            exc,
+            (
+                ParseError,
+                UnsupportedMediaType,
+                PreconditionFailed,
+                PreconditionRequired,
+                IdempotencyKeyInUse,
+                IdempotencyKeyReused,
+            ),
+        ):
             logger.warning(f"Client error: {exc}")
             return Response(
                 {"errors": {"non_field_errors": [str(exc)]}},
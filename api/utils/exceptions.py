@@ -0,0 +1,61 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PreconditionFailed(APIException):
+    """
+    Raised when the If-Match version sent by the client no longer matches
+    the stored resource (someone else wrote it first).
+    """
+
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The resource has been modified. Fetch it again and retry."
+    default_code = "precondition_failed"
+
+
+class PreconditionRequired(APIException):
+    """
+    Raised when a conditional write is attempted without an If-Match header.
+    """
+
+    status_code = status.HTTP_428_PRECONDITION_REQUIRED
+    default_detail = "This request requires an If-Match header."
+    default_code = "precondition_required"
+
+
+class ServiceBusy(APIException):
+    """
+    Raised when a bounded resource is saturated. `wait` is the suggested
+    number of seconds before retrying, sent as Retry-After.
+    """
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The server is busy. Please try again shortly."
+    default_code = "service_busy"
+
+    def __init__(self, detail=None, code=None, wait=None):
+        super().__init__(detail, code)
+        self.wait = wait
+
+
+class IdempotencyKeyInUse(APIException):
+    """
+    Raised when a request with the same Idempotency-Key is still being
+    processed after the wait allowed for it.
+    """
+
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = (
+        "A request with this Idempotency-Key is still in progress. Retry shortly."
+    )
+    default_code = "idempotency_key_in_use"
+
+
+class IdempotencyKeyReused(APIException):
+    """
+    Raised when an Idempotency-Key is sent again with a different request.
+    """
+
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was already used for a different request."
+    default_code = "idempotency_key_reused"
@@ -0,0 +1,87 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+# Counters are kept in the shared cache so every worker adds to the same
+# totals. They survive until the cache is flushed; they are for dashboards,
+# not billing.
+COUNTER_TIMEOUT = None
+
+
+def get_metrics_cache():
+    return caches[getattr(settings, "METRICS_CACHE_ALIAS", "default")]
+
+
+def increment(name, amount=1):
+    """
+    Atomically add `amount` to the counter `name`.
+    Never raises: losing a sample is better than failing the request.
+    """
+    cache = get_metrics_cache()
+    key = f"metrics:{name}"
+    try:
+        cache.add(key, 0, COUNTER_TIMEOUT)
+        cache.incr(key, amount)
+    except Exception:
+        logger.warning(f"Could not increment metric {name}", exc_info=True)
+
+
+def get_counts(names):
+    """
+    Return {name: value} for the given counters; missing ones are 0.
+    """
+    values = get_metrics_cache().get_many([f"metrics:{name}" for name in names])
+    return {name: values.get(f"metrics:{name}", 0) for name in names}
+
+
+# Upper bounds, in milliseconds, of the latency histogram buckets.
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _bucket_names(name):
+    return [f"{name}.le_{bound}ms" for bound in LATENCY_BUCKETS_MS] + [
+        f"{name}.le_inf"
+    ]
+
+
+def observe_latency(name, seconds):
+    """
+    Add one sample to the latency histogram `name`.
+    """
+    ms = seconds * 1000
+    bucket = next(
+        (f"{name}.le_{bound}ms" for bound in LATENCY_BUCKETS_MS if ms <= bound),
+        f"{name}.le_inf",
+    )
+    increment(f"{name}.count")
+    increment(f"{name}.total_ms", round(ms))
+    increment(bucket)
+
+
+def latency_summary(name):
+    """
+    Sample count, mean and approximate percentiles of the histogram `name`.
+    A percentile is reported as the upper bound of the bucket it falls in,
+    or None if that is the open-ended last bucket.
+    """
+    buckets = _bucket_names(name)
+    counts = get_counts([f"{name}.count", f"{name}.total_ms", *buckets])
+    count = counts[f"{name}.count"]
+    summary = {
+        "count": count,
+        "mean_ms": counts[f"{name}.total_ms"] / count if count else None,
+    }
+
+    bounds = [*LATENCY_BUCKETS_MS, None]
+    for percentile in (50, 95, 99):
+        summary[f"p{percentile}_ms"] = None
+        seen = 0
+        for bucket, bound in zip(buckets, bounds):
+            seen += counts[bucket]
+            if count and seen >= count * percentile / 100:
+                summary[f"p{percentile}_ms"] = bound
+                break
+    return summary
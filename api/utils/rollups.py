@@ -0,0 +1,46 @@
+from django.core.management.base import CommandError
+from django.db.models import F
+from django.utils.dateparse import parse_date
+
+
+def add_to_rollups(model, key_fields, deltas):
+    """
+    Add `deltas`, {key: {column: change}}, to the rows of the rollup `model`
+    whose `key_fields` equal each key tuple, inserting the rows that don't
+    exist yet. Call it in the transaction that made the change.
+    """
+    keys = sorted(key for key, delta in deltas.items() if any(delta.values()))
+    if not keys:
+        return
+    model.objects.bulk_create(
+        [model(**dict(zip(key_fields, key))) for key in keys],
+        ignore_conflicts=True,
+    )
+    # Sorted, so concurrent writers lock shared rows in the same order.
+    for key in keys:
+        model.objects.filter(**dict(zip(key_fields, key))).update(
+            **{column: F(column) + change for column, change in deltas[key].items()}
+        )
+
+
+def parse_date_option(value, option):
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise CommandError(f"{option} is not a valid date: {value}")
+    return parsed
+
+
+def rebuild_in_chunks(rebuild, since, until, step, chunk):
+    """
+    Call `rebuild(start, end)` on consecutive runs of `chunk` periods of
+    length `step` from `since` to `until`, inclusive, yielding each run's
+    (start, end, rows written).
+    """
+    start = since
+    while start <= until:
+        end = min(start + step * (chunk - 1), until)
+        yield start, end, rebuild(start, end)
+        start = end + step
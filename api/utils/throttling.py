@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.throttling import BaseThrottle
+
+from api.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Refill the bucket for the time since the last request, then try to take
+# one token. Runs inside Redis, so concurrent requests from every worker see
+# a consistent bucket. Returns {allowed, seconds until a token is available}.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+_local_lock = threading.Lock()
+_warned_unshared = False
+
+
+def parse_rate(rate):
+    """
+    "<burst>/<period>", e.g. "5/min": up to 5 requests at once, refilled
+    at 5 per minute. Returns (capacity, tokens per second).
+    """
+    count, period = rate.split("/")
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+def get_rate_limit_cache():
+    return caches[getattr(settings, "RATE_LIMIT_CACHE_ALIAS", "default")]
+
+
+def take_token(key, capacity, rate):
+    """
+    Take one token from the bucket at `key`.
+    Returns (allowed, seconds to wait before retrying).
+    """
+    cache = get_rate_limit_cache()
+
+    if isinstance(cache, RedisCache):
+        client = cache._cache.get_client(key, write=True)
+        allowed, wait = client.eval(
+            TOKEN_BUCKET_SCRIPT, 1, cache.make_and_validate_key(key), capacity, rate
+        )
+        return bool(allowed), float(wait)
+
+    # Other backends have no server-side scripting. The lock makes this
+    # exact for the per-process local memory cache; for other shared
+    # backends it is best effort across processes. Production settings
+    # refuse to start without Redis.
+    global _warned_unshared
+    if not _warned_unshared and not settings.DEBUG:
+        _warned_unshared = True
+        logger.warning(
+            f"Rate limits use {type(cache).__name__}, not Redis: buckets are "
+            f"not shared atomically between workers"
+        )
+    with _local_lock:
+        now = time.time()
+        tokens, ts = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+        allowed = tokens >= 1
+        wait = 0.0 if allowed else (1 - tokens) / rate
+        if allowed:
+            tokens -= 1
+        cache.set(key, (tokens, now), int(capacity / rate) + 1)
+    return allowed, wait
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket throttle configured per view by `throttle_scope`.
+
+    settings.RATE_LIMITS[scope] maps an identity to a rate, e.g.
+    {"ip": "20/min", "email": "5/min"}. Each identity gets its own bucket
+    for the scope, and a request must get a token from all of them.
+    """
+
+    def get_rules(self, view):
+        scope = getattr(view, "throttle_scope", None)
+        return scope, settings.RATE_LIMITS.get(scope, {})
+
+    def get_identity(self, request, identity):
+        if identity == "ip":
+            return self.get_ident(request)
+        if identity == "email":
+            email = request.data.get("email") if hasattr(request.data, "get") else None
+            return email.strip().lower() if isinstance(email, str) else None
+        raise ValueError(f"Unknown rate limit identity: {identity}")
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        scope, rules = self.get_rules(view)
+
+        for identity, rate in rules.items():
+            value = self.get_identity(request, identity)
+            if not value:
+                continue
+
+            metric = f"ratelimit.{scope}.{identity}"
+            metrics.increment(f"{metric}.hits")
+            allowed, wait = take_token(
+                f"ratelimit:{scope}:{identity}:{value}", *parse_rate(rate)
+            )
+            if not allowed:
+                metrics.increment(f"{metric}.rejected")
+                self.retry_after = wait
+                return False
+
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+def rate_limit_metric_names():
+    """
+    Names of every counter TokenBucketThrottle can produce.
+    """
+    return [
+        f"ratelimit.{scope}.{identity}.{counter}"
+        for scope, rules in settings.RATE_LIMITS.items()
+        for identity in rules
+        for counter in ("hits", "rejected")
+    ]
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from api.utils.views import RateLimitMetricsView
+
+urlpatterns = [
+    path("rate-limits/", RateLimitMetricsView.as_view(), name="rate-limit-metrics"),
+]
@@ -0,0 +1,21 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.users.permissions import IsAdmin
+from api.utils.exception_handler import HandleExceptionAPIView
+from api.utils.metrics import get_counts
+from api.utils.throttling import rate_limit_metric_names
+
+
+class RateLimitMetricsView(HandleExceptionAPIView, APIView):
+    """
+    Hit and rejection counters for each rate limit rule.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        counts = get_counts(rate_limit_metric_names())
+        return Response(counts, status=status.HTTP_200_OK)
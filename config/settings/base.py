@@ -59,6 +59,8 @@ PROJECT_APPS = [
     "api.doctors",
     "api.appointments",
     "api.payments",
+    "api.notifications",
+    "api.idempotency",
     # "api.audits"
 ]
 
@@ -162,6 +164,22 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# New passwords are hashed with the first hasher; PBKDF2 hashes from before
+# are still accepted and rehashed with Argon2id on the user's next login.
+PASSWORD_HASHERS = [
+    "api.authentication.hashers.TeleHealthArgon2PasswordHasher",
+    "api.authentication.hashers.TeleHealthPBKDF2PasswordHasher",
+]
+PASSWORD_ARGON2_TIME_COST = env.int("PASSWORD_ARGON2_TIME_COST", default=2)
+# KiB per hash
+PASSWORD_ARGON2_MEMORY_COST = env.int("PASSWORD_ARGON2_MEMORY_COST", default=19456)
+PASSWORD_ARGON2_PARALLELISM = env.int("PASSWORD_ARGON2_PARALLELISM", default=1)
+# Hashing threads per process; 0 hashes on the request thread
+PASSWORD_HASHING_WORKERS = env.int("PASSWORD_HASHING_WORKERS", default=1)
+# Hashes allowed to wait for a thread before new ones are refused with 503
+PASSWORD_HASHING_QUEUE_SIZE = env.int("PASSWORD_HASHING_QUEUE_SIZE", default=8)
+PASSWORD_HASHING_WAIT_SECONDS = 5
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 LANGUAGE_CODE = "en-us"
@@ -185,11 +203,13 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         # "dj_rest_auth.jwt_auth.JWTCookieAuthentication",
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.authentication.ClaimsJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
+    # Proxies in front of the app; the client IP is taken from X-Forwarded-For
+    "NUM_PROXIES": env.int("NUM_PROXIES", default=1),
 }
 
 SPECTACULAR_SETTINGS = {
@@ -200,6 +220,10 @@ SPECTACULAR_SETTINGS = {
 }
 
 # Authentication settings
+AUTHENTICATION_BACKENDS = [
+    "api.authentication.backends.EmailProfileBackend",
+]
+
 ACCOUNT_LOGIN_METHODS = {"email"}
 ACCOUNT_SIGNUP_FIELDS = {
     "email": {"required": True},
@@ -221,6 +245,7 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
     "AUTH_HEADER_NAME": "HTTP_AUTHORIZATION",
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
+    "TOKEN_USER_CLASS": "api.authentication.tokens.ClaimsUser",
 }
 
 # Rest Auth Settings
@@ -236,6 +261,8 @@ REST_AUTH = {
     "LOGIN_SERIALIZER": "api.authentication.serializers.TeleHealthLoginSerializer",
     "REGISTER_SERIALIZER": "api.authentication.serializers.TeleHealthRegisterSerializer",
     "JWT_AUTH_RETURN_EXPIRATION": False,  # this will not return expiration time in the response of login
+    "JWT_TOKEN_CLAIMS_SERIALIZER": "api.authentication.tokens.TeleHealthTokenObtainPairSerializer",
+    "SESSION_LOGIN": False,  # API clients use JWTs; TeleHealthLoginView records last_login
 }
 
 SITE_ID = 1
@@ -305,9 +332,66 @@ CORS_ALLOW_HEADERS = [
     "x-csrftoken",
     "x-requested-with",
     "cookie",
+    "if-match",
+    "if-none-match",
 ]
+CORS_EXPOSE_HEADERS = ["etag"]
+
+# Cache for short-lived shared state such as OTPs. Local memory is per
+# process, so deployments with more than one worker must point this at Redis:
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CACHE_LOCATION=redis://host:6379/0
+# Production always uses Redis from REDIS_URL; see production.py
+CACHES = {
+    "default": {
+        "BACKEND": env(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": env("CACHE_LOCATION", default="telehealth"),
+    }
+}
 
 OTP_EXPIRY_MINUTES = env.int("OTP_EXPIRY_MINUTES", default=2)
+OTP_MAX_ATTEMPTS = env.int("OTP_MAX_ATTEMPTS", default=5)
+# How long a verified password reset OTP allows the password to be changed
+OTP_VERIFIED_MINUTES = env.int("OTP_VERIFIED_MINUTES", default=10)
+OTP_CACHE_ALIAS = "default"
+
+# Token bucket limits for unauthenticated endpoints, keyed by throttle_scope.
+# "<burst>/<period>" allows a burst of that size, refilled over the period.
+RATE_LIMITS = {
+    "login": {"ip": "20/min", "email": "5/min"},
+    "send_otp": {"ip": "10/hour", "email": "3/hour"},
+    "password_reset": {"ip": "10/hour", "email": "3/hour"},
+    "check_user": {"ip": "30/min"},
+}
+RATE_LIMIT_CACHE_ALIAS = "default"
+METRICS_CACHE_ALIAS = "default"
+
+# Per-worker bloom filter of blacklisted refresh tokens, kept current with
+# Postgres LISTEN/NOTIFY. Sized for at least CAPACITY tokens at ERROR_RATE.
+JWT_BLACKLIST_FILTER_ENABLED = env.bool("JWT_BLACKLIST_FILTER_ENABLED", default=True)
+JWT_BLACKLIST_FILTER_CAPACITY = 100_000
+JWT_BLACKLIST_FILTER_ERROR_RATE = 0.01
+JWT_BLACKLIST_FILTER_REBUILD_SECONDS = 3600
+
+# Every Nth history row of a medical record section stores a full keyframe
+MEDICAL_RECORD_HISTORY_KEYFRAME_INTERVAL = env.int(
+    "MEDICAL_RECORD_HISTORY_KEYFRAME_INTERVAL", default=20
+)
+
+# How long each worker keeps its in-memory medical term prefix index
+VOCABULARY_CACHE_SECONDS = env.int("VOCABULARY_CACHE_SECONDS", default=300)
+# Longest each worker keeps its in-memory table of refund policies; a policy
+# change makes every worker rebuild it at once
+REFUND_POLICY_CACHE_SECONDS = env.int("REFUND_POLICY_CACHE_SECONDS", default=300)
+# Longest a refund quote is cached; it is also dropped at the next policy boundary
+REFUND_QUOTE_CACHE_SECONDS = env.int("REFUND_QUOTE_CACHE_SECONDS", default=3600)
+
+# De-identified research export: rows per server-side cursor fetch, and the
+# HMAC key for patient pseudonyms (falls back to SECRET_KEY)
+EXPORT_CHUNK_SIZE = env.int("EXPORT_CHUNK_SIZE", default=2000)
+EXPORT_PSEUDONYM_KEY = env("EXPORT_PSEUDONYM_KEY", default="")
 
 # Email settings
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
@@ -319,7 +403,63 @@ EMAIL_USE_TLS = env.bool("EMAIL_USE_TLS", default=False)
 EMAIL_USE_SSL = env.bool("EMAIL_USE_SSL", default=False)
 DEFAULT_FROM_EMAIL = env("DEFAULT_FROM_EMAIL")
 
+# Emails are written to the email_outbox table and sent by
+# `manage.py send_queued_emails`. Disable to send inside the request instead.
+EMAIL_OUTBOX_ENABLED = env.bool("EMAIL_OUTBOX_ENABLED", default=True)
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 8
+# Retry n waits BASE * 2^(n-1) seconds, up to MAX
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = 30
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = 3600
+# Emails claimed this long ago by a worker that never finished are requeued
+EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS = 600
+EMAIL_OUTBOX_CONNECTION_IDLE_SECONDS = 60
+# Sent and failed emails older than this are deleted by prune_email_outbox
+EMAIL_OUTBOX_RETENTION_DAYS = 30
+
+# Idempotency-Key handling (api.idempotency)
+IDEMPOTENCY_KEY_TTL_SECONDS = 24 * 60 * 60
+# How long a retry waits for the original request to finish before a 409
+IDEMPOTENCY_WAIT_SECONDS = 10
+# A key held this long by an unfinished request is taken over by a retry
+IDEMPOTENCY_LOCK_TIMEOUT_SECONDS = 60
+
 # Stripe settings
 STRIPE_PUBLISHABLE_KEY = env("STRIPE_PUBLISHABLE_KEY")
 STRIPE_SECRET_KEY = env("STRIPE_SECRET_KEY")
 STRIPE_WEBHOOK_SECRET = env("STRIPE_WEBHOOK_SECRET")
+# Point at `manage.py run_stripe_stub` to work offline
+STRIPE_API_BASE = env("STRIPE_API_BASE", default="https://api.stripe.com")
+# Keep-alive connections to Stripe shared by the threads of a process
+STRIPE_HTTP_POOL_SIZE = env.int("STRIPE_HTTP_POOL_SIZE", default=10)
+STRIPE_CONNECT_TIMEOUT_SECONDS = 3
+# Time allowed for a Stripe call, retries included
+STRIPE_DEADLINE_SECONDS = env.float("STRIPE_DEADLINE_SECONDS", default=10)
+STRIPE_MAX_RETRIES = 2
+# Retry n waits up to BASE * 2^(n-1) seconds
+STRIPE_RETRY_BASE_SECONDS = 0.5
+# Threads in `manage.py process_stripe_events`
+STRIPE_WEBHOOK_WORKERS = env.int("STRIPE_WEBHOOK_WORKERS", default=4)
+STRIPE_WEBHOOK_MAX_ATTEMPTS = 10
+# Retry n waits BASE * 2^(n-1) seconds, up to MAX
+STRIPE_WEBHOOK_RETRY_BASE_SECONDS = 10
+STRIPE_WEBHOOK_RETRY_MAX_SECONDS = 3600
+# Payments and refunds still waiting on their Stripe call after this long
+# are finished by `manage.py reconcile_stripe_calls`
+STRIPE_RECONCILE_AFTER_SECONDS = env.int("STRIPE_RECONCILE_AFTER_SECONDS", default=300)
+# Requests per second made by `manage.py reconcile_stripe_statuses`, which
+# shares Stripe's rate limit (100 reads/s live, 25 in test mode) with the app
+STRIPE_RECONCILE_REQUESTS_PER_SECOND = env.float(
+    "STRIPE_RECONCILE_REQUESTS_PER_SECOND", default=20
+)
+# Refunds submitted at once when a doctor's appointments are cancelled together
+BULK_CANCELLATION_REFUND_WORKERS = env.int(
+    "BULK_CANCELLATION_REFUND_WORKERS", default=4
+)
+BULK_CANCELLATION_MAX_DAYS = 7
+# Widest range of days the revenue report covers at once
+REVENUE_REPORT_MAX_DAYS = 366
+# Widest range of weeks the doctor utilization report covers at once
+UTILIZATION_REPORT_MAX_WEEKS = 104
+# Stripe forgets idempotency keys after 24 hours
+STRIPE_IDEMPOTENCY_KEY_TTL_SECONDS = 24 * 60 * 60
@@ -1,5 +1,7 @@
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
+from django.core.exceptions import ImproperlyConfigured
+
 from config.settings.base import *
 
 # SECURITY WARNING: don't run with debug turned on in production!
@@ -16,3 +18,20 @@ DATABASES = {
         ssl_require=True,
     )
 }
+
+# OTPs, rate limit buckets and metric counters live only in the cache, so
+# every gunicorn worker must share it: a code issued by one worker has to
+# verify on another, and a limit must not be multiplied by the worker count
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": env("REDIS_URL"),
+    }
+}
+for _setting in ("OTP_CACHE_ALIAS", "RATE_LIMIT_CACHE_ALIAS", "METRICS_CACHE_ALIAS"):
+    _backend = CACHES.get(globals()[_setting], {}).get("BACKEND", "")
+    if not _backend.endswith("RedisCache"):
+        raise ImproperlyConfigured(
+            f"{_setting} must name a Redis cache shared by all workers, "
+            f"not {_backend or 'a missing cache'}"
+        )
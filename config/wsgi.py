@@ -20,6 +20,11 @@ try:
 
     application = get_wsgi_application()
     print("WSGI application initialized successfully")
+
+    # Start loading the refresh token blacklist filter before the first request.
+    from api.authentication.utilities.blacklist import get_blacklist_filter
+
+    get_blacklist_filter()
 except Exception as e:
     print(f"Error initializing WSGI application: {str(e)}")
     raise